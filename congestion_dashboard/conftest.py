@@ -0,0 +1,103 @@
+"""
+pytest-django setup. The benchmark suite (congestion_analyzer/tests/test_benchmarks.py) only
+runs when --benchmark-rows is given; it then gets a disk-backed test database and its
+own cache, snapshot and archive directories under the benchmark work directory.
+"""
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pytest
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmark', 'congestion_analyzer benchmarks')
+    group.addoption('--benchmark-rows', help='Run the benchmarks on 100k, 1m, 10m or this many synthetic rows')
+    group.addoption('--benchmark-seed', type=int, default=2025, help='Synthetic data seed')
+    group.addoption('--benchmark-repeat', type=int, default=3, help='Runs per repeatable benchmark; the best is kept')
+    group.addoption('--benchmark-workdir', help='Where CSVs, results and baselines go (default: BASE_DIR/benchmarks)')
+    group.addoption('--benchmark-baseline', help='Baseline JSON to compare against (default: workdir/baseline_<rows>.json)')
+    group.addoption('--benchmark-threshold', type=float, help='Fractional slowdown over the baseline that fails a benchmark')
+    group.addoption('--benchmark-save-baseline', action='store_true', help='Store this run as the new baseline')
+
+
+@dataclass
+class BenchmarkRun:
+    ctx: object
+    repeat: int
+    threshold: float
+    baseline: dict = None
+    results: dict = field(default_factory=dict)
+
+
+def benchmark_rows(config):
+    from congestion_analyzer.benchmarks import parse_rows
+
+    value = config.getoption('benchmark_rows')
+    if value is None:
+        return None
+    try:
+        return parse_rows(value)
+    except ValueError as e:
+        raise pytest.UsageError(f'--benchmark-rows: {e}')
+
+
+def benchmark_workdir(config):
+    from django.conf import settings
+
+    return Path(config.getoption('benchmark_workdir') or Path(settings.BASE_DIR) / 'benchmarks')
+
+
+@pytest.fixture(scope='session')
+def benchmark_run(request, django_db_blocker):
+    """
+    The shared state of one benchmark session; writes results_<rows>.json (and the baseline)
+    at the end. The benchmarks share one test database for the whole session, set up here
+    rather than by pytest-django, whose per-test transactions would roll back import_data.
+    """
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import override_settings, setup_databases, teardown_databases
+    from congestion_analyzer.benchmarks import DEFAULT_THRESHOLD, BenchmarkContext, results_document
+
+    config = request.config
+    rows = benchmark_rows(config)
+    if rows is None:
+        pytest.skip('benchmarks only run with --benchmark-rows')
+    workdir = benchmark_workdir(config)
+    workdir.mkdir(parents=True, exist_ok=True)
+    baseline_path = Path(config.getoption('benchmark_baseline') or workdir / f'baseline_{rows}.json')
+
+    threshold = config.getoption('benchmark_threshold')
+    run = BenchmarkRun(BenchmarkContext(rows, config.getoption('benchmark_seed'), workdir),
+                       max(1, config.getoption('benchmark_repeat')),
+                       DEFAULT_THRESHOLD if threshold is None else threshold)
+    if baseline_path.exists() and not config.getoption('benchmark_save_baseline'):
+        run.baseline = json.loads(baseline_path.read_text())
+        if run.baseline.get('rows') != rows:
+            pytest.fail(f"Baseline {baseline_path} was recorded for {run.baseline.get('rows')} rows, not {rows}",
+                        pytrace=False)
+
+    # Its own cache file and snapshots too: the test database's data versions would collide with
+    # the real ones, and clearing the shared cache would throw away every worker's cached work
+    caches_setting = {**settings.CACHES, 'default': {**settings.CACHES['default'],
+                                                    'LOCATION': str(workdir / 'benchmark_cache.sqlite3')}}
+    # A disk-backed test database, so numbers reflect the SQLite file the app really uses
+    if connection.vendor == 'sqlite':
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = str(workdir / 'benchmark.sqlite3')
+    with django_db_blocker.unblock():
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            with override_settings(CACHES=caches_setting, SNAPSHOTS_DIR=workdir / 'snapshots',
+                                   ARCHIVE_DIR=workdir / 'archive'):
+                cache.clear()
+                yield run
+                cache.clear()
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+    document = json.dumps(results_document(run.ctx, run.results), indent=2)
+    (workdir / f'results_{rows}.json').write_text(document)
+    if config.getoption('benchmark_save_baseline'):
+        baseline_path.write_text(document)
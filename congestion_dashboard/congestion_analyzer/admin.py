@@ -1,5 +1,22 @@
 from django.contrib import admin
-from .models import VehicleEntry
+from .models import DetectionGroup, DetectionRegion, TimePeriod, VehicleClass, VehicleEntry
 
-# Register your models here.
-admin.site.register(VehicleEntry)
+
+@admin.register(VehicleEntry)
+class VehicleEntryAdmin(admin.ModelAdmin):
+    """
+    Read-only: rows only change through import_data and retention, which keep the running
+    totals (see running_totals) in step. A row saved or deleted here would not.
+    """
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+admin.site.register([DetectionRegion, DetectionGroup, VehicleClass, TimePeriod])
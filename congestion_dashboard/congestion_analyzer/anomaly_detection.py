@@ -2,8 +2,12 @@ from datetime import datetime, timedelta
 from django.utils import timezone
 from ddsketch import LogCollapsingLowestDenseDDSketch
 from .models import VehicleEntry
+from .metrics import DETECTOR_DURATION, timed
+from .row_index import RowIndex
 import numpy as np
 
+INDEXED_FIELDS = ['vehicle_class']  # The only field detect_anomalies filters on
+
 class AnomalyDetector:
     def __init__(self, relative_accuracy=0.01):
         self.relative_accuracy = relative_accuracy
@@ -16,6 +20,7 @@ class AnomalyDetector:
         }
         self.anomaly_history = []  # Store historical anomalies
         self.vehicle_sketches = {}  # Sketches for each vehicle type - ONLY KEEPING THIS ONE
+        self._index = None  # RowIndex over historical_data, rebuilt after updates
 
     def update(self, entry):
         """Update the sketch with new entry data"""
@@ -29,6 +34,7 @@ class AnomalyDetector:
             self.vehicle_sketches[entry.vehicle_class].add(entry.crz_entries)
             
             # Store historical data point
+            self._index = None
             self.historical_data.append({
                 'timestamp': entry.toll_date,
                 'hour': entry.toll_hour,
@@ -39,6 +45,17 @@ class AnomalyDetector:
                 'time_period': entry.time_period
             })
 
+    def historical_index(self):
+        """RowIndex of historical_data by vehicle class, built once per batch of updates."""
+        if self._index is None:
+            self._index = RowIndex.from_records(self.historical_data, INDEXED_FIELDS)
+        return self._index
+
+    def historical_slice(self, **filters):
+        """Historical data points matching the filters (see RowIndex.lookup), in arrival order."""
+        return [self.historical_data[position] for position in self.historical_index().lookup(**filters)]
+
+    @timed(DETECTOR_DURATION, name='detector')
     def detect_anomalies(self, sample_size=1000, recent_bias=0.5):
         """
         Detect anomalies using different thresholds for all data dimensions
@@ -82,7 +99,7 @@ class AnomalyDetector:
         # Process entries by vehicle type with smart sampling
         for vehicle_class in vehicle_types:
             # Find all entries for this vehicle type
-            vehicle_entries = [entry for entry in self.historical_data if entry['vehicle_class'] == vehicle_class]
+            vehicle_entries = self.historical_slice(vehicle_class=vehicle_class)
             total_entries = len(vehicle_entries)
             
             if total_entries == 0:
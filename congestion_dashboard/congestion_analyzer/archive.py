@@ -0,0 +1,132 @@
+"""
+Parquet archive of the raw VehicleEntry rows retention has moved out of the database.
+
+Rows are stored with dimension names, not keys, so the archive stands on its own, in
+hive-style date partitions: ARCHIVE_DIR/toll_date=YYYY-MM-DD/part-<first id>-<last id>.parquet,
+named after the VehicleEntry ids of the rows in the part. A day archived twice (rows for
+it were imported after it was first archived) simply gains another part file. Writing
+the same rows again replaces their part instead of adding one, so a retention run killed
+before it deleted the rows it archived is not counted twice by the next. Readers open the directory as one pyarrow dataset and pass toll date
+filters down to it, so a query only opens the partitions of the days it asks for. Row
+by row readers (replay, score backfill, anomaly history) go through iter_records, which
+reads one day at a time in event-time order.
+"""
+import os
+from datetime import date
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from django.conf import settings
+
+from .models import VehicleEntry
+
+ARCHIVE_COLUMNS = [
+    'toll_hour', 'toll_10_minute_block', 'minute_of_hour', 'day_of_week_int', 'toll_week',
+    'time_period', 'vehicle_class', 'detection_group', 'detection_region',
+    'crz_entries', 'excluded_roadway_entries',
+]  # Plus toll_date, the partition key
+PARTITIONING = ds.partitioning(pa.schema([('toll_date', pa.date32())]), flavor='hive')
+COMPRESSION = 'zstd'
+
+
+def archive_dir():
+    return Path(getattr(settings, 'ARCHIVE_DIR', Path(settings.BASE_DIR) / 'archive'))
+
+
+def part_ids(path):
+    """(first id, last id) of the rows in a part file, from its name; None for other files."""
+    first, _, last = path.stem.removeprefix('part-').partition('-')
+    return (int(first), int(last)) if first.isdigit() and last.isdigit() else None
+
+
+def write_day(day, frame):
+    """
+    Add `frame` (id and ARCHIVE_COLUMNS, all rows of toll date `day`) to the archive as a
+    part file and return its path. The file appears under its final name only once complete.
+    Parts holding any of the same ids are left by a write whose rows were never deleted
+    from VehicleEntry (every later import has higher ids), so they are replaced.
+    """
+    directory = archive_dir() / f'toll_date={day.isoformat()}'
+    directory.mkdir(parents=True, exist_ok=True)
+    first, last = int(frame['id'].min()), int(frame['id'].max())
+    name = f'part-{first}-{last}.parquet'
+    for part in directory.glob('part-*.parquet'):
+        ids = part_ids(part)
+        if part.name != name and ids is not None and ids[0] <= last and first <= ids[1]:
+            part.unlink(missing_ok=True)
+    staging = directory / f'.{name}.tmp'  # Dot files are invisible to dataset readers
+    pq.write_table(pa.Table.from_pandas(frame[ARCHIVE_COLUMNS], preserve_index=False), staging,
+                   compression=COMPRESSION)
+    os.replace(staging, directory / name)
+    return directory / name
+
+
+def dataset():
+    """The archive as a pyarrow dataset, or None when nothing has been archived."""
+    directory = archive_dir()
+    if not directory.is_dir() or not any(directory.glob('toll_date=*/*.parquet')):
+        return None
+    return ds.dataset(str(directory), format='parquet', partitioning=PARTITIONING)
+
+
+def as_date(day):
+    """A date from a date or a 'YYYY-MM-DD' string, as the ORM filters accept."""
+    return date.fromisoformat(day) if isinstance(day, str) else day
+
+
+def day_scalar(day):
+    return pa.scalar(as_date(day), pa.date32())
+
+
+def archived_days(start=None, end=None):
+    """Toll dates in [start, end] with archived rows, oldest first, from the partition names alone."""
+    start, end = as_date(start) if start else None, as_date(end) if end else None
+    days = {date.fromisoformat(part.parent.name.partition('=')[2])
+            for part in archive_dir().glob('toll_date=*/*.parquet')}
+    return sorted(day for day in days if (not start or day >= start) and (not end or day <= end))
+
+
+def read_table(start=None, end=None, columns=None):
+    """Archived rows with toll dates in [start, end] as a pyarrow Table, or None when there are none."""
+    archived = dataset()
+    if archived is None:
+        return None
+    toll_date = ds.field('toll_date')
+    condition = None
+    if start:
+        condition = toll_date >= day_scalar(start)
+    if end:
+        before_end = toll_date <= day_scalar(end)
+        condition = before_end if condition is None else condition & before_end
+    table = archived.to_table(columns=columns, filter=condition)
+    return table if table.num_rows else None
+
+
+# Event-time order within a day; part files of a day archived twice interleave by it
+RECORD_ORDER = [('toll_hour', 'ascending'), ('toll_10_minute_block', 'ascending'), ('minute_of_hour', 'ascending')]
+
+
+def iter_records(start=None, end=None, columns=ARCHIVE_COLUMNS):
+    """
+    Archived rows with toll dates in [start, end] as dicts with toll_date and `columns`,
+    ordered by toll date, hour and 10-minute block. Reads one day at a time, so memory
+    stays at one day of rows however much is archived.
+    """
+    wanted = list(dict.fromkeys(['toll_date', *columns, *(name for name, _ in RECORD_ORDER)]))
+    for day in archived_days(start, end):
+        table = read_table(day, day, columns=wanted)
+        if table is not None:
+            yield from table.sort_by(RECORD_ORDER).select(['toll_date', *columns]).to_pylist()
+
+
+def iter_entries(start=None, end=None):
+    """iter_records as unsaved VehicleEntry instances carrying their dimension names."""
+    for record in iter_records(start, end):
+        entry = VehicleEntry(**{name: record[name] for name in (
+            'toll_date', 'toll_hour', 'toll_10_minute_block', 'minute_of_hour', 'day_of_week_int',
+            'toll_week', 'crz_entries', 'excluded_roadway_entries')})
+        for column in ('time_period', 'vehicle_class', 'detection_group', 'detection_region'):
+            setattr(entry, column, record[column])  # LegacyColumn keeps the name on the instance
+        yield entry
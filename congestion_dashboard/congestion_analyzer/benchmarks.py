@@ -0,0 +1,202 @@
+"""
+Benchmark suite for the data paths that scale with the VehicleEntry table.
+
+Each benchmark does its setup, then returns the callable that gets timed. They run in
+registration order against synthetic data (see synthetic_data), so later benchmarks
+use the rows loaded by import_data. tests/test_benchmarks.py runs each one as a pytest-django
+test (`pytest --benchmark-rows 1m`); `manage.py benchmark` is a shortcut for that.
+"""
+import io
+import itertools
+import platform
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import RequestFactory
+from django.utils import timezone
+
+from . import cache_utils, running_totals
+from .data_versions import data_months, partition_key, partition_versions, versioned_key
+from .synthetic_data import write_upstream_csv
+
+ROW_SIZES = {'100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+DEFAULT_THRESHOLD = 0.20  # Fractional slowdown that counts as a regression
+NOISE_FLOOR_SECONDS = 0.01  # Differences below this are never regressions
+
+
+def parse_rows(value):
+    """Row count from '100k', '1m', '10m' or a number."""
+    try:
+        return ROW_SIZES.get(value.lower()) or int(value)
+    except ValueError:
+        raise ValueError(f"rows must be one of {', '.join(ROW_SIZES)} or a row count")
+
+
+@dataclass
+class BenchmarkContext:
+    rows: int
+    seed: int
+    workdir: Path
+    state: dict = field(default_factory=dict)  # Shared between benchmarks
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    name: str
+    setup: object  # setup(ctx) -> callable to time
+    repeatable: bool = True  # False when the timed call changes what later runs would measure
+
+
+BENCHMARKS = []
+
+
+def benchmark(name, repeatable=True):
+    def register(setup):
+        BENCHMARKS.append(Benchmark(name, setup, repeatable))
+        return setup
+    return register
+
+
+def _quiet_command(name, *args, **options):
+    call_command(name, *args, stdout=io.StringIO(), **options)
+
+
+@benchmark('import_data', repeatable=False)
+def bench_import_data(ctx):
+    path = ctx.workdir / f'synthetic_{ctx.rows}_{ctx.seed}.csv'
+    if not path.exists():
+        write_upstream_csv(path, ctx.rows, ctx.seed)
+    return lambda: _quiet_command('import_data', str(path))
+
+
+@benchmark('get_base_vehicle_data_cold')
+def bench_base_data_cold(ctx):
+    def run():
+        versions = partition_versions()
+        cache.delete_many([partition_key(cache_utils.BASE_DATA_CACHE_KEY, month, versions) for month in data_months()])
+        return cache_utils.get_base_vehicle_data()
+    return run
+
+
+@benchmark('get_base_vehicle_data_warm')
+def bench_base_data_warm(ctx):
+    ctx.state['base_df'] = cache_utils.get_base_vehicle_data()
+    return cache_utils.get_base_vehicle_data
+
+
+@benchmark('get_vehicle_data_one_week')
+def bench_vehicle_data_week(ctx):
+    last_day = ctx.state['base_df']['toll_date'].max().date()
+    return lambda: cache_utils.get_vehicle_data(last_day - timedelta(days=6), last_day)
+
+
+@benchmark('perform_aggregations')
+def bench_perform_aggregations(ctx):
+    df = ctx.state['base_df'].copy()
+    df['month_year'] = df['toll_date'].dt.strftime('%Y-%m')
+    return lambda: cache_utils.perform_aggregations(df.copy())
+
+
+@benchmark('dashboard_stats')
+def bench_dashboard_stats(ctx):
+    return running_totals.dashboard_stats
+
+
+@benchmark('get_map_data_cold')
+def bench_map_data_cold(ctx):
+    def run():
+        cache.delete_many([versioned_key(cache_utils.MAP_DATA_CACHE_KEY), versioned_key(cache_utils.DATE_RANGE_CACHE_KEY)])
+        return cache_utils.get_map_data()
+    return run
+
+
+@benchmark('anomalies_full')
+def bench_anomalies_full(ctx):
+    def run():
+        cache_utils.clear_anomaly_cache()
+        return cache_utils.get_cached_anomalies()
+    return run
+
+
+@benchmark('anomalies_live')
+def bench_anomalies_live(ctx):
+    from .views import get_anomalies
+    request = RequestFactory().get('/get_anomalies/')
+    return lambda: b''.join(get_anomalies(request).streaming_content)
+
+
+@benchmark('batch_scoring')
+def bench_batch_scoring(ctx):
+    return lambda: _quiet_command('backfill_scores', clear=True)
+
+
+@benchmark('heatmap_payload_x100')
+def bench_heatmap_payload(ctx):
+    from .heatmap import get_heatmap_interpolator
+    interpolator = get_heatmap_interpolator()
+    scores = _random_scores(interpolator.entry_names, ctx.seed)
+    versions = itertools.count(1)  # Fresh versions so every call interpolates and serialises
+    return lambda: [interpolator.payload(next(versions), scores) for _ in range(100)]
+
+
+@benchmark('heatmap_raster_x100')
+def bench_heatmap_raster(ctx):
+    from .heatmap import get_heatmap_raster, raster_cell_sizes
+    raster = get_heatmap_raster(len(raster_cell_sizes()) - 1)  # Finest level
+    scores = _random_scores(raster.grid.entry_names, ctx.seed)
+    versions = itertools.count(1)
+    return lambda: [raster.png(next(versions), scores) for _ in range(100)]
+
+
+def _random_scores(entry_names, seed):
+    rng = np.random.default_rng(seed)
+    return {name: float(score) for name, score in zip(entry_names, rng.uniform(1, 100, len(entry_names)))}
+
+
+def run_benchmarks(ctx, names=None, repeat=1, log=print):
+    """Run the selected benchmarks in order; returns {name: best seconds}."""
+    results = {}
+    for bench in BENCHMARKS:
+        if names and bench.name not in names:
+            continue
+        timed = bench.setup(ctx)
+        timings = []
+        for _ in range(repeat if bench.repeatable else 1):
+            started = time.perf_counter()
+            timed()
+            timings.append(time.perf_counter() - started)
+        results[bench.name] = min(timings)
+        log(f"[Benchmark] {bench.name}: {results[bench.name]:.3f}s")
+    return results
+
+
+def results_document(ctx, results):
+    return {
+        'rows': ctx.rows,
+        'seed': ctx.seed,
+        'created_at': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+
+def compare_to_baseline(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Rows of (name, baseline seconds, current seconds, ratio, regressed) for benchmarks
+    present in both runs.
+    """
+    rows = []
+    for name, seconds in results.items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            continue
+        ratio = seconds / base if base > 0 else float('inf')
+        regressed = ratio > 1 + threshold and seconds - base > NOISE_FLOOR_SECONDS
+        rows.append((name, base, seconds, ratio, regressed))
+    return rows
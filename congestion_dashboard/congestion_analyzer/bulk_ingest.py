@@ -0,0 +1,255 @@
+"""
+Fast path for loading MTA CSV exports into VehicleEntry.
+
+Rows become plain tuples (the few distinct date and time strings are parsed once each,
+not once per row) and go in with executemany, CHUNK_ROWS rows per transaction. On SQLite
+the database is switched to WAL, so readers keep reading while a load writes, and the
+loading connection runs with relaxed `synchronous`, a large page cache and in-memory
+temp storage. Dimension names become keys through a per-load {name: key} map, so a
+load only touches the dimension tables for names it has not met before. Big loads drop
+VehicleEntry's secondary indexes and rebuild them once at the end, which is far cheaper
+than updating three B-trees row by row. Chunks still commit one by one, so other writers
+(score publishing, aggregate_daily_entries) only wait for the current chunk, never for
+the whole load; the rebuild is its own transaction at the end, and also runs when a load
+fails. A load killed outright leaves the indexes dropped, and the next load puts back
+whichever are missing.
+Each chunk adds its rows to the running totals (see running_totals) in the transaction
+that inserts it, so the dashboard stats always match the committed rows.
+"""
+import csv
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .data_versions import month_of
+from .models import DIMENSION_FIELDS, VehicleEntry
+from .running_totals import RegionDeltas, apply_deltas
+
+CHUNK_ROWS = 50_000
+DEFER_INDEXES_MIN_ROWS = 100_000
+DEFER_INDEXES_FRACTION = 0.25  # Of the rows already in the table
+
+INSERT_FIELDS = (
+    'toll_date', 'toll_hour', 'toll_10_minute_block', 'minute_of_hour', 'day_of_week_int',
+    'toll_week', 'time_period_key', 'vehicle_class_key', 'detection_group_key',
+    'detection_region_key', 'crz_entries', 'excluded_roadway_entries',
+)
+# CSV column of each dimension, in INSERT_FIELDS order
+DIMENSION_COLUMNS = (
+    ('time_period', 'Time Period'),
+    ('vehicle_class', 'Vehicle Class'),
+    ('detection_group', 'Detection Group'),
+    ('detection_region', 'Detection Region'),
+)
+# Positions the running totals read from each row's values
+REGION_KEY_INDEX = INSERT_FIELDS.index('detection_region_key')
+CRZ_ENTRIES_INDEX = INSERT_FIELDS.index('crz_entries')
+
+
+@lru_cache(maxsize=None)
+def parse_date(text):
+    return datetime.strptime(text, '%m/%d/%Y').date()
+
+
+@lru_cache(maxsize=None)
+def parse_clock(text):
+    """(hour, minute) of an upstream '%m/%d/%Y %I:%M:%S %p' timestamp."""
+    parsed = datetime.strptime(text, '%m/%d/%Y %I:%M:%S %p')
+    return parsed.hour, parsed.minute
+
+
+@lru_cache(maxsize=None)
+def parse_week(text):
+    """ISO week number of the week's first day."""
+    return parse_date(text).isocalendar()[1]
+
+
+@lru_cache(maxsize=None)
+def db_date(day):
+    return connection.ops.adapt_datefield_value(day)
+
+
+def dimension_key(dimension_keys, column, name):
+    """Key of `name` in the dimension behind `column`, adding the member if it is new."""
+    keys = dimension_keys.setdefault(column, {})
+    key = keys.get(name)
+    if key is None:
+        keys.update(DIMENSION_FIELDS[column][1].resolve([name]))
+        key = keys[name]
+    return key
+
+
+def entry_values(row, dimension_keys):
+    """
+    (toll_date, VehicleEntry column values in INSERT_FIELDS order) for one CSV row.
+    dimension_keys is the load's {column: {name: key}} map; new names are added to it.
+    """
+    toll_date = parse_date(row['Toll Date'])
+    return toll_date, (
+        db_date(toll_date),
+        parse_clock(row['Toll Hour'])[0],
+        parse_clock(row['Toll 10 Minute Block'])[1] // 10,
+        int(row['Minute of Hour']),
+        int(row['Day of Week Int']),
+        parse_week(row['Toll Week']),
+        *(dimension_key(dimension_keys, column, row[header]) for column, header in DIMENSION_COLUMNS),
+        int(row['CRZ Entries']),
+        int(row['Excluded Roadway Entries']),
+    )
+
+
+def count_rows(path):
+    """Data rows in a CSV file (lines minus the header), without parsing it."""
+    with open(path, 'rb') as file:
+        lines = sum(block.count(b'\n') for block in iter(lambda: file.read(1 << 20), b''))
+    return max(0, lines - 1)
+
+
+def should_defer_indexes(new_rows):
+    """Whether rebuilding the indexes once beats maintaining them through `new_rows` inserts."""
+    existing_rows = VehicleEntry.objects.count()
+    return new_rows >= DEFER_INDEXES_MIN_ROWS and new_rows >= existing_rows * DEFER_INDEXES_FRACTION
+
+
+def index_sql(indexes):
+    """(drop statements, create statements) for some of VehicleEntry's secondary indexes."""
+    with connection.schema_editor(collect_sql=True) as editor:
+        for index in indexes:
+            editor.remove_index(VehicleEntry, index)
+        drop = list(editor.collected_sql)
+        editor.collected_sql.clear()
+        for index in indexes:
+            editor.add_index(VehicleEntry, index)
+        return drop, list(editor.collected_sql)
+
+
+def existing_indexes():
+    """(indexes in the database, indexes missing from it) of VehicleEntry's Meta.indexes."""
+    with connection.cursor() as cursor:
+        names = connection.introspection.get_constraints(cursor, VehicleEntry._meta.db_table)
+    existing = [index for index in VehicleEntry._meta.indexes if index.name in names]
+    return existing, [index for index in VehicleEntry._meta.indexes if index.name not in names]
+
+
+def run_statements(statements):
+    """Execute DDL statements in one transaction of their own."""
+    if statements:
+        with transaction.atomic(), connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+
+@contextmanager
+def ingest_pragmas():
+    """WAL for the database; relaxed durability and a big page cache for this connection while loading."""
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    tuned = {
+        'synchronous': 'NORMAL',  # Safe under WAL: a crash can only lose the last commits, never corrupt
+        'cache_size': -1024 * getattr(settings, 'SQLITE_INGEST_CACHE_MB', 256),  # Negative: KiB
+        'temp_store': 'MEMORY',
+    }
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=WAL')  # Persistent: readers no longer block the writer
+        previous = {}
+        for name, value in tuned.items():
+            cursor.execute(f'PRAGMA {name}')
+            previous[name] = cursor.fetchone()[0]
+            cursor.execute(f'PRAGMA {name}={value}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for name, value in previous.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+            cursor.execute('PRAGMA optimize')
+
+
+@dataclass
+class IngestResult:
+    rows: int = 0
+    errors: int = 0
+    months: set = field(default_factory=set)
+    first_date: object = None
+    last_date: object = None
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def ingest_csv(path, defer_indexes=None, chunk_rows=CHUNK_ROWS, log=print, result=None):
+    """
+    Load an MTA CSV export into VehicleEntry. defer_indexes=None decides from the file's
+    row count (see should_defer_indexes). Rows that fail to parse are reported and skipped.
+    Returns an IngestResult; bumping the touched months' data versions is the caller's job.
+    Pass in `result` to still see the months read so far if the load fails partway (chunks
+    committed before the failure stay loaded).
+    """
+    if result is None:
+        result = IngestResult()
+    if defer_indexes is None:
+        defer_indexes = should_defer_indexes(count_rows(path))
+    table = connection.ops.quote_name(VehicleEntry._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(VehicleEntry._meta.get_field(name).column) for name in INSERT_FIELDS)
+    insert_sql = f"INSERT INTO {table} ({columns}) VALUES ({', '.join(['%s'] * len(INSERT_FIELDS))})"
+    # A load killed before its rebuild leaves indexes dropped: a deferred load rebuilds them
+    # all at the end, any other load restores them before it starts
+    existing, missing = existing_indexes()
+    restore_sql = [] if defer_indexes else index_sql(missing)[1]
+    drop_sql = index_sql(existing)[0] if defer_indexes else []
+    create_sql = index_sql(VehicleEntry._meta.indexes)[1] if defer_indexes else []
+    dimension_keys = {}
+
+    def flush(cursor, chunk):
+        cursor.executemany(insert_sql, chunk)
+        deltas = RegionDeltas()
+        for values in chunk:
+            deltas.add(values[REGION_KEY_INDEX], values[CRZ_ENTRIES_INDEX])
+        apply_deltas(deltas)
+        log(f"Imported {result.rows} entries...")
+
+    started = time.perf_counter()
+    with ingest_pragmas(), open(path, 'r', newline='') as file:
+        if restore_sql:
+            log(f"Restoring {len(restore_sql)} missing indexes...")
+        run_statements(restore_sql)
+        run_statements(drop_sql)
+        try:
+            # A commit per chunk, so other writers get the lock between chunks during a long load
+            with connection.cursor() as cursor:
+                chunk = []
+                for row in csv.DictReader(file):
+                    try:
+                        toll_date, values = entry_values(row, dimension_keys)
+                    except Exception as e:
+                        result.errors += 1
+                        log(f"Error on row {result.rows + result.errors}: {e}; row data: {row}")
+                        continue
+                    chunk.append(values)
+                    result.rows += 1
+                    result.months.add(month_of(toll_date))
+                    result.first_date = min(result.first_date or toll_date, toll_date)
+                    result.last_date = max(result.last_date or toll_date, toll_date)
+                    if len(chunk) >= chunk_rows:
+                        with transaction.atomic():
+                            flush(cursor, chunk)
+                        chunk = []
+                if chunk:
+                    with transaction.atomic():
+                        flush(cursor, chunk)
+        finally:
+            # Also after a failure: the committed chunks stay, and so must the indexes
+            if create_sql:
+                log(f"Rebuilding {len(create_sql)} indexes...")
+                run_statements(create_sql)
+    result.seconds = time.perf_counter() - started
+    return result
+
@@ -0,0 +1,312 @@
+"""
+Two-tier Django cache backend: a per-process LRU bounded by bytes in front of a SQLite
+file shared by every worker process.
+
+Values are pickled once. The disk tier holds every entry, zlib-compressing pickles above
+COMPRESS_MIN_BYTES, and evicts the least recently read entries once it grows past
+MAX_BYTES. The memory tier keeps recently used pickles up to L1_MAX_BYTES in total but
+never one above L1_MAX_ITEM_BYTES, so multi-MB frames live once on disk (and in the OS
+page cache) instead of once per worker. A value read from disk stays in memory for at
+most L1_TIMEOUT seconds, which bounds how long a worker can serve an entry another worker
+has since replaced; cache_utils keys carry data versions, so those are never replaced.
+Triggers keep the disk tier's entry count and bytes in a one-row table, so writes check
+MAX_BYTES without reading past every stored value to sum their sizes.
+
+    CACHES = {'default': {
+        'BACKEND': 'congestion_analyzer.cache_backends.TieredCache',
+        'LOCATION': BASE_DIR / 'cache' / 'tiered_cache.sqlite3',
+    }}
+"""
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .metrics import registry
+
+MB = 1024 * 1024
+ACCESS_RESOLUTION = 60  # Seconds; a disk entry's last-read time is only rewritten this often
+
+CACHE_TIER_REQUESTS = registry.counter('cache_tier_requests_total', 'Two-tier cache lookups by tier (memory or disk) and result')
+CACHE_TIER_EVICTIONS = registry.counter('cache_tier_evictions_total', 'Entries evicted for space by tier')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    compressed INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+);
+DROP INDEX IF EXISTS cache_entries_accessed;
+-- Covers eviction, which would otherwise read past each value to reach its size
+CREATE INDEX IF NOT EXISTS cache_entries_eviction ON cache_entries (accessed, size, key);
+CREATE TABLE IF NOT EXISTS cache_size (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS cache_entries_inserted AFTER INSERT ON cache_entries BEGIN
+    UPDATE cache_size SET entries = entries + 1, bytes = bytes + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entries_deleted AFTER DELETE ON cache_entries BEGIN
+    UPDATE cache_size SET entries = entries - 1, bytes = bytes - old.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entries_resized AFTER UPDATE OF size ON cache_entries BEGIN
+    UPDATE cache_size SET bytes = bytes - old.size + new.size;
+END;
+"""
+# Seeds the totals once, for a file created before the triggers existed (or a new one)
+SEED_SIZE = 'INSERT OR IGNORE INTO cache_size SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries'
+
+
+class MemoryTier:
+    """Byte-bounded LRU of pickles, shared by every thread of the process."""
+
+    def __init__(self, max_bytes, max_item_bytes):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (pickled, expires)
+        self.bytes = 0
+        self.requests = Counter()  # (tier, result) -> lookups by this process
+
+    def count(self, tier, result):
+        CACHE_TIER_REQUESTS.inc(tier=tier, result=result)
+        with self.lock:
+            self.requests[tier, result] += 1
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] is not None and entry[1] <= time.time():
+                self._drop(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, pickled, expires):
+        with self.lock:
+            self._drop(key)
+            if len(pickled) > self.max_item_bytes:
+                return
+            self.entries[key] = (pickled, expires)
+            self.bytes += len(pickled)
+            while self.bytes > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self._drop(oldest)
+                CACHE_TIER_EVICTIONS.inc(tier='memory')
+
+    def drop(self, key):
+        with self.lock:
+            return self._drop(key)
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= len(entry[0])
+        return entry is not None
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+
+# One memory tier per LOCATION per process: Django builds a backend instance per thread
+_memory_tiers = {}
+_memory_tiers_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = Path(location)
+        self._max_bytes = int(options.get('MAX_BYTES', 1024 * MB))
+        self._l1_timeout = options.get('L1_TIMEOUT', 10)
+        self._compress_min_bytes = int(options.get('COMPRESS_MIN_BYTES', 64 * 1024))
+        self._compress_level = int(options.get('COMPRESS_LEVEL', 1))
+        with _memory_tiers_lock:
+            self._memory = _memory_tiers.get(str(self._path))
+            if self._memory is None:
+                self._memory = _memory_tiers[str(self._path)] = MemoryTier(
+                    int(options.get('L1_MAX_BYTES', 64 * MB)), int(options.get('L1_MAX_ITEM_BYTES', 4 * MB)))
+        self._connection = None
+
+    @property
+    def _db(self):
+        if self._connection is None:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self._path), timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            if connection.execute('SELECT 1 FROM cache_size').fetchone() is None:
+                connection.execute('BEGIN IMMEDIATE')
+                connection.execute(SEED_SIZE)
+                connection.execute('COMMIT')
+            self._connection = connection
+        return self._connection
+
+    def _memory_expiry(self, expires):
+        if self._l1_timeout is None:
+            return expires
+        l1_expires = time.time() + self._l1_timeout
+        return l1_expires if expires is None else min(expires, l1_expires)
+
+    def _encode(self, pickled):
+        if len(pickled) >= self._compress_min_bytes:
+            return zlib.compress(pickled, self._compress_level), 1
+        return pickled, 0
+
+    def _read(self, key):
+        """The pickle stored under an already made key, from memory or disk, or None."""
+        pickled = self._memory.get(key)
+        if pickled is not None:
+            self._memory.count('memory', 'hit')
+            return pickled
+        self._memory.count('memory', 'miss')
+
+        now = time.time()
+        row = self._db.execute('SELECT value, compressed, expires, accessed FROM cache_entries WHERE key = ?',
+                               (key,)).fetchone()
+        if row is None or (row[2] is not None and row[2] <= now):
+            self._memory.count('disk', 'miss')
+            return None
+        self._memory.count('disk', 'hit')
+        value, compressed, expires, accessed = row
+        if accessed < now - ACCESS_RESOLUTION:
+            self._db.execute('UPDATE cache_entries SET accessed = ? WHERE key = ?', (now, key))
+        pickled = zlib.decompress(value) if compressed else value
+        self._memory.put(key, pickled, self._memory_expiry(expires))
+        return pickled
+
+    def _write(self, key, pickled, expires, db=None):
+        value, compressed = self._encode(pickled)
+        # An upsert rather than INSERT OR REPLACE, whose implicit delete skips the delete trigger
+        (db or self._db).execute(
+            'INSERT INTO cache_entries (key, value, compressed, size, expires, accessed) VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, compressed = excluded.compressed, '
+            'size = excluded.size, expires = excluded.expires, accessed = excluded.accessed',
+            (key, value, compressed, len(value), expires, time.time()))
+        self._memory.put(key, pickled, self._memory_expiry(expires))
+
+    def get(self, key, default=None, version=None):
+        pickled = self._read(self.make_and_validate_key(key, version=version))
+        return default if pickled is None else pickle.loads(pickled)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self.get_backend_timeout(timeout)
+        if expires is not None and expires <= time.time():
+            self._delete(key)
+            return
+        self._write(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires)
+        self._cull()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self.get_backend_timeout(timeout)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute('SELECT expires FROM cache_entries WHERE key = ?', (key,)).fetchone()
+            if row is not None and (row[0] is None or row[0] > time.time()):
+                db.execute('COMMIT')
+                return False
+            self._write(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires, db)
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            self._memory.drop(key)
+            raise
+        self._cull()
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        """Atomic across processes: the read and the write share one write transaction."""
+        key = self.make_and_validate_key(key, version=version)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute('SELECT value, compressed, expires FROM cache_entries WHERE key = ?', (key,)).fetchone()
+            if row is None or (row[2] is not None and row[2] <= time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(zlib.decompress(row[0]) if row[1] else row[0]) + delta
+            self._write(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), row[2], db)
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            self._memory.drop(key)
+            raise
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._memory.drop(key)
+        cursor = self._db.execute('UPDATE cache_entries SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                                  (self.get_backend_timeout(timeout), key, time.time()))
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        return self._read(self.make_and_validate_key(key, version=version)) is not None
+
+    def delete(self, key, version=None):
+        return self._delete(self.make_and_validate_key(key, version=version))
+
+    def _delete(self, key):
+        self._memory.drop(key)
+        return self._db.execute('DELETE FROM cache_entries WHERE key = ?', (key,)).rowcount > 0
+
+    def clear(self):
+        self._memory.clear()
+        self._db.execute('DELETE FROM cache_entries')
+
+    def _cull(self):
+        """Evict expired entries, then the least recently read, until the disk tier is back under 90% of MAX_BYTES."""
+        db = self._db
+        if self._disk_size()[1] <= self._max_bytes:
+            return
+        db.execute('DELETE FROM cache_entries WHERE expires <= ?', (time.time(),))
+        total = self._disk_size()[1]
+        evicted = []
+        cursor = db.execute('SELECT key, size FROM cache_entries ORDER BY accessed')
+        for key, size in cursor:
+            if total <= self._max_bytes * 0.9:
+                break
+            evicted.append((key,))
+            total -= size
+        cursor.close()
+        db.executemany('DELETE FROM cache_entries WHERE key = ?', evicted)
+        for (key,) in evicted:
+            self._memory.drop(key)
+        CACHE_TIER_EVICTIONS.inc(len(evicted), tier='disk')
+
+    def _disk_size(self):
+        """(entries, bytes) of the disk tier, from the trigger-maintained totals."""
+        return self._db.execute('SELECT entries, bytes FROM cache_size').fetchone()
+
+    def stats(self):
+        """Entries, bytes and this process's hits and misses for the memory tier and the shared disk tier."""
+        entries, size = self._disk_size()
+        disk = {'entries': entries, 'bytes': size, 'max_bytes': self._max_bytes}
+        with self._memory.lock:
+            memory = {'entries': len(self._memory.entries), 'bytes': self._memory.bytes, 'max_bytes': self._memory.max_bytes}
+            requests = dict(self._memory.requests)
+        for tier, tier_stats in (('memory', memory), ('disk', disk)):
+            tier_stats['hits'] = requests.get((tier, 'hit'), 0)
+            tier_stats['misses'] = requests.get((tier, 'miss'), 0)
+        return {'memory': memory, 'disk': disk}
+
+    def close(self, **kwargs):
+        # Connections are kept for the life of the thread, like the memory tier
+        pass
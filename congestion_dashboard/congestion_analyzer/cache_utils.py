@@ -3,13 +3,24 @@ import pandas as pd
 from django.core.cache import cache
 from django.utils import timezone
 from datetime import datetime, timedelta
+import hashlib
+import heapq
 import json
+from operator import attrgetter
 from django.core.serializers.json import DjangoJSONEncoder
+from .compression import compress_variants
+from .data_versions import (
+    bump_partitions, data_months, month_bounds, partition_key, partition_versions, versioned_key
+)
+from .json_stream import frame_to_json, records_frame
+from .metrics import cached_section, mark_cache_hit
+from .archive import iter_entries as iter_archived_entries, read_table as read_archive_table
+from .running_totals import dashboard_stats
+from .snapshots import BASE_TABLE, read_month_frame, read_month_rollup
 
 # Attempt to import model and helpers, handle potential circular imports if necessary
 try:
-    from .models import VehicleEntry
-    from .view_helpers.stats_calculator import calculate_base_stats
+    from .models import DIMENSION_FIELDS, WEEKDAY_NAMES, VehicleEntry
     from .view_helpers.aggregator import perform_aggregations
     # Import constants directly to avoid potential issues with importing map_views itself yet
     # Define them here or ensure they are accessible from a shared constants file later
@@ -37,14 +48,17 @@ try:
     VEHICLE_CLASS_MAPPING = { # Centralized mapping
         'Passenger Car': 'car', 'Taxi': 'taxi', 'Bus': 'bus',
         'Multi-Unit Truck': 'multi_unit_truck', 'Single-Unit Truck': 'single_unit_truck',
-        'Motorcycle': 'motorcycle'
+        'Motorcycle': 'motorcycle',
+        # Vehicle Class values as they appear in the MTA data
+        '1 - Cars, Pickups and Vans': 'car', '2 - Single-Unit Trucks': 'single_unit_truck',
+        '3 - Multi-Unit Trucks': 'multi_unit_truck', '4 - Buses': 'bus',
+        '5 - Motorcycles': 'motorcycle', 'TLC Taxi/FHV': 'taxi'
     }
 
 except ImportError as e:
     print(f"Error importing modules in cache_utils: {e}. Check for circular dependencies.")
     # Define fallbacks or raise error if critical dependencies are missing
     VehicleEntry = None
-    calculate_base_stats = lambda df: (0, [], 0)
     perform_aggregations = lambda df: []
     ENTRY_POINTS = {}
     VEHICLE_TYPES = {}
@@ -110,6 +124,10 @@ AGG_JSON_CACHE_KEY = 'dashboard_agg_json_v2'
 SCHEMA_CACHE_KEY = 'perspective_schema_v4'  # Used to be v3
 MAP_DATA_CACHE_KEY = 'map_view_data_v2'
 DATE_RANGE_CACHE_KEY = 'data_date_range_v2'
+DASHBOARD_PAYLOAD_CACHE_KEY = 'dashboard_payload_v1'
+MONTH_DASHBOARD_CACHE_KEY = 'dashboard_month_v1'
+# Keys above are prefixes: the data versions of the months an artifact was built from are
+# appended (see data_versions.versioned_key), so an import never leaves a stale entry reachable
 
 # Cache timeout (in seconds) - e.g., 1 hour
 CACHE_TIMEOUT = 3600
@@ -120,41 +138,113 @@ ANOMALY_DATE_RANGE_KEY = 'anomaly_date_range_v1'
 
 def get_base_vehicle_data():
     """
-    Fetches vehicle data from the database or cache.
-    Returns a Pandas DataFrame. Handles basic type conversion.
+    The whole history as one DataFrame. Prefer get_vehicle_data(start, end) or
+    iter_vehicle_partitions(), which only load the months a caller actually needs.
+    """
+    return get_vehicle_data()
+
+def get_vehicle_data(start=None, end=None):
+    """
+    Base rows for toll dates in [start, end] (dates; default: everything), built from the
+    month partitions covering the range. A range inside one month is a slice of that
+    partition, not a copy.
+    """
+    frames = list(iter_vehicle_partitions(start, end))
+    if not frames:
+        return empty_vehicle_frame()
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
+
+def iter_vehicle_partitions(start=None, end=None, versions=None):
+    """
+    Base rows for toll dates in [start, end], one month partition at a time. Only months
+    in the range are read, each when the loop reaches it, so callers that can work a
+    month at a time never hold more than one month in memory.
     """
     if VehicleEntry is None: # Check if import failed
-        print("!!! VehicleEntry model not available in cache_utils. Returning empty DataFrame.")
-        return pd.DataFrame()
+        print("!!! VehicleEntry model not available in cache_utils. Returning no partitions.")
+        return
+    if versions is None:
+        versions = partition_versions()
+    for month in data_months(start, end):
+        df = get_vehicle_partition(month, versions)
+        first_day, last_day = month_bounds(month)
+        if (start and start > first_day) or (end and end < last_day):
+            df = slice_toll_dates(df, start, end)
+        yield df
+
+@cached_section(BASE_DATA_CACHE_KEY)
+def get_vehicle_partition(month, versions):
+    """
+    One month of base rows, sorted by toll_date: a zero-copy view of the current Arrow
+    snapshot when it holds this month's version, else cached per month version, so an
+    import only refetches the months it touched.
+    """
+    df = read_month_frame(BASE_TABLE, month, versions.get(month, 0))
+    if df is not None:
+        print(f"--- Snapshot Hit: Base vehicle data {month} ---")
+        mark_cache_hit()
+        return df
+
+    cache_key = partition_key(BASE_DATA_CACHE_KEY, month, versions)
+    df = cache.get(cache_key)
+    if df is not None:
+        print(f"--- Cache Hit: Base vehicle data {month} ---")
+        mark_cache_hit()
+        return df
+
+    print(f"--- Cache Miss: Fetching base vehicle data {month} from DB ---")
+    df = fetch_vehicle_frame(*month_bounds(month))
+    df = df.sort_values('toll_date', kind='stable', ignore_index=True)
+    cache.set(cache_key, df, CACHE_TIMEOUT)
+    return df
 
-    cached_data = cache.get(BASE_DATA_CACHE_KEY)
-    if cached_data:
-        print("--- Cache Hit: Base vehicle data ---")
-        try:
-            df = pd.read_json(cached_data, orient='split')
-            # Ensure 'toll_date' is datetime after reading from JSON
-            if 'toll_date' in df.columns:
-                # Important: Specify UTC=True if dates were timezone-aware
-                df['toll_date'] = pd.to_datetime(df['toll_date'], errors='coerce', utc=True)
-            # Ensure other types are correct after JSON deserialization if needed
-            if 'crz_entries' in df.columns:
-                df['crz_entries'] = pd.to_numeric(df['crz_entries'], errors='coerce').fillna(0).astype(int)
-            if 'hour_of_day' in df.columns:
-                df['hour_of_day'] = pd.to_numeric(df['hour_of_day'], errors='coerce').fillna(0).astype(int)
-            return df
-        except Exception as e:
-            print(f"Error deserializing cached base data: {e}. Refetching.")
-            # Fall through to refetch if cache is corrupted
-
-    print("--- Cache Miss: Fetching base vehicle data from DB ---")
-    queryset = VehicleEntry.objects.all().values(
-        'toll_date', 'hour_of_day', 'day_of_week', 'day_of_week_int',
-        'vehicle_class', 'detection_region', 'crz_entries', 'time_period',
-        'detection_group', 'toll_week'
+def slice_toll_dates(df, start=None, end=None):
+    """Rows of a toll_date-sorted frame with toll dates in [start, end], as a positional slice."""
+    toll_dates = df['toll_date']
+    first = toll_dates.searchsorted(pd.Timestamp(start).tz_localize('UTC')) if start else 0
+    stop = toll_dates.searchsorted(pd.Timestamp(end).tz_localize('UTC') + pd.Timedelta(days=1)) if end else len(df)
+    return df.iloc[first:stop]
+
+def fetch_vehicle_frame(start=None, end=None):
+    """
+    VehicleEntry rows, optionally for toll dates in [start, end], as a cleaned DataFrame
+    with UTC toll_date. Rows retention has moved to the Parquet archive are read from there.
+    An empty result still has the expected columns and dtypes.
+    """
+    queryset = VehicleEntry.objects.all()
+    if start:
+        queryset = queryset.filter(toll_date__gte=start)
+    if end:
+        queryset = queryset.filter(toll_date__lte=end)
+    # Integer keys off the fact table; names come from the in-process dimension maps, one per distinct key
+    queryset = queryset.values(
+        'toll_date', 'toll_hour', 'day_of_week_int', 'crz_entries', 'toll_week',
+        *(key_field for key_field, _ in DIMENSION_FIELDS.values())
     )
     df = pd.DataFrame(list(queryset))
 
     if not df.empty:
+        for column, (key_field, dimension) in DIMENSION_FIELDS.items():
+            keys = df.pop(key_field)
+            df[column] = keys.map(dimension.names(keys.unique().tolist()))
+    archived = read_archive_table(start, end, columns=[
+        'toll_date', 'toll_hour', 'day_of_week_int', 'crz_entries', 'toll_week', *DIMENSION_FIELDS
+    ])
+    if archived is not None:
+        archived = archived.to_pandas()
+        df = pd.concat([archived, df], ignore_index=True) if not df.empty else archived
+
+    if not df.empty:
+        df['hour_of_day'] = df.pop('toll_hour')
+        df['day_of_week'] = df['day_of_week_int'].map(dict(enumerate(WEEKDAY_NAMES, start=1)))
+        df = df[[
+            'toll_date', 'hour_of_day', 'day_of_week', 'day_of_week_int',
+            'vehicle_class', 'detection_region', 'crz_entries', 'time_period',
+            'detection_group', 'toll_week'
+        ]]
+
         # Basic cleaning/type conversion right after fetch
         if 'toll_date' in df.columns:
             df['toll_date'] = pd.to_datetime(df['toll_date'], errors='coerce')
@@ -170,67 +260,95 @@ def get_base_vehicle_data():
 
         # Drop rows with essential missing data after conversion
         df.dropna(subset=['toll_date', 'crz_entries', 'detection_region', 'vehicle_class'], inplace=True)
-
-        # Cache the DataFrame as a JSON string
-        try:
-            df_json = df.to_json(orient='split', date_format='iso', default_handler=str)
-            cache.set(BASE_DATA_CACHE_KEY, df_json, CACHE_TIMEOUT)
-        except Exception as e:
-            print(f"Error serializing DataFrame for cache: {e}")
-            # Don't cache if serialization fails
     else:
-        # Handle empty DataFrame: Create one with the expected columns
         print("--- DB query returned no data, creating empty DataFrame with schema ---")
-        expected_columns = [
-            'toll_date', 'hour_of_day', 'day_of_week', 'day_of_week_int',
-            'vehicle_class', 'detection_region', 'crz_entries', 'time_period',
-            'detection_group', 'toll_week'
-        ]
-        df = pd.DataFrame(columns=expected_columns)
-        # Define appropriate dtypes for an empty DataFrame to help Perspective
-        df = df.astype({
-            'toll_date': 'datetime64[ns, UTC]', # Ensure timezone aware
-            'hour_of_day': 'int',
-            'day_of_week': 'object', # Or category
-            'day_of_week_int': 'int',
-            'vehicle_class': 'object',
-            'detection_region': 'object',
-            'crz_entries': 'int',
-            'time_period': 'object',
-            'detection_group': 'object',
-            'toll_week': 'object'
-        })
-        # Cache the empty DataFrame with schema
-        try:
-            df_json = df.to_json(orient='split', date_format='iso', default_handler=str)
-            cache.set(BASE_DATA_CACHE_KEY, df_json, CACHE_TIMEOUT)
-        except Exception as e:
-             print(f"Error serializing empty DataFrame for cache: {e}")
+        df = empty_vehicle_frame()
 
     return df
 
+def empty_vehicle_frame():
+    """An empty base frame with the expected columns and dtypes."""
+    expected_columns = [
+        'toll_date', 'hour_of_day', 'day_of_week', 'day_of_week_int',
+        'vehicle_class', 'detection_region', 'crz_entries', 'time_period',
+        'detection_group', 'toll_week'
+    ]
+    df = pd.DataFrame(columns=expected_columns)
+    # Define appropriate dtypes for an empty DataFrame to help Perspective
+    return df.astype({
+        'toll_date': 'datetime64[ns, UTC]', # Ensure timezone aware
+        'hour_of_day': 'int',
+        'day_of_week': 'object', # Or category
+        'day_of_week_int': 'int',
+        'vehicle_class': 'object',
+        'detection_region': 'object',
+        'crz_entries': 'int',
+        'time_period': 'object',
+        'detection_group': 'object',
+        'toll_week': 'object'
+    })
+
+@cached_section(MONTH_DASHBOARD_CACHE_KEY)
+def get_month_dashboard_part(month, versions):
+    """
+    Hourly aggregation of one month's rows, cached per month version so an import only
+    recomputes the months it touched. Hourly rows are keyed by toll_date, so the months'
+    frames concatenate into the whole-history aggregation. The header stats are not part
+    of it: they come from the running totals (see running_totals).
+    """
+    part = read_month_rollup(month, versions.get(month, 0))
+    if part is not None:
+        print(f"--- Snapshot Hit: Dashboard month {month} ---")
+        mark_cache_hit()
+        return part
+
+    cache_key = partition_key(MONTH_DASHBOARD_CACHE_KEY, month, versions)
+    part = cache.get(cache_key)
+    if part is not None:
+        print(f"--- Cache Hit: Dashboard month {month} ---")
+        mark_cache_hit()
+        return part
+
+    print(f"--- Cache Miss: Aggregating dashboard month {month} ---")
+    df = get_vehicle_partition(month, versions)
+    df['month_year'] = df['toll_date'].dt.strftime('%Y-%m') # Used by the monthly view
+    hourly_agg = perform_aggregations(df).get('hourly')
+    part = {'hourly': hourly_agg if hourly_agg is not None else pd.DataFrame()}
+    cache.set(cache_key, part, CACHE_TIMEOUT)
+    return part
+
+def combine_dashboard_parts(parts):
+    """Whole-history hourly aggregation frame from per-month parts."""
+    frames = [part['hourly'] for part in parts if not part['hourly'].empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+@cached_section(AGG_JSON_CACHE_KEY)
 def get_dashboard_data():
     """
     Gets required data for the main dashboard view (stats, agg_json, schema) from cache or generates it.
     Returns: A tuple (stats_dict, agg_json_string, schema_dict)
     """
-    stats = cache.get(STATS_CACHE_KEY)
-    agg_json = cache.get(AGG_JSON_CACHE_KEY)
-    schema = cache.get(SCHEMA_CACHE_KEY) # Check for cached schema
+    versions = partition_versions()
+    stats_key = versioned_key(STATS_CACHE_KEY, versions)
+    agg_json_key = versioned_key(AGG_JSON_CACHE_KEY, versions)
+    schema_key = versioned_key(SCHEMA_CACHE_KEY, versions)
+    stats = cache.get(stats_key)
+    agg_json = cache.get(agg_json_key)
+    schema = cache.get(schema_key) # Check for cached schema
 
     if stats is not None and agg_json is not None and schema is not None:
         print("--- Cache Hit: Dashboard data (stats, agg_json, schema) ---")
+        mark_cache_hit()
         return stats, agg_json, schema
 
     print("--- Cache Miss: Generating dashboard data & schema ---")
-    df = get_base_vehicle_data()
+    months = data_months()
 
-    # *** Derive schema from the BASE dataframe ***
     # Always get the comprehensive schema
-    base_schema = get_perspective_schema(df)
+    base_schema = get_perspective_schema(None)
     print(f"[Debug] Using complete schema with {len(base_schema)} columns")
 
-    if df.empty:
+    if not months:
         print("--- Base data is empty, returning default dashboard data & base schema ---")
         default_stats = {'total_entries': 0, 'region_data': [], 'total_volume': 0}
         
@@ -315,26 +433,26 @@ def get_dashboard_data():
         print(f"[Debug] Created {len(sample_data)} sample data points for empty dataset")
         
         # Cache defaults including the base schema
-        cache.set(STATS_CACHE_KEY, default_stats, CACHE_TIMEOUT)
-        cache.set(AGG_JSON_CACHE_KEY, default_agg_json, CACHE_TIMEOUT)
-        cache.set(SCHEMA_CACHE_KEY, base_schema, CACHE_TIMEOUT) # Cache the schema
+        cache.set(stats_key, default_stats, CACHE_TIMEOUT)
+        cache.set(agg_json_key, default_agg_json, CACHE_TIMEOUT)
+        cache.set(schema_key, base_schema, CACHE_TIMEOUT) # Cache the schema
         return default_stats, default_agg_json, base_schema
 
     try:
-        # Calculate stats
-        total_entries, region_data, total_volume = calculate_base_stats(df.copy())
-        calculated_stats = {'total_entries': total_entries, 'region_data': region_data, 'total_volume': total_volume}
-
-        # Perform aggregations
+        # Hourly aggregation per month; only months whose version changed are recomputed
         # IMPORTANT: Ensure aggregations uses column names consistent with base_schema if possible,
         # or Perspective might have issues if data columns don't match the schema later.
-        aggregations = perform_aggregations(df.copy()) # Returns list of dicts
+        hourly_agg = combine_dashboard_parts(
+            [get_month_dashboard_part(month, versions) for month in months])
+        calculated_stats = dashboard_stats()  # Running totals kept by ingest, not a pass over the rows
         
         # --- Add Debug Logging --- 
         print(f"[Debug Cache] Base Schema derived: {base_schema}")
-        if isinstance(aggregations, list) and len(aggregations) > 0:
-            print(f"[Debug Cache] First aggregation record structure: {aggregations[0].keys() if isinstance(aggregations[0], dict) else 'Non-dict item'}")
-            print(f"[Debug Cache] Total aggregation records: {len(aggregations)}")
+        if hourly_agg is not None and not hourly_agg.empty:
+            print(f"[Debug Cache] Hourly aggregation columns: {list(hourly_agg.columns)}")
+            print(f"[Debug Cache] Total aggregation records: {len(hourly_agg)}")
+            # Serialised from the DataFrame in chunks, without building a list of dicts
+            calculated_agg_json = frame_to_json(hourly_agg)
         else:
             print("[Debug Cache] Aggregations result is empty or not a list.")
             print("[Debug Cache] Using sample data because aggregations were empty/invalid")
@@ -384,21 +502,13 @@ def get_dashboard_data():
                             })
             
             print(f"[Debug Cache] Created {len(aggregations)} fallback aggregation records")
+            calculated_agg_json = json.dumps(aggregations, cls=DjangoJSONEncoder)
         # --- End Debug Logging ---
-        
-        calculated_agg_json = json.dumps(aggregations, cls=DjangoJSONEncoder)
-        
-        # Print a sample of what we're putting in the cache
-        try:
-            if aggregations and len(aggregations) > 0:
-                print(f"[Debug Cache] Sample aggregation item: {aggregations[0]}")
-        except Exception as e:
-            print(f"[Debug Cache] Error showing sample: {e}")
             
         # Cache the results, including the BASE schema
-        cache.set(STATS_CACHE_KEY, calculated_stats, CACHE_TIMEOUT)
-        cache.set(AGG_JSON_CACHE_KEY, calculated_agg_json, CACHE_TIMEOUT)
-        cache.set(SCHEMA_CACHE_KEY, base_schema, CACHE_TIMEOUT) # Cache the base schema
+        cache.set(stats_key, calculated_stats, CACHE_TIMEOUT)
+        cache.set(agg_json_key, calculated_agg_json, CACHE_TIMEOUT)
+        cache.set(schema_key, base_schema, CACHE_TIMEOUT) # Cache the base schema
 
         return calculated_stats, calculated_agg_json, base_schema
 
@@ -411,139 +521,101 @@ def get_dashboard_data():
         default_agg_json = "[]"
         # Attempt to cache defaults including the schema even on error
         try:
-            cache.set(STATS_CACHE_KEY, default_stats, CACHE_TIMEOUT)
-            cache.set(AGG_JSON_CACHE_KEY, default_agg_json, CACHE_TIMEOUT)
-            cache.set(SCHEMA_CACHE_KEY, base_schema, CACHE_TIMEOUT)
+            cache.set(stats_key, default_stats, CACHE_TIMEOUT)
+            cache.set(agg_json_key, default_agg_json, CACHE_TIMEOUT)
+            cache.set(schema_key, base_schema, CACHE_TIMEOUT)
         except Exception as cache_e:
              print(f"Could not cache default values during error handling: {cache_e}")
         return default_stats, default_agg_json, base_schema
 
 
+@cached_section(DASHBOARD_PAYLOAD_CACHE_KEY)
+def get_dashboard_payload():
+    """
+    The dashboard's aggregation rows and Perspective schema as one JSON document,
+    compressed once per build. Returns a dict with 'etag' (content hash),
+    'last_modified' (build time) and 'variants' ({encoding: bytes}).
+    """
+    cache_key = versioned_key(DASHBOARD_PAYLOAD_CACHE_KEY)
+    payload = cache.get(cache_key)
+    if payload is not None:
+        print("--- Cache Hit: Dashboard payload ---")
+        mark_cache_hit()
+        return payload
+
+    print("--- Cache Miss: Building dashboard payload ---")
+    _, agg_json, schema = get_dashboard_data()
+    # agg_json is already serialised; splice it in rather than parsing it again
+    body = f'{{"schema": {json.dumps(schema)}, "data": {agg_json}}}'.encode()
+    payload = {
+        'etag': hashlib.sha256(body).hexdigest()[:32],
+        'last_modified': timezone.now().replace(microsecond=0),  # HTTP dates have 1s resolution
+        'variants': compress_variants(body),
+    }
+    cache.set(cache_key, payload, CACHE_TIMEOUT)
+    return payload
+
+
+@cached_section(MAP_DATA_CACHE_KEY)
 def get_map_data():
     """
     Gets required data for the map view from cache or generates it.
     Returns a dictionary containing 'deck_data', 'min_date', 'max_date'.
     """
-    map_data_list = cache.get(MAP_DATA_CACHE_KEY) # Expecting list of dicts
-    date_range = cache.get(DATE_RANGE_CACHE_KEY) # Expecting dict
+    versions = partition_versions()
+    map_data_key = versioned_key(MAP_DATA_CACHE_KEY, versions)
+    date_range_key = versioned_key(DATE_RANGE_CACHE_KEY, versions)
+    map_data_list = cache.get(map_data_key) # Expecting list of dicts
+    date_range = cache.get(date_range_key) # Expecting dict
 
     # Check if *both* are cached and seem valid (basic check)
     if isinstance(map_data_list, list) and isinstance(date_range, dict) and 'min_date' in date_range:
         print("--- Cache Hit: Map data ---")
+        mark_cache_hit()
         return {'deck_data': map_data_list, **date_range}
 
     print("--- Cache Miss: Generating map data ---")
-    df = get_base_vehicle_data()
+    # Imported here: map_data imports the constants defined in this module
+    from .map_data import build_map_frame, daily_date_range, daily_totals
 
     # Define default return structure
     default_min_date = (timezone.now() - timedelta(days=30)).strftime('%Y-%m-%d')
     default_max_date = timezone.now().strftime('%Y-%m-%d')
     default_return_data = {'deck_data': [], 'min_date': default_min_date, 'max_date': default_max_date}
 
-    if df.empty or 'toll_date' not in df.columns or 'detection_region' not in df.columns:
-        print("--- Base data empty or missing required columns for map, returning default map data ---")
-        cache.set(MAP_DATA_CACHE_KEY, default_return_data['deck_data'], CACHE_TIMEOUT)
-        cache.set(DATE_RANGE_CACHE_KEY, {'min_date': default_return_data['min_date'], 'max_date': default_return_data['max_date']}, CACHE_TIMEOUT)
-        return default_return_data
-
     try:
-        df_map = df.copy() # Work on a copy
-
-        # Ensure date column is datetime and drop NaNs *again* just in case
-        df_map['toll_date'] = pd.to_datetime(df_map['toll_date'], errors='coerce', utc=True)
-        df_map.dropna(subset=['toll_date', 'detection_region', 'crz_entries', 'vehicle_class'], inplace=True)
-
-        if df_map.empty: # Check after dropna
-             print("--- Data empty after cleaning for map, returning default map data ---")
-             cache.set(MAP_DATA_CACHE_KEY, default_return_data['deck_data'], CACHE_TIMEOUT)
-             cache.set(DATE_RANGE_CACHE_KEY, {'min_date': default_return_data['min_date'], 'max_date': default_return_data['max_date']}, CACHE_TIMEOUT)
-             return default_return_data
-
-        # Get date range *after* cleaning
-        min_date_dt = df_map['toll_date'].min()
-        max_date_dt = df_map['toll_date'].max()
-
-        # Use defaults if min/max calculation fails (e.g., all dates were NaT)
-        min_date_str = min_date_dt.strftime('%Y-%m-%d') if pd.notna(min_date_dt) else default_min_date
-        max_date_str = max_date_dt.strftime('%Y-%m-%d') if pd.notna(max_date_dt) else default_max_date
-        calculated_date_range = {'min_date': min_date_str, 'max_date': max_date_str}
-
-        # --- Start: Map Specific Logic ---
-        df_map['location_coords'] = df_map['detection_region'].map(ENTRY_POINTS)
-        df_map = df_map.dropna(subset=['location_coords']) # Only keep rows matching known entry points
-
-        if df_map.empty:
+        # Read the pre-aggregated daily totals; fall back to the raw rows if they were never built
+        min_date, max_date = daily_date_range()
+        if min_date is not None:
+            totals = daily_totals()
+        else:
+            # Sum a month partition at a time rather than loading the whole history at once
+            month_totals = []
+            for df in iter_vehicle_partitions(versions=versions):
+                if df.empty:
+                    continue
+                if min_date is None:
+                    min_date = df['toll_date'].iloc[0]
+                max_date = df['toll_date'].iloc[-1]
+                month_totals.append(df.groupby(['detection_group', 'vehicle_class'], as_index=False)['crz_entries'].sum())
+            if not month_totals:
+                print("--- Base data empty, returning default map data ---")
+                cache.set(map_data_key, default_return_data['deck_data'], CACHE_TIMEOUT)
+                cache.set(date_range_key, {'min_date': default_return_data['min_date'], 'max_date': default_return_data['max_date']}, CACHE_TIMEOUT)
+                return default_return_data
+            totals = pd.concat(month_totals).groupby(['detection_group', 'vehicle_class'], as_index=False)['crz_entries'].sum()
+
+        calculated_date_range = {
+            'min_date': min_date.strftime('%Y-%m-%d') if pd.notna(min_date) else default_min_date,
+            'max_date': max_date.strftime('%Y-%m-%d') if pd.notna(max_date) else default_max_date,
+        }
+        calculated_deck_data = build_map_frame(totals).to_dict(orient='records')
+        if not calculated_deck_data:
             print("--- No data matches known ENTRY_POINTS, returning default map data ---")
-            cache.set(MAP_DATA_CACHE_KEY, default_return_data['deck_data'], CACHE_TIMEOUT)
-            cache.set(DATE_RANGE_CACHE_KEY, calculated_date_range, CACHE_TIMEOUT) # Cache the calculated range though
-            return {'deck_data': [], **calculated_date_range}
-
-        # Extract lat/lng
-        df_map['lat'] = df_map['location_coords'].apply(lambda x: x[0] if isinstance(x, list) and len(x) == 2 else None)
-        df_map['lng'] = df_map['location_coords'].apply(lambda x: x[1] if isinstance(x, list) and len(x) == 2 else None)
-        df_map = df_map.dropna(subset=['lat', 'lng']) # Drop rows if lat/lng extraction failed
-
-        # Map vehicle_class to standardized types
-        df_map['vehicle_type'] = df_map['vehicle_class'].map(VEHICLE_CLASS_MAPPING).fillna('other') # Map or assign 'other'
-
-        # Aggregate data by *mapped* entry point and *standardized* vehicle type
-        location_data = df_map.groupby(['detection_region', 'vehicle_type', 'lat', 'lng'], observed=True).agg(
-            crz_entries=('crz_entries', 'sum')
-        ).reset_index()
-
-        calculated_deck_data = []
-        if not location_data.empty:
-            # Normalize entries
-            max_entries = location_data['crz_entries'].max()
-            if max_entries is None or max_entries <= 0: max_entries = 1 # Avoid division by zero/negative
-            location_data['entries_normalized'] = (location_data['crz_entries'] / max_entries * 100).fillna(0)
-
-            # Assign colors and order
-            location_data['color'] = location_data['vehicle_type'].apply(
-                lambda x: VEHICLE_TYPES.get(x, {'color': [100, 100, 100]})['color']
-            )
-            location_data['order'] = location_data['vehicle_type'].apply(
-                lambda x: VEHICLE_TYPES.get(x, {'order': 99})['order']
-            )
-
-            # Calculate height
-            location_data['height'] = (location_data['entries_normalized'] * 5).clip(lower=1) # Scale height, ensure minimum height for visibility
-
-            # Calculate position offsets
-            offset_step = 0.00025 # Adjusted offset
-            all_rows_data = []
-
-            for region, group in location_data.groupby(['detection_region', 'lat', 'lng'], observed=True):
-                type_count = len(group)
-                # Ensure consistent sorting for offset calculation
-                sorted_group = group.sort_values('order')
-
-                for i, (idx, row) in enumerate(sorted_group.iterrows()):
-                    offset = (i - (type_count - 1) / 2.0) * offset_step
-                    row_dict = row.to_dict()
-                    # Apply offset to longitude
-                    row_dict['lng_offset'] = row['lng'] + offset
-
-                    # Select and format fields for deck.gl JSON
-                    deck_entry = {
-                        'detection_region': row_dict.get('detection_region'),
-                        'vehicle_type': row_dict.get('vehicle_type'),
-                        'lat': row_dict.get('lat'),
-                        'lng': row_dict.get('lng'),
-                        'lng_offset': row_dict.get('lng_offset'),
-                        'crz_entries': int(row_dict.get('crz_entries', 0)), # Ensure integer
-                        'color': row_dict.get('color'),
-                        'height': float(row_dict.get('height', 1.0)), # Ensure float
-                        'order': int(row_dict.get('order', 99)), # Ensure integer
-                    }
-                    all_rows_data.append(deck_entry)
-
-            calculated_deck_data = all_rows_data
-        # --- End: Map Specific Logic ---
 
         # Cache the results (deck_data list and date_range dict)
-        cache.set(MAP_DATA_CACHE_KEY, calculated_deck_data, CACHE_TIMEOUT)
-        cache.set(DATE_RANGE_CACHE_KEY, calculated_date_range, CACHE_TIMEOUT)
+        cache.set(map_data_key, calculated_deck_data, CACHE_TIMEOUT)
+        cache.set(date_range_key, calculated_date_range, CACHE_TIMEOUT)
 
         return {'deck_data': calculated_deck_data, **calculated_date_range}
 
@@ -554,17 +626,22 @@ def get_map_data():
         # Return defaults on error, don't cache error state for map
         return default_return_data    
 
+@cached_section(ANOMALIES_CACHE_KEY)
 def get_cached_anomalies():
     """
     Gets anomalies data from cache or generates it.
     Returns a tuple (anomalies_json, first_date, last_date, total_entries)
     """
     # Check if anomaly data is cached
-    cached_anomalies = cache.get(ANOMALIES_CACHE_KEY)
-    cached_date_range = cache.get(ANOMALY_DATE_RANGE_KEY)
+    versions = partition_versions()
+    anomalies_key = versioned_key(ANOMALIES_CACHE_KEY, versions)
+    date_range_key = versioned_key(ANOMALY_DATE_RANGE_KEY, versions)
+    cached_anomalies = cache.get(anomalies_key)
+    cached_date_range = cache.get(date_range_key)
     
     if cached_anomalies and cached_date_range:
         print("--- Cache Hit: Anomalies data ---")
+        mark_cache_hit()
         return cached_anomalies, cached_date_range['first_date'], cached_date_range['last_date'], cached_date_range['total_entries']
     
     print("--- Cache Miss: Generating anomalies data ---")
@@ -576,38 +653,35 @@ def get_cached_anomalies():
     anomaly_detector = AnomalyDetector()
     
     try:
-        # Get all entries from the database
-        from .models import VehicleEntry
+        # Every entry in event-time order: the database's rows merged with the days retention archived
         entries = VehicleEntry.objects.all().order_by('toll_date', 'toll_hour', 'minute_of_hour')
-        total_entries = entries.count()
+        total_entries = 0
+        first_date = last_date = None
+        for entry in heapq.merge(iter_archived_entries(), entries.iterator(),
+                                 key=attrgetter('toll_date', 'toll_hour', 'minute_of_hour')):
+            anomaly_detector.update(entry)
+            total_entries += 1
+            first_date = first_date or entry.toll_date
+            last_date = entry.toll_date
         
         if total_entries == 0:
             print("No entries found in database for anomaly detection")
             return "[]", None, None, 0
         
-        # Process all entries through the anomaly detector
-        for entry in entries:
-            anomaly_detector.update(entry)
-        
         # Detect anomalies
         current_anomalies = anomaly_detector.detect_anomalies()
         
-        # Get date range
-        first_date = entries.first().toll_date
-        last_date = entries.last().toll_date
-        
-        # Convert to JSON string
-        from django.core.serializers.json import DjangoJSONEncoder
-        anomalies_json = json.dumps(current_anomalies, cls=DjangoJSONEncoder)
+        # Convert to JSON string column-wise rather than through an encoder hook per object
+        anomalies_json = frame_to_json(records_frame(current_anomalies))
         
         # Cache the results
-        cache.set(ANOMALIES_CACHE_KEY, anomalies_json, CACHE_TIMEOUT)
+        cache.set(anomalies_key, anomalies_json, CACHE_TIMEOUT)
         date_range_data = {
             'first_date': first_date,
             'last_date': last_date,
             'total_entries': total_entries
         }
-        cache.set(ANOMALY_DATE_RANGE_KEY, date_range_data, CACHE_TIMEOUT)
+        cache.set(date_range_key, date_range_data, CACHE_TIMEOUT)
         
         return anomalies_json, first_date, last_date, total_entries
         
@@ -619,22 +693,18 @@ def get_cached_anomalies():
 
 def clear_anomaly_cache():
     """Clear the anomaly cache specifically"""
-    cache.delete(ANOMALIES_CACHE_KEY)
-    cache.delete(ANOMALY_DATE_RANGE_KEY)
+    versions = partition_versions()
+    cache.delete(versioned_key(ANOMALIES_CACHE_KEY, versions))
+    cache.delete(versioned_key(ANOMALY_DATE_RANGE_KEY, versions))
     print("--- Cleared Anomaly Data Cache ---")
 
-# Update the existing clear_vehicle_cache function to also clear anomaly cache
 def clear_vehicle_cache():
-    """Utility function to clear all related cache entries."""
-    keys_to_clear = [
-        BASE_DATA_CACHE_KEY,
-        STATS_CACHE_KEY,
-        AGG_JSON_CACHE_KEY,
-        MAP_DATA_CACHE_KEY,
-        DATE_RANGE_CACHE_KEY,
-        ANOMALIES_CACHE_KEY,        # Add the anomaly keys here
-        ANOMALY_DATE_RANGE_KEY
-    ]
-    for key in keys_to_clear:
-        cache.delete(key)
+    """
+    Force every artifact to be rebuilt: bumps the version of every month with data, so
+    all versioned keys in every process's cache are left behind at once.
+    Imports don't need this; they bump only the months they touched.
+    """
+    bump_partitions(data_months())
+    from .dashboard_query import query_cache
+    query_cache.clear()
     print("--- Cleared All Cache Data ---")
\ No newline at end of file
@@ -0,0 +1,54 @@
+"""
+Pre-compressed response bodies.
+
+Large payloads that only change with the data are compressed once per version and
+the stored variant matching the client's Accept-Encoding is sent as is.
+"""
+import gzip
+import re
+
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip is always available
+    brotli = None
+
+# Preferred first
+ENCODINGS = ('br', 'gzip', 'identity')
+
+
+def compress_variants(body: bytes):
+    """{encoding: bytes} for every encoding this process can produce."""
+    variants = {'identity': body, 'gzip': gzip.compress(body, compresslevel=6, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=9)
+    return variants
+
+
+def quality(text):
+    """q-value of an Accept-Encoding entry; a missing or malformed one counts as 1."""
+    try:
+        return float(text or 1)
+    except ValueError:
+        return 1.0
+
+
+def choose_encoding(request, available):
+    """Best encoding in `available` the client accepts (q=0 excludes one)."""
+    accepted = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        match = re.match(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?', part)
+        if match and quality(match.group(2)) > 0:
+            accepted.add(match.group(1).lower())
+    for encoding in ENCODINGS:
+        if encoding in available and (encoding in accepted or '*' in accepted or encoding == 'identity'):
+            return encoding
+    return 'identity'
+
+
+def set_encoding_headers(response, encoding):
+    if encoding != 'identity':
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
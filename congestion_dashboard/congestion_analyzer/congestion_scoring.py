@@ -1,31 +1,59 @@
-from datetime import datetime
+from datetime import date, datetime
+from enum import Enum
 import math
-from typing import Dict, List
+import os
+import time
+from typing import Any, Dict, List
+from urllib.parse import urlsplit
 import httpx
 import asyncio
-from pydantic import BaseModel
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from pydantic import BaseModel, ConfigDict, TypeAdapter, ValidationError
+
+from . import metrics
+from .score_state import get_score_backend, remember_snapshot
+
+
+class VehicleClass(str, Enum):
+    CARS = "1 - Cars, Pickups and Vans"
+    SINGLE_UNIT_TRUCKS = "2 - Single-Unit Trucks"
+    MULTI_UNIT_TRUCKS = "3 - Multi-Unit Trucks"
+    BUSES = "4 - Buses"
+    MOTORCYCLES = "5 - Motorcycles"
+    TAXI_FHV = "TLC Taxi/FHV"
+
+
+class TimePeriod(str, Enum):
+    OVERNIGHT = "Overnight"
+    OFF_PEAK = "Off-Peak"
+    PEAK = "Peak"
+
 
 # Vehicle class weights (normalized between 0-1)
 VEHICLE_WEIGHTS = {
-    "1 - Cars, Pickups and Vans": 0.4,
-    "2 - Single-Unit Trucks": 0.7,
-    "3 - Multi-Unit Trucks": 1.0,  # Highest impact
-    "4 - Buses": 0.8,
-    "5 - Motorcycles": 0.2,  # Lowest impact
-    "TLC Taxi/FHV": 0.5
+    VehicleClass.CARS: 0.4,
+    VehicleClass.SINGLE_UNIT_TRUCKS: 0.7,
+    VehicleClass.MULTI_UNIT_TRUCKS: 1.0,  # Highest impact
+    VehicleClass.BUSES: 0.8,
+    VehicleClass.MOTORCYCLES: 0.2,  # Lowest impact
+    VehicleClass.TAXI_FHV: 0.5
 }
 
 # Time period weights (normalized between 0-1)
 TIME_PERIOD_WEIGHTS = {
-    "Overnight": 0.3,
-    "Off-Peak": 0.6,
-    "Peak": 1.0
+    TimePeriod.OVERNIGHT: 0.3,
+    TimePeriod.OFF_PEAK: 0.6,
+    TimePeriod.PEAK: 1.0
 }
 
 # Time decay parameters
 DECAY_FACTOR = 0.05  # Reduced from 0.1 for slower decay
 LEVY_SCALE = 2.0     # Scale parameter for Lévy distribution
 MIN_DECAY = 0.9      # Minimum decay factor to prevent too rapid decay
+TOLL_FETCH_LIMIT = 1000  # Records per refresh (the upstream API's default page size)
+SCORE_REFRESH_LEASE_CACHE_KEY = 'congestion_score_refresh_lease_v1'
 
 def levy_decay(time_diff: float) -> float:
     """
@@ -42,23 +70,64 @@ def levy_decay(time_diff: float) -> float:
     return max(MIN_DECAY, decay)
 
 class TollData(BaseModel):
-    toll_date: str
-    toll_hour: str
-    toll_10_minute_block: str
-    minute_of_hour: str
-    hour_of_day: str
-    day_of_week_int: str
+    """One upstream record, typed once at the boundary so scoring never re-parses strings."""
+    model_config = ConfigDict(extra="ignore")  # Upstream may add fields we don't score on
+
+    toll_date: date
+    toll_hour: datetime
+    toll_10_minute_block: datetime
+    minute_of_hour: int
+    hour_of_day: int
+    day_of_week_int: int
     day_of_week: str
-    toll_week: str
-    time_period: str
-    vehicle_class: str
+    toll_week: date
+    time_period: TimePeriod
+    vehicle_class: VehicleClass
     detection_group: str
     detection_region: str
-    crz_entries: str
-    excluded_roadway_entries: str
+    crz_entries: int
+    excluded_roadway_entries: int = 0
+
+    @property
+    def event_time(self) -> datetime:
+        """When the traffic happened (start of its 10-minute block), as opposed to when we fetched it."""
+        return self.toll_10_minute_block
+
+
+# Built once: validating the whole payload in one call keeps the loop inside pydantic-core
+TOLL_DATA_LIST_ADAPTER = TypeAdapter(List[TollData])
 
-    class Config:
-        extra = "allow"  # Allow extra fields in the JSON
+
+def parse_toll_data(entries: List[Dict[str, Any]]) -> List[TollData]:
+    """
+    Turn a decoded upstream payload into typed records.
+    The list is validated in one pass; if any record is invalid we fall back to
+    per-record validation so a single bad row doesn't discard the whole refresh.
+    """
+    if not entries:
+        return []
+    try:
+        return TOLL_DATA_LIST_ADAPTER.validate_python(entries)
+    except ValidationError as e:
+        print(f"[Scoring] Bulk validation failed ({e.error_count()} errors), validating records individually")
+
+    records = []
+    for entry in entries:
+        try:
+            records.append(TollData.model_validate(entry))
+        except ValidationError:
+            continue
+    print(f"[Scoring] Kept {len(records)} of {len(entries)} records after validation")
+    return records
+
+
+def parse_trusted_toll_json(payload: bytes) -> List[TollData]:
+    """
+    Fast path for sources we control (e.g. the local replay feed).
+    Raw bytes go straight to pydantic-core, skipping the intermediate list of dicts
+    and the per-record fallback - a malformed record here is a bug and raises.
+    """
+    return TOLL_DATA_LIST_ADAPTER.validate_json(payload)
 
 class CongestionScore:
     def __init__(self):
@@ -70,18 +139,44 @@ class CongestionScore:
         self.score_history: Dict[str, List[float]] = {}  # Track recent scores
         self.history_window = 10  # Number of recent scores to keep
 
+    def to_state(self) -> Dict[str, Any]:
+        """JSON-safe copy of everything needed to resume scoring in another process."""
+        return {
+            'clock': 'event_time',
+            'scores': self.scores,
+            'last_update': {group: ts.isoformat() for group, ts in self.last_update.items()},
+            'historical_max': self.historical_max,
+            'historical_min': self.historical_min,
+            'base_max': self.base_max,
+            'score_history': self.score_history,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "CongestionScore":
+        scorer = cls()
+        if not state:
+            return scorer
+        scorer.scores = dict(state.get('scores', {}))
+        if state.get('clock') == 'event_time':  # Older snapshots stored wall-clock refresh times
+            scorer.last_update = {group: datetime.fromisoformat(ts) for group, ts in state.get('last_update', {}).items()}
+        else:
+            scorer.scores = {}
+        scorer.historical_max = dict(state.get('historical_max', {}))
+        scorer.historical_min = dict(state.get('historical_min', {}))
+        scorer.base_max = dict(state.get('base_max', {}))
+        scorer.score_history = {group: list(history) for group, history in state.get('score_history', {}).items()}
+        return scorer
+
     def calculate_score(self, data: TollData) -> float:
         # Base score from vehicle count and excluded entries
-        base_score = int(data.crz_entries)
-        excluded_entries = int(data.excluded_roadway_entries) if data.excluded_roadway_entries else 0
-        total_traffic = base_score + excluded_entries
+        total_traffic = data.crz_entries + data.excluded_roadway_entries
         
         # Get weights
         vehicle_weight = VEHICLE_WEIGHTS.get(data.vehicle_class, 0.5)
         time_period_weight = TIME_PERIOD_WEIGHTS.get(data.time_period, 0.5)
         
         # Time-based adjustments
-        hour = int(data.hour_of_day)
+        hour = data.hour_of_day
         time_factor = 1.0
         
         # Rush hour adjustment (7-10 AM and 4-7 PM)
@@ -158,13 +253,16 @@ class CongestionScore:
         # Return smoothed score (average of recent scores)
         return sum(self.score_history[data.detection_group]) / len(self.score_history[data.detection_group])
 
-    def update_score(self, detection_group: str, score: float):
-        current_time = datetime.now()
-        
+    def update_score(self, detection_group: str, score: float, event_time: datetime):
+        """
+        Blend a new score into the running one, decaying by the event-time gap since
+        the group's previous record so results don't depend on when the refresh ran.
+        """
         # Apply time decay to existing score
         if detection_group in self.scores:
-            time_diff = (current_time - self.last_update[detection_group]).total_seconds() / 3600
-            decay_factor = levy_decay(time_diff)
+            last_event_time = self.last_update[detection_group]
+            time_diff = (event_time - last_event_time).total_seconds() / 3600
+            decay_factor = levy_decay(time_diff)  # Late or duplicate records (time_diff <= 0) don't decay
             
             # Calculate new score with heavy smoothing
             old_score = self.scores[detection_group]
@@ -172,29 +270,83 @@ class CongestionScore:
             
             # Weighted average heavily favoring the existing score
             self.scores[detection_group] = max(1, min(100, 0.8 * decayed_score + 0.2 * score))
+            self.last_update[detection_group] = max(last_event_time, event_time)
         else:
             self.scores[detection_group] = score
-            
-        self.last_update[detection_group] = current_time
+            self.last_update[detection_group] = event_time
 
+    def score_records(self, records: List[TollData]):
+        """Score a batch in event-time order so replays and live refreshes agree."""
+        for toll_data in sorted(records, key=lambda record: record.event_time):
+            score = self.calculate_score(toll_data)
+            self.update_score(toll_data.detection_group, score, toll_data.event_time)
 
-# Create a global instance to be used throughout the app
-congestion_score_instance = CongestionScore()
 
-async def fetch_toll_data():
-    async with httpx.AsyncClient() as client:
-        response = await client.get("https://data.ny.gov/resource/t6yz-b64h.json")
-        return response.json()
+def scores_refresh_inline() -> bool:
+    """
+    'external' (default): only the refresh_scores command writes; workers just read snapshots.
+    'inline': requests take turns refreshing the shared state (see claim_inline_refresh).
+    """
+    return getattr(settings, 'CONGESTION_SCORE_REFRESH', 'external') == 'inline'
+
+def refresh_interval() -> float:
+    return getattr(settings, 'CONGESTION_SCORE_REFRESH_INTERVAL', 30.0)
 
-async def update_scores():
-    """Update all congestion scores with fresh data"""
+def claim_inline_refresh() -> bool:
+    """
+    Whether the calling request should run the next refresh. In 'inline' mode cache.add
+    elects one caller per refresh_interval() (across workers when the cache is shared);
+    everyone else just reads the snapshot it publishes.
+    """
+    return scores_refresh_inline() and cache.add(SCORE_REFRESH_LEASE_CACHE_KEY, os.getpid(), refresh_interval())
+
+def toll_api_url() -> str:
+    """The toll dataset's JSON endpoint; TOLL_API_BASE_URL can point at `manage.py replay_upstream`."""
+    base_url = getattr(settings, 'TOLL_API_BASE_URL', 'https://data.ny.gov').rstrip('/')
+    return f"{base_url}/resource/{getattr(settings, 'TOLL_API_DATASET', 't6yz-b64h')}.json"
+
+async def fetch_toll_data(raw: bool = False):
+    url = toll_api_url()
+    source = urlsplit(url).netloc
+    # Newest blocks first, so a growing feed (live or replayed) keeps moving the scores
+    params = {'$order': 'toll_10_minute_block DESC', '$limit': TOLL_FETCH_LIMIT}
+    started = time.perf_counter()
+    status = 'error'
     try:
-        data = await fetch_toll_data()
-        for entry in data:
-            toll_data = TollData(**entry)
-            score = congestion_score_instance.calculate_score(toll_data)
-            congestion_score_instance.update_score(toll_data.detection_group, score)
-        return congestion_score_instance.scores
-    except Exception as e:
-        print(f"Error updating scores: {e}")
-        return congestion_score_instance.scores
\ No newline at end of file
+        async with httpx.AsyncClient() as client:
+            response = await client.get(url, params=params)
+            status = response.status_code
+            return response.content if raw else response.json()
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.UPSTREAM_FETCH_DURATION.observe(elapsed, source=source, status=status)
+        metrics.record_timing('upstream', elapsed, source)
+
+async def update_scores(trusted: bool = False):
+    """
+    Fetch fresh data, fold it onto the latest shared scorer state and publish a new snapshot.
+    Pass trusted=True only for sources we control; it skips per-record fallback validation.
+    A failed fetch publishes nothing and returns the current scores; errors from the score
+    backend (lock timeouts, version conflicts) propagate.
+    """
+    backend = get_score_backend()
+    try:
+        if trusted:
+            records = parse_trusted_toll_json(await fetch_toll_data(raw=True))
+        else:
+            records = parse_toll_data(await fetch_toll_data())
+    except (httpx.HTTPError, ValidationError, ValueError) as e:  # ValueError: a body that isn't JSON
+        print(f"[Scoring] Upstream fetch failed, keeping the current scores: {e}")
+        # Backends may hit the database, which Django forbids from inside the event loop
+        snapshot = await sync_to_async(backend.load)()
+        return snapshot.scores if snapshot else {}
+
+    def advance(state):
+        # Runs under the backend's write lock, on whatever another refresher last published
+        scorer = CongestionScore.from_state(state)
+        scorer.score_records(records)
+        return scorer.scores, scorer.to_state()
+
+    snapshot = await sync_to_async(backend.publish)(advance)
+    remember_snapshot(snapshot)
+    return snapshot.scores
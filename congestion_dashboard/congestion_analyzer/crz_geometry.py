@@ -0,0 +1,202 @@
+"""
+Congestion Relief Zone geometry and the shared heatmap sampling grid.
+
+Both the map page and the heatmap endpoints use the same seeded, jittered grid of
+points inside the CRZ polygon. It is built with vectorised shapely/numpy code,
+written to disk once per configuration and memoised per process. The heatmap
+raster endpoint uses regular RasterGrids over the zone's bounding box instead.
+"""
+import hashlib
+import json
+import math
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import shapely
+from django.conf import settings
+from shapely import Polygon
+
+from .cache_utils import ENTRY_POINTS
+
+# Congestion Relief Zone boundary as (lat, lon) vertices
+CRZ_VERTICES = [
+    (40.75888, -73.95778),
+    (40.77349, -73.99493),
+    (40.76962, -73.99524),
+    (40.76312, -74.00047),
+    (40.75519, -74.00734),
+    (40.75018, -74.00931),
+    (40.74765, -74.00854),
+    (40.74134, -74.00949),
+    (40.73926, -74.01069),
+    (40.7229, -74.01202),
+    (40.70459, -74.01747),
+    (40.70107, -74.01644),
+    (40.70029, -74.01146),
+    (40.70704, -73.99896),
+    (40.71064, -73.97876),
+    (40.72898, -73.97052),
+    (40.73613, -73.97367),
+    (40.74386, -73.97079)
+]
+
+EARTH_RADIUS_KM = 6371
+METERS_PER_DEGREE_LAT = 111320
+GRID_JITTER = 0.35  # Max jitter as a fraction of the grid spacing, breaks up visible rows
+
+DEFAULT_GRID_SPACING_METERS = 350
+DEFAULT_GRID_SEED = 2025
+
+
+def crz_polygon():
+    """Shapely polygon of the zone in (lon, lat) order."""
+    return Polygon([(lon, lat) for lat, lon in CRZ_VERTICES])
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in kilometres. Arguments broadcast, so passing
+    column vectors for one side and row vectors for the other gives a full matrix.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+@dataclass(frozen=True)
+class SamplingGrid:
+    lats: np.ndarray
+    lons: np.ndarray
+    entry_names: tuple
+    distances_km: np.ndarray  # (points, entry_points)
+
+    def __len__(self):
+        return len(self.lats)
+
+    def points(self):
+        """Plain dicts for the map template's initial heatmap data."""
+        return [{'lat': lat, 'lon': lon, 'score': 0, 'previous_score': 0}
+                for lat, lon in zip(self.lats.tolist(), self.lons.tolist())]
+
+
+def build_sampling_grid(spacing_m=DEFAULT_GRID_SPACING_METERS, seed=DEFAULT_GRID_SEED):
+    """Jittered regular grid clipped to the CRZ polygon, plus distances to every entry point."""
+    polygon = crz_polygon()
+    shapely.prepare(polygon)
+    min_lon, min_lat, max_lon, max_lat = polygon.bounds
+
+    lat_step = spacing_m / METERS_PER_DEGREE_LAT
+    lon_step = spacing_m / (METERS_PER_DEGREE_LAT * np.cos(np.radians((min_lat + max_lat) / 2)))
+    grid_lats, grid_lons = np.meshgrid(
+        np.arange(min_lat + lat_step / 2, max_lat, lat_step),
+        np.arange(min_lon + lon_step / 2, max_lon, lon_step),
+        indexing='ij'
+    )
+
+    rng = np.random.default_rng(seed)
+    lats = grid_lats.ravel() + rng.uniform(-GRID_JITTER, GRID_JITTER, grid_lats.size) * lat_step
+    lons = grid_lons.ravel() + rng.uniform(-GRID_JITTER, GRID_JITTER, grid_lons.size) * lon_step
+    inside = shapely.contains_xy(polygon, lons, lats)
+    lats, lons = lats[inside], lons[inside]
+
+    entry_names, distances = entry_point_distances(lats, lons)
+    return SamplingGrid(lats, lons, entry_names, distances)
+
+
+def entry_point_distances(lats, lons):
+    """Entry point names and the (points, entry_points) distance matrix in km."""
+    entry_names = tuple(ENTRY_POINTS)
+    entry_coords = np.array([ENTRY_POINTS[name] for name in entry_names], dtype=np.float64).reshape(-1, 2)
+    distances = haversine_km(lats[:, None], lons[:, None], entry_coords[None, :, 0], entry_coords[None, :, 1])
+    return entry_names, distances
+
+
+@dataclass(frozen=True)
+class RasterGrid:
+    """Regular cells over the CRZ bounding box. Row 0 is the northern edge, as in an image."""
+    cell_m: int
+    bounds: tuple  # (west, south, east, north)
+    inside: np.ndarray  # (rows, cols) mask of cells whose centre is in the zone
+    lats: np.ndarray  # Centres of the inside cells, row-major
+    lons: np.ndarray
+    entry_names: tuple
+    distances_km: np.ndarray  # (inside cells, entry_points)
+
+    @property
+    def shape(self):
+        return self.inside.shape
+
+
+def build_raster_grid(cell_m):
+    """Cells of roughly cell_m metres covering the zone; only cells inside it carry a score."""
+    polygon = crz_polygon()
+    shapely.prepare(polygon)
+    west, south, east, north = polygon.bounds
+
+    lat_step = cell_m / METERS_PER_DEGREE_LAT
+    lon_step = cell_m / (METERS_PER_DEGREE_LAT * np.cos(np.radians((south + north) / 2)))
+    rows = math.ceil((north - south) / lat_step)
+    cols = math.ceil((east - west) / lon_step)
+    north = south + rows * lat_step
+    east = west + cols * lon_step
+
+    cell_lats, cell_lons = np.meshgrid(
+        north - (np.arange(rows) + 0.5) * lat_step,
+        west + (np.arange(cols) + 0.5) * lon_step,
+        indexing='ij'
+    )
+    inside = shapely.contains_xy(polygon, cell_lons, cell_lats)
+    lats, lons = cell_lats[inside], cell_lons[inside]
+    entry_names, distances = entry_point_distances(lats, lons)
+    return RasterGrid(cell_m, (west, south, east, north), inside, lats, lons, entry_names, distances)
+
+
+def _grid_cache_path(spacing_m, seed):
+    # The key covers everything the grid depends on, so edits to the polygon or entry points rebuild it
+    fingerprint = hashlib.sha1(
+        json.dumps([CRZ_VERTICES, ENTRY_POINTS, spacing_m, seed, GRID_JITTER], sort_keys=True).encode()
+    ).hexdigest()[:12]
+    cache_dir = Path(getattr(settings, 'CRZ_GRID_CACHE_DIR', Path(settings.BASE_DIR) / 'cache'))
+    return cache_dir / f'crz_grid_{spacing_m}m_{seed}_{fingerprint}.npz'
+
+
+def _load_or_build_grid(spacing_m, seed):
+    path = _grid_cache_path(spacing_m, seed)
+    if path.exists():
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return SamplingGrid(data['lats'], data['lons'], tuple(data['entry_names'].tolist()), data['distances_km'])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[CRZ Grid] Could not read {path}: {e}. Rebuilding.")
+
+    grid = build_sampling_grid(spacing_m, seed)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f'{path.stem}.{os.getpid()}.tmp.npz')
+        np.savez(tmp_path, lats=grid.lats, lons=grid.lons,
+                 entry_names=np.array(grid.entry_names, dtype=str), distances_km=grid.distances_km)
+        os.replace(tmp_path, path)  # Atomic, so concurrent workers never read a half-written file
+        print(f"[CRZ Grid] Built {len(grid)} points at {spacing_m}m spacing -> {path}")
+    except OSError as e:
+        print(f"[CRZ Grid] Could not write grid cache {path}: {e}")
+    return grid
+
+
+_grid = None
+_grid_lock = threading.Lock()
+
+
+def get_sampling_grid():
+    """The process-wide grid for the configured CRZ_GRID_SPACING_METERS / CRZ_GRID_SEED."""
+    global _grid
+    if _grid is None:
+        with _grid_lock:
+            if _grid is None:
+                _grid = _load_or_build_grid(
+                    getattr(settings, 'CRZ_GRID_SPACING_METERS', DEFAULT_GRID_SPACING_METERS),
+                    getattr(settings, 'CRZ_GRID_SEED', DEFAULT_GRID_SEED),
+                )
+    return _grid
@@ -0,0 +1,171 @@
+"""
+Dashboard slices aggregated in the database.
+
+A SliceQuery (date range, regions, vehicle classes, granularity) becomes indexed
+VehicleEntry filters plus one values().annotate(Sum()) GROUP BY, so the cost follows
+the size of the slice rather than the table. Days retention has compacted are read the
+same way from their HourlyEntryTotal rollups, which every granularity can be summed
+from. Results are kept in a per-process LRU cache with a TTL, keyed on the normalised
+parameters.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import date
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from .json_stream import records_frame
+from .data_versions import months_between, partition_versions, versions_tag
+from .metrics import cached_section, mark_cache_hit
+from .models import DetectionRegion, HourlyEntryTotal, VehicleClass, VehicleEntry
+
+DEFAULT_QUERY_CACHE_SIZE = 256
+DEFAULT_QUERY_CACHE_TTL = 300  # Seconds
+
+# Time columns each granularity groups by; 'total' collapses the whole range
+GRANULARITIES = {
+    'total': {},
+    'month': {'period': TruncMonth('toll_date')},
+    'week': {'period': TruncWeek('toll_date')},
+    'day': {'period': F('toll_date')},
+    'hour': {'period': F('toll_date'), 'hour': F('toll_hour')},
+}
+
+
+@dataclass(frozen=True)
+class SliceQuery:
+    """Normalised slice parameters; equal queries compare (and hash) equal."""
+    start: Optional[date] = None
+    end: Optional[date] = None
+    regions: Tuple[str, ...] = ()  # Empty means all
+    vehicle_classes: Tuple[str, ...] = ()
+    granularity: str = 'day'
+
+    @classmethod
+    def from_params(cls, params):
+        """Build from request.GET; regions and vehicle_classes may repeat or be comma separated."""
+        def dates(name):
+            value = params.get(name)
+            return date.fromisoformat(value) if value else None
+
+        def values(name):
+            items = (item.strip() for value in params.getlist(name) for item in value.split(','))
+            return tuple(sorted({item for item in items if item}))
+
+        try:
+            start, end = dates('start'), dates('end')
+        except ValueError:
+            raise ValueError('start and end must be YYYY-MM-DD')
+        if start and end and start > end:
+            raise ValueError('start must be on or before end')
+
+        granularity = params.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+        return cls(start, end, values('region'), values('vehicle_class'), granularity)
+
+    def to_dict(self):
+        data = asdict(self)
+        data['start'] = self.start.isoformat() if self.start else None
+        data['end'] = self.end.isoformat() if self.end else None
+        data['regions'] = list(self.regions)
+        data['vehicle_classes'] = list(self.vehicle_classes)
+        return data
+
+    def queryset(self, model=VehicleEntry):
+        """Filtered, grouped and summed rows of `model` (VehicleEntry or HourlyEntryTotal)."""
+        entries = model.objects.all()
+        if self.start:
+            entries = entries.filter(toll_date__gte=self.start)
+        if self.end:
+            entries = entries.filter(toll_date__lte=self.end)
+        if self.regions:
+            entries = entries.filter(detection_region_key__in=DetectionRegion.keys_for(self.regions))
+        if self.vehicle_classes:
+            entries = entries.filter(vehicle_class_key__in=VehicleClass.keys_for(self.vehicle_classes))
+
+        # Grouped by the integer dimension keys; frame() names them
+        time_columns = GRANULARITIES[self.granularity]
+        return (entries.annotate(**time_columns)
+                .values(*time_columns, 'detection_region_key', 'vehicle_class_key')
+                .annotate(crz_entries=Sum('crz_entries'))
+                .order_by())
+
+    def frame(self):
+        """The slice's rows as a DataFrame with region and vehicle class names, ordered by period, region and class."""
+        time_columns = list(GRANULARITIES[self.granularity])
+        group_columns = [*time_columns, 'detection_region_key', 'vehicle_class_key']
+        compacted = list(self.queryset(HourlyEntryTotal))
+        rows = records_frame([*self.queryset(), *compacted], columns=[*group_columns, 'crz_entries'])
+        if compacted:
+            # A day imported again after it was compacted has both raw rows and rollups
+            rows = rows.groupby(group_columns, as_index=False, sort=False)['crz_entries'].sum()
+        for key_field, column, dimension in (('detection_region_key', 'detection_region', DetectionRegion),
+                                             ('vehicle_class_key', 'vehicle_class', VehicleClass)):
+            keys = rows.pop(key_field)
+            rows[column] = keys.map(dimension.names(keys.unique().tolist()))
+        order = [*time_columns, 'detection_region', 'vehicle_class']
+        return rows[[*order, 'crz_entries']].sort_values(order, kind='stable', ignore_index=True)
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ttl seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+query_cache = TTLCache(
+    getattr(settings, 'DASHBOARD_QUERY_CACHE_SIZE', DEFAULT_QUERY_CACHE_SIZE),
+    getattr(settings, 'DASHBOARD_QUERY_CACHE_TTL', DEFAULT_QUERY_CACHE_TTL),
+)
+
+
+@cached_section('dashboard_slice_query')
+def run_slice_query(query: SliceQuery):
+    """
+    DataFrame of a slice's rows, from the cache when the same parameters were asked
+    recently and none of the months the slice reads has been re-imported since.
+    """
+    months = months_between(query.start, query.end) if query.start and query.end else None
+    cache_key = (query, versions_tag(partition_versions(), months))
+    rows = query_cache.get(cache_key)
+    if rows is not None:
+        print(f"--- Cache Hit: Slice {query.granularity} ({len(rows)} rows) ---")
+        mark_cache_hit()
+        return rows
+
+    rows = query.frame()
+    print(f"--- Cache Miss: Slice {query.granularity} aggregated to {len(rows)} rows ---")
+    query_cache.set(cache_key, rows)
+    return rows
@@ -0,0 +1,92 @@
+"""
+Per-month data versions.
+
+Every month of VehicleEntry data ('YYYY-MM') has a version in PartitionVersion that
+ingest bumps. Cached artifacts put the versions of the months they were built from
+into their keys: after an import, the artifacts that read a touched month are simply
+never looked up again, everything else stays cached, and nothing built before the
+import can be served after it. Versions live in the database so every worker process
+sees a bump at once, whatever the cache backend.
+"""
+import hashlib
+from datetime import date
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import HourlyEntryTotal, PartitionVersion, VehicleEntry
+
+
+def month_of(day):
+    """'YYYY-MM' of a date or datetime."""
+    return f'{day.year:04d}-{day.month:02d}'
+
+
+def month_bounds(month):
+    """First and last day of a 'YYYY-MM' month."""
+    year, number = int(month[:4]), int(month[5:7])
+    next_first = date(year + number // 12, number % 12 + 1, 1)
+    return date(year, number, 1), date.fromordinal(next_first.toordinal() - 1)
+
+
+def months_between(start, end):
+    """Every 'YYYY-MM' from start's month to end's month, inclusive."""
+    months = []
+    year, number = start.year, start.month
+    while (year, number) <= (end.year, end.month):
+        months.append(f'{year:04d}-{number:02d}')
+        year, number = (year + 1, 1) if number == 12 else (year, number + 1)
+    return months
+
+
+def data_months(start=None, end=None):
+    """
+    Months that have VehicleEntry rows, raw or compacted by retention (with toll dates in
+    [start, end] if given), oldest first.
+    """
+    months = set()
+    for model in (VehicleEntry, HourlyEntryTotal):
+        entries = model.objects.all()
+        if start:
+            entries = entries.filter(toll_date__gte=start)
+        if end:
+            entries = entries.filter(toll_date__lte=end)
+        months.update(month_of(day) for day in entries.dates('toll_date', 'month'))
+    return sorted(months)
+
+
+def partition_versions():
+    """{month: version} for every month ingest has touched; other months are at version 0."""
+    return dict(PartitionVersion.objects.values_list('month', 'version'))
+
+
+def bump_partitions(months):
+    """New versions for `months`, making every cached artifact built from them unreachable."""
+    months = sorted(set(months))
+    if not months:
+        return
+    with transaction.atomic():
+        existing = set(PartitionVersion.objects.filter(month__in=months).values_list('month', flat=True))
+        PartitionVersion.objects.bulk_create([PartitionVersion(month=month) for month in months if month not in existing])
+        PartitionVersion.objects.filter(month__in=months).update(version=F('version') + 1)
+    print(f"[Data Versions] Bumped {', '.join(months)}")
+
+
+def versions_tag(versions, months=None):
+    """Short stable hash of the versions of `months` (default: every versioned month)."""
+    if months is not None:
+        versions = {month: versions.get(month, 0) for month in months}
+    pairs = ','.join(f'{month}={version}' for month, version in sorted(versions.items()) if version)
+    return hashlib.sha1(pairs.encode()).hexdigest()[:12]
+
+
+def versioned_key(name, versions=None, months=None):
+    """Cache key of an artifact built from `months` (default: the whole history)."""
+    if versions is None:
+        versions = partition_versions()
+    return f'{name}:{versions_tag(versions, months)}'
+
+
+def partition_key(name, month, versions):
+    """Cache key of an artifact built from one month."""
+    return f'{name}:{month}:v{versions.get(month, 0)}'
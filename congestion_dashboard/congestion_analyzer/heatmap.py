@@ -0,0 +1,187 @@
+"""
+Inverse-distance interpolation of entry point scores onto the heatmap sample points.
+
+The shared CRZ sampling grid and the row-normalised (points x entry_points) weight matrix are
+built once per process, so each score version costs one matrix-vector product.
+
+HeatmapRaster does the same onto regular cells at a few resolutions and encodes the result
+as a palette PNG (one byte per cell), so the browser just draws an image.
+"""
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .crz_geometry import build_raster_grid, get_sampling_grid
+
+DEFAULT_ENTRY_SCORE = 50  # Used for entry points without data yet
+PAYLOAD_CACHE_SIZE = 4  # Score versions whose JSON payload we keep
+
+# Cell size in metres for each raster level, coarsest first
+DEFAULT_RASTER_CELL_METERS = (240, 120, 60)
+RASTER_ALPHA = 180
+
+# Same ramp as deck.gl's HeatmapLayer default colorRange, low to high
+HEATMAP_COLOR_RANGE = [
+    (255, 255, 178), (254, 217, 118), (254, 178, 76),
+    (253, 141, 60), (240, 59, 32), (189, 0, 38)
+]
+
+
+def _score_palette():
+    """
+    101-entry RGBA palette: index 0 is transparent (outside the zone), index s is score s.
+    """
+    stops = np.linspace(1, 100, len(HEATMAP_COLOR_RANGE))
+    ramp = np.array(HEATMAP_COLOR_RANGE, dtype=np.float64)
+    scores = np.arange(1, 101)
+    rgb = np.column_stack([np.interp(scores, stops, ramp[:, c]) for c in range(3)])
+    rgb = np.vstack([[0, 0, 0], rgb]).round().astype(np.uint8)
+    alpha = np.full(101, RASTER_ALPHA, dtype=np.uint8)
+    alpha[0] = 0
+    return rgb, alpha
+
+
+def _png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def encode_palette_png(pixels, rgb, alpha):
+    """Encode a (rows, cols) uint8 index array as an 8-bit palette PNG."""
+    rows, cols = pixels.shape
+    # Every scanline starts with filter type 0 (none)
+    scanlines = np.hstack([np.zeros((rows, 1), dtype=np.uint8), pixels.astype(np.uint8)])
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        _png_chunk(b'IHDR', struct.pack('>IIBBBBB', cols, rows, 8, 3, 0, 0, 0)),
+        _png_chunk(b'PLTE', rgb.tobytes()),
+        _png_chunk(b'tRNS', alpha.tobytes()),
+        _png_chunk(b'IDAT', zlib.compress(scanlines.tobytes(), 9)),
+        _png_chunk(b'IEND', b''),
+    ])
+
+
+class HeatmapInterpolator:
+    """Holds the fixed sample points and their interpolation weights."""
+
+    def __init__(self, lats, lons, entry_names, distances_km):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.entry_names = list(entry_names)
+        # Closer entry points have higher weights (inverse distance), rows sum to 1
+        weights = 1.0 / (1.0 + np.asarray(distances_km, dtype=np.float64))
+        self.weights = weights / weights.sum(axis=1, keepdims=True)
+
+        self._lock = threading.Lock()
+        self._vectors = OrderedDict()   # score version -> interpolated scores
+        self._payloads = OrderedDict()  # score version -> JSON bytes
+
+    @classmethod
+    def from_grid(cls, grid):
+        return cls(grid.lats, grid.lons, grid.entry_names, grid.distances_km)
+
+    def score_vector(self, scores):
+        return np.array([scores.get(name, DEFAULT_ENTRY_SCORE) for name in self.entry_names], dtype=np.float64)
+
+    def interpolate(self, scores):
+        """Scores for every sample point given a {detection_group: score} mapping."""
+        if not self.entry_names:
+            return np.full(len(self.lats), DEFAULT_ENTRY_SCORE, dtype=np.float64)
+        return np.clip(self.weights @ self.score_vector(scores), 1, 100)
+
+    def points_frame(self, point_scores, previous_scores=None):
+        frame = pd.DataFrame({'lat': self.lats, 'lon': self.lons, 'score': point_scores})
+        if previous_scores is not None:
+            frame['previous_score'] = previous_scores
+        return frame
+
+    def payload(self, version, scores):
+        """
+        JSON array of {lat, lon, score, previous_score} for one score version.
+        Serialised once per version; previous_score comes from the prior cached version.
+        """
+        with self._lock:
+            cached = self._payloads.get(version)
+            if cached is not None:
+                return cached
+
+            point_scores = self.interpolate(scores)
+            previous = self._vectors.get(version - 1)
+            if previous is None:
+                previous = next(reversed(self._vectors.values()), np.zeros_like(point_scores))
+            content = self.points_frame(point_scores, previous).to_json(orient='records').encode()
+
+            self._vectors[version] = point_scores
+            self._payloads[version] = content
+            while len(self._payloads) > PAYLOAD_CACHE_SIZE:
+                self._payloads.popitem(last=False)
+                self._vectors.popitem(last=False)
+            return content
+
+
+class HeatmapRaster:
+    """One raster level: a RasterGrid plus the interpolator for its inside cells."""
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.interpolator = HeatmapInterpolator(grid.lats, grid.lons, grid.entry_names, grid.distances_km)
+        self.rgb, self.alpha = _score_palette()
+
+        self._lock = threading.Lock()
+        self._pngs = OrderedDict()  # score version -> PNG bytes
+
+    @property
+    def bounds(self):
+        return self.grid.bounds
+
+    def render(self, scores):
+        """(rows, cols) uint8 of scores 1-100, with 0 for cells outside the zone."""
+        pixels = np.zeros(self.grid.shape, dtype=np.uint8)
+        pixels[self.grid.inside] = np.rint(self.interpolator.interpolate(scores)).astype(np.uint8)
+        return pixels
+
+    def png(self, version, scores):
+        """PNG for one score version, encoded once and reused until the version changes."""
+        with self._lock:
+            cached = self._pngs.get(version)
+            if cached is None:
+                cached = encode_palette_png(self.render(scores), self.rgb, self.alpha)
+                self._pngs[version] = cached
+                while len(self._pngs) > PAYLOAD_CACHE_SIZE:
+                    self._pngs.popitem(last=False)
+            return cached
+
+
+def raster_cell_sizes():
+    return tuple(getattr(settings, 'HEATMAP_RASTER_CELL_METERS', DEFAULT_RASTER_CELL_METERS))
+
+
+_interpolator = None
+_interpolator_lock = threading.Lock()
+_rasters = {}
+
+
+def get_heatmap_interpolator():
+    """Process-wide interpolator, built on first use."""
+    global _interpolator
+    if _interpolator is None:
+        with _interpolator_lock:
+            if _interpolator is None:
+                _interpolator = HeatmapInterpolator.from_grid(get_sampling_grid())
+    return _interpolator
+
+
+def get_heatmap_raster(level):
+    """Process-wide raster for a level index into HEATMAP_RASTER_CELL_METERS, built on first use."""
+    cell_m = raster_cell_sizes()[level]
+    raster = _rasters.get(cell_m)
+    if raster is None:
+        with _interpolator_lock:
+            raster = _rasters.get(cell_m)
+            if raster is None:
+                raster = _rasters[cell_m] = HeatmapRaster(build_raster_grid(cell_m))
+    return raster
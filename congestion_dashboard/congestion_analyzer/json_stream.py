@@ -0,0 +1,61 @@
+"""
+Chunked JSON serialisation straight from DataFrames.
+
+Rows are written by pandas' C encoder a slice at a time, so large payloads never exist
+as a list of dicts and responses can start before the last row is encoded. Dates are
+converted column-wise up front instead of through a per-object default() hook.
+"""
+from datetime import date, datetime
+
+import pandas as pd
+from django.http import StreamingHttpResponse
+
+DEFAULT_CHUNK_ROWS = 5000
+
+
+def records_frame(records, columns=None):
+    """
+    DataFrame from a list of record dicts, with datetime.date columns turned into
+    'YYYY-MM-DD' strings (what DjangoJSONEncoder writes for dates).
+    """
+    frame = pd.DataFrame.from_records(records, columns=columns)
+    for column in frame.columns[frame.dtypes == object]:
+        values = frame[column].dropna()
+        if not values.empty and isinstance(values.iloc[0], date) and not isinstance(values.iloc[0], datetime):
+            frame[column] = pd.to_datetime(frame[column]).dt.strftime('%Y-%m-%d')
+    return frame
+
+
+def iter_json_records(frame, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield a JSON array of the frame's rows ('records' orient) in chunks of chunk_rows."""
+    yield '['
+    for start in range(0, len(frame), chunk_rows):
+        chunk = frame.iloc[start:start + chunk_rows].to_json(orient='records', date_format='iso')
+        # Strip each chunk's brackets and join the slices with commas
+        yield (',' if start else '') + chunk[1:-1]
+    yield ']'
+
+
+def frame_to_json(frame, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """The whole array as one string, for payloads that are cached rather than streamed."""
+    return ''.join(iter_json_records(frame, chunk_rows))
+
+
+def iter_json_object(**members):
+    """
+    Yield a JSON object whose values are DataFrames (written as record arrays)
+    or strings that are already JSON.
+    """
+    yield '{'
+    for i, (key, value) in enumerate(members.items()):
+        yield f'{"," if i else ""}"{key}": '
+        if isinstance(value, pd.DataFrame):
+            yield from iter_json_records(value)
+        else:
+            yield value
+    yield '}'
+
+
+def streaming_json_response(chunks, **kwargs):
+    """StreamingHttpResponse over an iterator of JSON text chunks."""
+    return StreamingHttpResponse((chunk.encode() for chunk in chunks), content_type='application/json', **kwargs)
@@ -0,0 +1,54 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+from collections import Counter
+from congestion_analyzer.models import DailyEntryTotal, DetectionGroup, HourlyEntryTotal, VehicleClass, VehicleEntry
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-day DailyEntryTotal rows the map reads from VehicleEntry and its hourly rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=str, help='First toll date to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end', type=str, help='Last toll date to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows written per batch')
+
+    def handle(self, *args, **options):
+        try:
+            start = datetime.strptime(options['start'], '%Y-%m-%d').date() if options['start'] else None
+            end = datetime.strptime(options['end'], '%Y-%m-%d').date() if options['end'] else None
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+
+        entries = VehicleEntry.objects.all()
+        compacted = HourlyEntryTotal.objects.all()
+        totals = DailyEntryTotal.objects.all()
+        if start:
+            entries = entries.filter(toll_date__gte=start)
+            compacted = compacted.filter(toll_date__gte=start)
+            totals = totals.filter(toll_date__gte=start)
+        if end:
+            entries = entries.filter(toll_date__lte=end)
+            compacted = compacted.filter(toll_date__lte=end)
+            totals = totals.filter(toll_date__lte=end)
+
+        # One GROUP BY on the integer dimension keys in the database instead of summing rows in Python,
+        # for the raw rows and for the days retention has compacted
+        sums = Counter()
+        for queryset in (entries, compacted):
+            for row in (queryset.values('toll_date', 'detection_group_key', 'vehicle_class_key')
+                        .annotate(total=Sum('crz_entries')).order_by().iterator()):
+                sums[row['toll_date'], row['detection_group_key'], row['vehicle_class_key']] += row['total']
+
+        with transaction.atomic():
+            deleted, _ = totals.delete()
+            created = DailyEntryTotal.objects.bulk_create(
+                (DailyEntryTotal(toll_date=toll_date, detection_group=DetectionGroup.name_of(group_key),
+                                 vehicle_class=VehicleClass.name_of(class_key), crz_entries=total)
+                 for (toll_date, group_key, class_key), total in sums.items()),
+                batch_size=options['batch_size']
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Replaced {deleted} daily totals with {len(created)} rows'
+        ))
@@ -0,0 +1,118 @@
+import heapq
+from datetime import datetime, time, timedelta
+from operator import itemgetter
+from django.core.management.base import BaseCommand, CommandError
+from congestion_analyzer import archive
+from congestion_analyzer.congestion_scoring import CongestionScore, parse_toll_data
+from congestion_analyzer.models import WEEKDAY_NAMES, HistoricalScore, VehicleEntry
+
+BUCKETS_PER_HOUR = 6  # toll_10_minute_block runs 0-5
+EVENT_ORDER = itemgetter('toll_date', 'toll_hour', 'toll_10_minute_block')
+
+def archived_rows(start, end):
+    """Rows retention moved to the archive, shaped like the VehicleEntry values() rows, in event-time order."""
+    for record in archive.iter_records(start, end):
+        record['hour_of_day'] = record['toll_hour']
+        record['day_of_week'] = WEEKDAY_NAMES[record['day_of_week_int'] - 1]
+        yield record
+
+def to_toll_record(row):
+    """Shape a VehicleEntry values() row like an upstream record so it goes through the same schema."""
+    toll_date = row['toll_date']
+    block_start = datetime.combine(toll_date, time(row['toll_hour'], row['toll_10_minute_block'] * 10))
+    return {
+        'toll_date': toll_date,
+        'toll_hour': datetime.combine(toll_date, time(row['toll_hour'])),
+        'toll_10_minute_block': block_start,
+        'minute_of_hour': row['minute_of_hour'],
+        'hour_of_day': row['hour_of_day'],
+        'day_of_week_int': row['day_of_week_int'],
+        'day_of_week': row['day_of_week'],
+        'toll_week': toll_date - timedelta(days=toll_date.isoweekday() % 7),  # Weeks start on Sunday upstream
+        'time_period': row['time_period'],
+        'vehicle_class': row['vehicle_class'],
+        'detection_group': row['detection_group'],
+        'detection_region': row['detection_region'],
+        'crz_entries': row['crz_entries'],
+        'excluded_roadway_entries': row['excluded_roadway_entries'],
+    }
+
+class Command(BaseCommand):
+    help = 'Score the VehicleEntry history, archived rows included, in event-time order into per-10-minute HistoricalScore rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=str, help='First toll date to score (YYYY-MM-DD)')
+        parser.add_argument('--end', type=str, help='Last toll date to score (YYYY-MM-DD)')
+        parser.add_argument('--batch-size', type=int, default=20000, help='Rows fetched and score rows written per batch')
+        parser.add_argument('--clear', action='store_true', help='Delete existing scores in the range first')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        try:
+            start = datetime.strptime(options['start'], '%Y-%m-%d').date() if options['start'] else None
+            end = datetime.strptime(options['end'], '%Y-%m-%d').date() if options['end'] else None
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+
+        entries = VehicleEntry.objects.all()
+        existing = HistoricalScore.objects.all()
+        if start:
+            entries = entries.filter(toll_date__gte=start)
+            existing = existing.filter(toll_date__gte=start)
+        if end:
+            entries = entries.filter(toll_date__lte=end)
+            existing = existing.filter(toll_date__lte=end)
+        if options['clear']:
+            deleted, _ = existing.delete()
+            self.stdout.write(f"Deleted {deleted} existing score rows")
+
+        rows = entries.with_names().order_by('toll_date', 'toll_hour', 'toll_10_minute_block').values(
+            'toll_date', 'toll_hour', 'toll_10_minute_block', 'minute_of_hour', 'hour_of_day',
+            'day_of_week_int', 'day_of_week', 'time_period', 'vehicle_class', 'detection_group',
+            'detection_region', 'crz_entries', 'excluded_roadway_entries'
+        )
+
+        scorer = CongestionScore()
+        pending = []  # Raw records of the bucket currently being read
+        score_rows = []
+        current_bucket = None
+        counter = 0
+        written = 0
+
+        def flush_bucket():
+            # Score the finished bucket, then snapshot every group seen so far so each
+            # bucket is a complete heatmap on its own
+            scorer.score_records(parse_toll_data(pending))
+            toll_date, bucket = current_bucket
+            score_rows.extend(
+                HistoricalScore(toll_date=toll_date, bucket=bucket, detection_group=group, score=score)
+                for group, score in scorer.scores.items()
+            )
+
+        def write_scores():
+            HistoricalScore.objects.bulk_create(
+                score_rows, batch_size=batch_size, update_conflicts=True,
+                unique_fields=['toll_date', 'bucket', 'detection_group'], update_fields=['score']
+            )
+            return len(score_rows)
+
+        # Archived days stream in one at a time alongside the rows still in the table
+        for row in heapq.merge(rows.iterator(chunk_size=batch_size), archived_rows(start, end), key=EVENT_ORDER):
+            bucket = (row['toll_date'], row['toll_hour'] * BUCKETS_PER_HOUR + row['toll_10_minute_block'])
+            if bucket != current_bucket and pending:
+                flush_bucket()
+                pending = []
+                if len(score_rows) >= batch_size:
+                    written += write_scores()
+                    score_rows = []
+                    self.stdout.write(f"Scored {counter} entries, wrote {written} score rows...")
+            current_bucket = bucket
+            pending.append(to_toll_record(row))
+            counter += 1
+
+        if pending:
+            flush_bucket()
+        if score_rows:
+            written += write_scores()
+
+        self.stdout.write(self.style.SUCCESS(f'Scored {counter} vehicle entries into {written} historical score rows'))
@@ -0,0 +1,43 @@
+from pathlib import Path
+import pytest
+from django.core.management.base import BaseCommand, CommandError
+from congestion_analyzer.benchmarks import BENCHMARKS, DEFAULT_THRESHOLD, ROW_SIZES, parse_rows
+
+SUITE = Path(__file__).resolve().parents[2] / 'tests' / 'test_benchmarks.py'
+
+class Command(BaseCommand):
+    help = 'Run the pytest-django benchmark suite on seeded synthetic data and compare it to a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=str, default='100k', help=f"{', '.join(ROW_SIZES)} or a row count")
+        parser.add_argument('--seed', type=int, default=2025, help='Synthetic data seed')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per repeatable benchmark; the best is kept')
+        parser.add_argument('--only', nargs='+', choices=[bench.name for bench in BENCHMARKS],
+                            help='Run only these benchmarks (import_data is needed for the others to have data)')
+        parser.add_argument('--workdir', type=str, help='Where CSVs, results and baselines go (default: BASE_DIR/benchmarks)')
+        parser.add_argument('--baseline', type=str, help='Baseline JSON to compare against (default: workdir/baseline_<rows>.json)')
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help='Fractional slowdown over the baseline that fails the run')
+        parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline')
+
+    def handle(self, *args, **options):
+        try:
+            rows = parse_rows(options['rows'])
+        except ValueError as e:
+            raise CommandError(f'--rows: {e}')
+
+        args = [str(SUITE), '-q', '--benchmark-rows', str(rows), '--benchmark-seed', str(options['seed']),
+                '--benchmark-repeat', str(options['repeat']), '--benchmark-threshold', str(options['threshold'])]
+        if options['only']:
+            args += ['-k', ' or '.join(options['only'])]
+        if options['workdir']:
+            args += ['--benchmark-workdir', options['workdir']]
+        if options['baseline']:
+            args += ['--benchmark-baseline', options['baseline']]
+        if options['save_baseline']:
+            args.append('--benchmark-save-baseline')
+
+        exit_code = pytest.main(args)
+        if exit_code != pytest.ExitCode.OK:
+            raise CommandError(f'Benchmark run failed (pytest exit code {int(exit_code)})')
+        self.stdout.write(self.style.SUCCESS('Benchmarks passed'))
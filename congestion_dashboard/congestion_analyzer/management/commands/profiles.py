@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from congestion_analyzer import profiling
+
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls')
+
+class Command(BaseCommand):
+    help = 'List captured request profiles, summarize one, or issue a token that turns profiling on for a request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile_id', nargs='?', help='Profile to summarize (default: list them all)')
+        parser.add_argument('--latest', action='store_true', help='Summarize the most recent profile')
+        parser.add_argument('--sort', choices=SORT_KEYS, default='cumulative', help='Order of the top frames')
+        parser.add_argument('--limit', type=int, default=25, help='Number of top frames to show')
+        parser.add_argument('--token', action='store_true',
+                            help=f'Print a signed token for the {profiling.PROFILE_PARAM} parameter or X-Profile-Token header')
+
+    def handle(self, *args, **options):
+        if options['token']:
+            if not profiling.profiling_enabled():
+                self.stderr.write(self.style.WARNING('PROFILING_ENABLED is off; the token does nothing until it is on'))
+            self.stdout.write(profiling.make_token())
+            return
+
+        summaries = profiling.list_profiles()
+        profile_id = options['profile_id']
+        if options['latest']:
+            if not summaries:
+                raise CommandError(f"No profiles in {profiling.profiles_dir()}")
+            profile_id = summaries[0]['id']
+
+        if not profile_id:
+            if not summaries:
+                self.stdout.write(f"No profiles in {profiling.profiles_dir()}")
+            for summary in summaries:
+                self.stdout.write(f"{summary['id']:<60} {summary['method']:<6} {summary['status']}  "
+                                  f"{summary['seconds'] * 1000:>9.1f} ms  {summary['path']}")
+            return
+
+        path = profiling.profile_path(profile_id, 'stats')
+        if path is None or not path.exists():
+            raise CommandError(f"No profile {profile_id} in {profiling.profiles_dir()}")
+        summary = next((s for s in summaries if s['id'] == profile_id), None)
+        if summary:
+            self.stdout.write(f"{summary['method']} {summary['path']} -> {summary['status']} in "
+                              f"{summary['seconds'] * 1000:.1f} ms ({summary['calls']} calls)")
+        self.stdout.write(profiling.top_frames(profile_id, options['sort'], options['limit']))
+        self.stdout.write(f"Collapsed stacks: {profiling.profile_path(profile_id, 'folded')}")
@@ -0,0 +1,40 @@
+import asyncio
+import time
+from django.core.management.base import BaseCommand
+from congestion_analyzer.congestion_scoring import refresh_interval, update_scores
+from congestion_analyzer.score_state import get_score_backend
+
+class Command(BaseCommand):
+    help = 'Run the single congestion score refresher that publishes shared score snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Seconds between refreshes (default: CONGESTION_SCORE_REFRESH_INTERVAL)')
+        parser.add_argument('--once', action='store_true', help='Run a single refresh and exit')
+        parser.add_argument('--trusted', action='store_true', help='Upstream is a source we control; use the fast parse path')
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or refresh_interval()
+        backend = get_score_backend()
+        self.stdout.write(f"Publishing scores to {type(backend).__name__} every {interval}s")
+
+        while True:
+            started = time.monotonic()
+            try:
+                scores = asyncio.run(update_scores(trusted=options['trusted']))
+            except Exception as e:
+                if options['once']:
+                    raise
+                # Keep refreshing: the next cycle folds this one's records in anyway
+                self.stderr.write(f"Refresh failed: {e!r}")
+            else:
+                snapshot = backend.load()
+                version = snapshot.version if snapshot else 0
+                self.stdout.write(f"Published v{version} with {len(scores)} detection groups "
+                                  f"in {time.monotonic() - started:.2f}s")
+
+            if options['once']:
+                break
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+        self.stdout.write(self.style.SUCCESS('Score refresher stopped'))
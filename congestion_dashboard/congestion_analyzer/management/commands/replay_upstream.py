@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from congestion_analyzer.replay_api import ReplayApplication, ReplayClock, read_upstream_csv, read_vehicle_entries
+
+class Command(BaseCommand):
+    help = 'Serve an MTA CSV export or the VehicleEntry table as a local replay of the data.ny.gov toll API (ASGI)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--csv', type=str, help='MTA CSV export to serve (default: the VehicleEntry table)')
+        parser.add_argument('--speedup', type=float, default=60.0,
+                            help='Event-time seconds replayed per wall-clock second; 0 serves everything at once')
+        parser.add_argument('--start', type=str, help='Event time the replay starts at (default: the first block)')
+        parser.add_argument('--host', type=str, default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--dataset', type=str, default=getattr(settings, 'TOLL_API_DATASET', 't6yz-b64h'),
+                            help='Dataset id in the /resource/<id>.json path')
+
+    def handle(self, *args, **options):
+        try:
+            import uvicorn
+        except ImportError:
+            raise CommandError('replay_upstream needs an ASGI server: pip install uvicorn')
+
+        if options['csv']:
+            self.stdout.write(f"Loading {options['csv']}...")
+            frame = read_upstream_csv(options['csv'])
+        else:
+            self.stdout.write('Loading the VehicleEntry table...')
+            frame = read_vehicle_entries()
+        if frame.empty:
+            raise CommandError('No rows to replay; import data or pass --csv')
+
+        first, last = frame['toll_10_minute_block'].iloc[0], frame['toll_10_minute_block'].iloc[-1]
+        clock = ReplayClock(options['start'] or first, options['speedup'])
+        app = ReplayApplication(frame, clock, options['dataset'])
+
+        base_url = f"http://{options['host']}:{options['port']}"
+        self.stdout.write(f"Replaying {len(frame)} rows from {first} to {last} at {options['speedup']:g}x")
+        self.stdout.write(f"Serving {base_url}/resource/{options['dataset']}.json")
+        self.stdout.write(self.style.SUCCESS(f"Set TOLL_API_BASE_URL = '{base_url}' to use it"))
+        uvicorn.run(app, host=options['host'], port=options['port'], lifespan='on', log_level='warning')
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from congestion_analyzer import archive, retention
+
+class Command(BaseCommand):
+    help = 'Move raw VehicleEntry rows older than the retention age to the Parquet archive and hourly rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Days of raw rows to keep (default: RETENTION_DAYS)')
+        parser.add_argument('--dry-run', action='store_true', help='Only list the days that would be archived')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else getattr(settings, 'RETENTION_DAYS', None)
+        if days is None:
+            raise CommandError('Pass --days or set RETENTION_DAYS')
+        if days < 1:
+            raise CommandError('--days must be at least 1')
+
+        cutoff = retention.retention_cutoff(days)
+        if options['dry_run']:
+            pending = retention.days_before(cutoff)
+            self.stdout.write(f"{len(pending)} days before {cutoff} would be archived"
+                              + (f": {pending[0]} to {pending[-1]}" if pending else ''))
+            return
+
+        compacted, moved = retention.apply_retention(days, log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {moved} raw rows of {compacted} days before {cutoff} to {archive.archive_dir()}'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from congestion_analyzer import running_totals
+
+class Command(BaseCommand):
+    help = 'Check the running dashboard totals against VehicleEntry and its hourly rollups, or rebuild them from those'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Recompute the totals from VehicleEntry and its hourly rollups instead of only checking them')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            regions = running_totals.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt running totals of {regions} regions'))
+            return
+
+        mismatches = running_totals.verify()
+        for region, stored, computed in mismatches:
+            self.stderr.write(f'{region}: stored {stored[0]} rows / {stored[1]} entries, '
+                              f'table has {computed[0]} rows / {computed[1]} entries')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} regions are off; run with --rebuild to fix them')
+        self.stdout.write(self.style.SUCCESS('Running totals match VehicleEntry and its hourly rollups'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from congestion_analyzer import snapshots
+
+class Command(BaseCommand):
+    help = 'Write an Arrow snapshot of the base dataset and dashboard rollups and make it current'
+
+    def handle(self, *args, **options):
+        if not snapshots.snapshots_enabled():
+            self.stderr.write(self.style.WARNING('SNAPSHOTS_ENABLED is off; workers will not read the snapshot until it is on'))
+        snapshot_id = snapshots.write_snapshot()
+        _, manifest = snapshots.current_snapshot()
+        rows = sum(entry['rows'] for entry in manifest['months'].values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot {snapshot_id}: {len(manifest['months'])} months, {rows} rows in {snapshots.snapshots_dir()}"))
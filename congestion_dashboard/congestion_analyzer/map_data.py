@@ -0,0 +1,142 @@
+"""
+Entry-point x vehicle-type columns for the historical map.
+
+Totals come from the pre-aggregated DailyEntryTotal table and are joined against small
+static lookup frames, so a date range costs one GROUP BY query plus a few vectorised
+pandas operations. Results are cached per date range.
+"""
+import io
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+from django.core.cache import cache
+from django.db.models import Max, Min, Sum
+
+from .cache_utils import CACHE_TIMEOUT, ENTRY_POINTS, VEHICLE_CLASS_MAPPING, VEHICLE_TYPES
+from .data_versions import months_between, versioned_key
+from .metrics import cached_section, mark_cache_hit
+from .models import DailyEntryTotal
+
+MAP_RANGE_CACHE_KEY = 'map_range_data_v1'
+
+COLUMN_OFFSET_STEP = 0.00025  # Longitude between neighbouring vehicle-type columns
+COLUMN_HEIGHT_SCALE = 5
+OTHER_VEHICLE = {'name': 'Other', 'color': [100, 100, 100], 'order': 99}
+
+# Upstream detection group spellings that differ from the ENTRY_POINTS names
+DETECTION_GROUP_ALIASES = {
+    'Queens Midtown Tunnel': 'Queens-Midtown Tunnel',
+    'Hugh L. Carey Tunnel': 'Hugh Carey Tunnel',
+    'FDR Drive at 60th St': 'FDR Drive at 60th Street',
+    'East 60th St': 'East 60th Street',
+    'West 60th St': 'West 60th Street',
+    'West Side Highway at 60th St': 'West 60th Street',
+}
+
+DECK_COLUMNS = ['detection_region', 'vehicle_type', 'lat', 'lng', 'lng_offset',
+                'crz_entries', 'color', 'height', 'order']
+
+
+def _entry_point_frame():
+    names = list(ENTRY_POINTS) + list(DETECTION_GROUP_ALIASES)
+    entry_names = list(ENTRY_POINTS) + list(DETECTION_GROUP_ALIASES.values())
+    return pd.DataFrame({
+        'detection_group': names,
+        'detection_region': entry_names,
+        'lat': [ENTRY_POINTS[name][0] for name in entry_names],
+        'lng': [ENTRY_POINTS[name][1] for name in entry_names],
+    })
+
+
+def _vehicle_type_frame():
+    types = {**VEHICLE_TYPES, 'other': OTHER_VEHICLE}
+    return pd.DataFrame({
+        'vehicle_type': list(types),
+        'color': [info['color'] for info in types.values()],
+        'order': [info['order'] for info in types.values()],
+    })
+
+
+ENTRY_POINT_FRAME = _entry_point_frame()
+VEHICLE_CLASS_FRAME = pd.DataFrame({
+    'vehicle_class': list(VEHICLE_CLASS_MAPPING),
+    'vehicle_type': list(VEHICLE_CLASS_MAPPING.values()),
+})
+VEHICLE_TYPE_FRAME = _vehicle_type_frame()
+
+
+def build_map_frame(totals):
+    """
+    Deck.gl column rows from a frame of (detection_group, vehicle_class, crz_entries) totals.
+    Groups that are not known entry points are dropped; unknown vehicle classes become 'other'.
+    """
+    if totals.empty:
+        return pd.DataFrame(columns=DECK_COLUMNS)
+
+    frame = totals.merge(ENTRY_POINT_FRAME, on='detection_group', how='inner')
+    frame = frame.merge(VEHICLE_CLASS_FRAME, on='vehicle_class', how='left')
+    frame['vehicle_type'] = frame['vehicle_type'].fillna('other')
+    frame = (frame.groupby(['detection_region', 'vehicle_type', 'lat', 'lng'], as_index=False, observed=True)
+             ['crz_entries'].sum())
+    if frame.empty:
+        return pd.DataFrame(columns=DECK_COLUMNS)
+    frame = frame.merge(VEHICLE_TYPE_FRAME, on='vehicle_type', how='left')
+
+    max_entries = frame['crz_entries'].max()
+    if max_entries <= 0:
+        max_entries = 1
+    frame['height'] = (frame['crz_entries'] / max_entries * 100 * COLUMN_HEIGHT_SCALE).clip(lower=1)
+
+    # Spread each entry point's columns around its location, ordered by vehicle type
+    frame = frame.sort_values(['detection_region', 'order'], kind='stable', ignore_index=True)
+    by_location = frame.groupby('detection_region', sort=False)
+    position = by_location.cumcount()
+    type_count = by_location['vehicle_type'].transform('size')
+    frame['lng_offset'] = frame['lng'] + (position - (type_count - 1) / 2.0) * COLUMN_OFFSET_STEP
+
+    frame['crz_entries'] = frame['crz_entries'].astype('int64')
+    frame['order'] = frame['order'].astype('int64')
+    return frame[DECK_COLUMNS]
+
+
+def daily_totals(start=None, end=None):
+    """Summed DailyEntryTotal rows per detection group and vehicle class, optionally within [start, end]."""
+    rows = DailyEntryTotal.objects.all()
+    if start:
+        rows = rows.filter(toll_date__gte=start)
+    if end:
+        rows = rows.filter(toll_date__lte=end)
+    rows = rows.values('detection_group', 'vehicle_class').annotate(crz_entries=Sum('crz_entries')).order_by()
+    return pd.DataFrame.from_records(list(rows), columns=['detection_group', 'vehicle_class', 'crz_entries'])
+
+
+def daily_date_range():
+    """(min_date, max_date) covered by DailyEntryTotal, or (None, None) when it is empty."""
+    bounds = DailyEntryTotal.objects.aggregate(start=Min('toll_date'), end=Max('toll_date'))
+    return bounds['start'], bounds['end']
+
+
+@cached_section(MAP_RANGE_CACHE_KEY)
+def get_map_range_data(start: date, end: date):
+    """Deck.gl column rows for [start, end], cached per range and the data versions of its months."""
+    cache_key = f'{versioned_key(MAP_RANGE_CACHE_KEY, months=months_between(start, end))}:{start.isoformat()}:{end.isoformat()}'
+    frame = cache.get(cache_key)
+    if frame is not None:
+        print(f"--- Cache Hit: Map data {start} to {end} ---")
+        mark_cache_hit()
+        return frame
+
+    print(f"--- Cache Miss: Aggregating map data {start} to {end} ---")
+    frame = build_map_frame(daily_totals(start, end))
+    cache.set(cache_key, frame, CACHE_TIMEOUT)
+    return frame
+
+
+def to_arrow_ipc(frame):
+    """Serialise a frame as an Arrow IPC stream."""
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
@@ -1,11 +1,15 @@
 from django.shortcuts import render
 import json
-from shapely import Polygon, Point
-import random
-import math
+from datetime import date
+from django.db.models import Max, Min
+from django.http import HttpResponse, JsonResponse
 
 # Import the caching utility function and constants
 from .cache_utils import get_map_data, VEHICLE_TYPES, ENTRY_POINTS
+from .models import HistoricalScore
+from .crz_geometry import get_sampling_grid
+from .heatmap import get_heatmap_raster, raster_cell_sizes
+from .map_data import get_map_range_data, to_arrow_ipc
 
 # Remove unused imports:
 # from .models import VehicleEntry
@@ -18,52 +22,6 @@ from .cache_utils import get_map_data, VEHICLE_TYPES, ENTRY_POINTS
 # from datetime import datetime, timedelta
 
 # pn.extension('deckgl') # No longer creating DeckGL object in Python
-def generate_random_points_in_polygon(poly, num_points, min_lon, min_lat, max_lon, max_lat):
-    points = []
-    while len(points) < num_points:
-        # Generate a random point within the bounding box
-        random_lon = random.uniform(min_lon, max_lon)
-        random_lat = random.uniform(min_lat, max_lat)
-        p = Point(random_lon, random_lat)
-        # Only add the point if it lies within the polygon
-        if poly.contains(p):
-            # Here we return the coordinates in (latitude, longitude) order if desired
-            points.append((random_lat, random_lon))
-    return points
-
-def haversine(lat1, lon1, lat2, lon2):
-    """
-    Calculate the great-circle distance between two points on Earth using the haversine formula.
-    Returns the distance in kilometers.
-    """
-    R = 6371  # Earth's radius in kilometers
-    dLat = math.radians(lat2 - lat1)
-    dLon = math.radians(lon2 - lon1)
-    a = math.sin(dLat / 2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dLon / 2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    distance = R * c
-    return distance
-
-def get_random_points(vertices, num_points):
-    polygon_coords = [(lon, lat) for lat, lon in vertices]
-    polygon = Polygon(polygon_coords)
-        
-    min_lon, min_lat, max_lon, max_lat = polygon.bounds
-    
-    random_points = generate_random_points_in_polygon(polygon, num_points, min_lon, min_lat, max_lon, max_lat)
-    random_points_dict = []
-    for i, (lat, lon) in enumerate(random_points, start=1):
-        distances = {}
-        for name, (ep_lat, ep_lon) in ENTRY_POINTS.items():
-            distance = haversine(lat, lon, ep_lat, ep_lon)
-            distances[name] = distance
-        random_points_dict.append({'lat': lat, 'lon': lon, 'score' : 0, 'previous_score' : 0, 'distances' : distances})
-        
-    return random_points_dict
-    
-
-    
-
 def map(request):
     """
     View function for the map visualization.
@@ -75,33 +33,14 @@ def map(request):
         # Step 1: Get map data from cache or generate if missed
         map_data_context = get_map_data()
         
-        vertices = [
-        (40.75888, -73.95778),
-        (40.77349, -73.99493),
-        (40.76962, -73.99524),
-        (40.76312, -74.00047),
-        (40.75519, -74.00734),
-        (40.75018, -74.00931),
-        (40.74765, -74.00854),
-        (40.74134, -74.00949),
-        (40.73926, -74.01069),
-        (40.7229, -74.01202),
-        (40.70459, -74.01747),
-        (40.70107, -74.01644),
-        (40.70029, -74.01146),
-        (40.70704, -73.99896),
-        (40.71064, -73.97876),
-        (40.72898, -73.97052),
-        (40.73613, -73.97367),
-        (40.74386, -73.97079)
-        ]
+        # Same precomputed grid the heatmap endpoints interpolate onto, so points line up
+        dict_points = get_sampling_grid().points()
 
-        # Convert the list into the format Shapely expects: (longitude, latitude)
-       
-        dict_points = get_random_points(vertices, num_points=50)
+        # [west, south, east, north] of each server-rendered live heatmap raster level
+        heatmap_raster_bounds = [get_heatmap_raster(level).bounds for level in range(len(raster_cell_sizes()))]
 
-        # Generate 15 random points within the polygon
-        
+        # Date bounds of the backfilled score history for the heatmap time slider
+        score_history_range = HistoricalScore.objects.aggregate(start=Min('toll_date'), end=Max('toll_date'))
 
         # Step 2: Prepare context for the template
         # The data is already processed, we just need to pass it
@@ -114,6 +53,9 @@ def map(request):
             'vehicle_types': json.dumps(VEHICLE_TYPES), # Ensure it's JSON for the template
             'entry_points': json.dumps(ENTRY_POINTS), 
             'points_data': json.dumps(dict_points), # Ensure it's JSON for the template
+            'heatmap_raster_bounds': json.dumps(heatmap_raster_bounds),
+            'score_history_start': score_history_range['start'].isoformat() if score_history_range['start'] else '',
+            'score_history_end': score_history_range['end'].isoformat() if score_history_range['end'] else '',
             # The map template's JS expects raw data for vehicleTypes and entryPoints,
             # and the data for the layer will be fetched via JS simulation or API later.
             # We don't pass the deck_data directly here as the template is set up for JS fetching.
@@ -150,4 +92,22 @@ def map(request):
             'entry_points': json.dumps(ENTRY_POINTS),
             'error_message': f'An unexpected error occurred during map page load: {e}'
         }
-        return render(request, 'congestion_analyzer/map.html', context)
\ No newline at end of file
+        return render(request, 'congestion_analyzer/map.html', context)
+
+def map_data(request):
+    """
+    Entry-point x vehicle-type columns for ?start=YYYY-MM-DD&end=YYYY-MM-DD.
+    JSON records by default, or an Arrow IPC stream with ?format=arrow.
+    """
+    try:
+        start = date.fromisoformat(request.GET.get('start', ''))
+        end = date.fromisoformat(request.GET.get('end', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Expected ?start=YYYY-MM-DD&end=YYYY-MM-DD'}, status=400)
+    if start > end:
+        return JsonResponse({'error': 'start must be on or before end'}, status=400)
+
+    frame = get_map_range_data(start, end)
+    if request.GET.get('format') == 'arrow':
+        return HttpResponse(to_arrow_ipc(frame), content_type='application/vnd.apache.arrow.stream')
+    return HttpResponse(frame.to_json(orient='records'), content_type='application/json')
@@ -0,0 +1,192 @@
+"""
+A small in-process metrics registry with Prometheus text output.
+
+Counters and histograms are keyed by label values and guarded by one lock. Every
+worker process keeps its own registry, so scrape each worker (or put them behind
+one that aggregates). Timings observed while a request is running are also
+collected for that request's Server-Timing header (see middleware.MetricsMiddleware).
+"""
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+
+    def inc(self, amount=1.0, **labels):
+        key = _label_key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        for key, value in self._values.items():
+            yield f'{self.name}{_format_labels(key)} {value:g}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._values = {}  # label key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        for key, state in self._values.items():
+            for bound, count in zip(self.buckets, state):
+                yield f'{self.name}_bucket{_format_labels(key, [("le", f"{bound:g}")])} {count}'
+            yield f'{self.name}_bucket{_format_labels(key, [("le", "+Inf")])} {state[-1]}'
+            yield f'{self.name}_sum{_format_labels(key)} {state[-2]:g}'
+            yield f'{self.name}_count{_format_labels(key)} {state[-1]}'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text):
+        return self._metrics.get(name) or self.register(Counter(name, help_text))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._metrics.get(name) or self.register(Histogram(name, help_text, buckets))
+
+    def render(self):
+        """Everything in Prometheus text exposition format."""
+        lines = []
+        with _lock:
+            for metric in self._metrics.values():
+                lines.append(f'# HELP {metric.name} {metric.help}')
+                lines.append(f'# TYPE {metric.name} {metric.kind}')
+                lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.histogram('http_request_duration_seconds', 'Time until the view returned a response')
+REQUEST_DB_QUERIES = registry.histogram('http_request_db_queries', 'Database queries per request',
+                                        buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 1000))
+REQUEST_DB_DURATION = registry.histogram('http_request_db_duration_seconds', 'Database time per request')
+CACHE_REQUESTS = registry.counter('cache_requests_total', 'Cache lookups by key and result (hit or miss)')
+CACHE_REBUILD_DURATION = registry.histogram('cache_rebuild_duration_seconds', 'Time to rebuild a cache entry after a miss')
+UPSTREAM_FETCH_DURATION = registry.histogram('upstream_fetch_duration_seconds', 'Latency of upstream data fetches')
+DETECTOR_DURATION = registry.histogram('anomaly_detector_duration_seconds', 'Anomaly detector run time')
+
+
+# Per-request Server-Timing entries
+
+def start_request_timings():
+    _local.timings = []
+
+
+def pop_request_timings():
+    timings = getattr(_local, 'timings', None) or []
+    _local.timings = None
+    return timings
+
+
+def record_timing(name, seconds, description=''):
+    """Add a Server-Timing entry to the current request, if there is one."""
+    timings = getattr(_local, 'timings', None)
+    if timings is not None:
+        timings.append((name, seconds, description))
+
+
+# Cache instrumentation
+
+def mark_cache_hit():
+    """Called by a cached_section function when it served from the cache."""
+    stack = getattr(_local, 'cache_stack', None)
+    if stack:
+        stack[-1] = True
+
+
+def cached_section(key):
+    """
+    Count hits and misses of a cache-or-rebuild function under `key` and time its
+    rebuilds. The function calls mark_cache_hit() on its hit path; nesting is fine.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            stack = _local.__dict__.setdefault('cache_stack', [])
+            stack.append(False)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                hit = stack.pop()
+                CACHE_REQUESTS.inc(key=key, result='hit' if hit else 'miss')
+                if not hit:
+                    CACHE_REBUILD_DURATION.observe(elapsed, key=key)
+                    record_timing(f'cache-{key}', elapsed, 'rebuild')
+        return wrapper
+    return decorator
+
+
+def timed(histogram, **labels):
+    """Decorator observing the call duration in `histogram` and the request's Server-Timing."""
+    def decorator(func):
+        timing_name = labels.get('name', func.__name__)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                histogram.observe(elapsed, **labels)
+                record_timing(timing_name, elapsed)
+        return wrapper
+    return decorator
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from . import profiling
+from .metrics import registry
+
+def metrics(request):
+    """
+    This process's metrics in Prometheus text format. Disabled with METRICS_ENABLED = False.
+    """
+    if not getattr(settings, 'METRICS_ENABLED', True):
+        raise Http404("Metrics are disabled")
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def profile_file(request, profile_id, kind):
+    """
+    A saved request profile: 'folded' collapsed stacks, 'stats' (pstats) or 'summary'.
+    Needs PROFILING_ENABLED and the same signed token used to capture it.
+    """
+    if not profiling.wants_profile(request):
+        raise Http404("Profiling is disabled")
+    path = profiling.profile_path(profile_id, kind)
+    if path is None or not path.exists():
+        raise Http404("No such profile")
+    content_type = {'folded': 'text/plain; charset=utf-8', 'summary': 'application/json'}.get(kind, 'application/octet-stream')
+    return FileResponse(open(path, 'rb'), content_type=content_type, as_attachment=(kind == 'stats'), filename=path.name)
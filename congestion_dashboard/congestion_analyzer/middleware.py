@@ -0,0 +1,81 @@
+import time
+
+from django.db import connection
+from django.urls import Resolver404, resolve, reverse
+
+from . import metrics, profiling
+
+
+class MetricsMiddleware:
+    """
+    Records per-view latency and database queries/time, and adds a Server-Timing
+    header with those plus any cache rebuilds or detector runs during the request.
+    For streaming responses the timing covers the view only, not the streamed body.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db = {'queries': 0, 'seconds': 0.0}
+
+        def count_queries(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db['queries'] += 1
+                db['seconds'] += time.perf_counter() - started
+
+        metrics.start_request_timings()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(count_queries):
+                response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - started
+            timings = metrics.pop_request_timings()
+
+        match = request.resolver_match
+        view = (match.view_name if match else None) or 'unmatched'
+        metrics.REQUEST_DURATION.observe(elapsed, view=view, method=request.method, status=response.status_code)
+        metrics.REQUEST_DB_QUERIES.observe(db['queries'], view=view)
+        metrics.REQUEST_DB_DURATION.observe(db['seconds'], view=view)
+
+        entries = [f'app;dur={elapsed * 1000:.1f}',
+                   f'db;dur={db["seconds"] * 1000:.1f};desc="{db["queries"]} queries"']
+        entries += [f'{name};dur={seconds * 1000:.1f}' + (f';desc="{description}"' if description else '')
+                    for name, seconds, description in timings]
+        response['Server-Timing'] = ', '.join(entries)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a request when PROFILING_ENABLED is on and it carries a valid signed token
+    (see profiling.py). The response gets X-Profile-Id and a Link header pointing at the
+    saved stats and collapsed stacks. Other requests pass straight through.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling.wants_profile(request) or self._is_profile_download(request):
+            return self.get_response(request)
+
+        response, profile_id = profiling.profile_request(request, self.get_response)
+        token = profiling.request_token(request)
+        links = [f'<{reverse("congestion_analyzer:profile_file", args=[profile_id, kind])}'
+                 f'?{profiling.PROFILE_PARAM}={token}>; rel="profile-{kind}"'
+                 for kind in ('folded', 'stats')]
+        response['X-Profile-Id'] = profile_id
+        response['Link'] = ', '.join(links)
+        return response
+
+    @staticmethod
+    def _is_profile_download(request):
+        try:
+            return resolve(request.path_info).url_name == 'profile_file'
+        except Resolver404:
+            return False
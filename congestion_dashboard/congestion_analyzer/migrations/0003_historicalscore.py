@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('congestion_analyzer', '0002_scoresnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoricalScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('toll_date', models.DateField()),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('detection_group', models.CharField(max_length=50)),
+                ('score', models.FloatField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('toll_date', 'bucket', 'detection_group'), name='unique_score_per_bucket')],
+            },
+        ),
+    ]
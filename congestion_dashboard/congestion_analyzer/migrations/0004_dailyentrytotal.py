@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('congestion_analyzer', '0003_historicalscore'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyEntryTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('toll_date', models.DateField()),
+                ('detection_group', models.CharField(max_length=50)),
+                ('vehicle_class', models.CharField(max_length=50)),
+                ('crz_entries', models.PositiveBigIntegerField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('toll_date', 'detection_group', 'vehicle_class'), name='unique_daily_entry_total')],
+            },
+        ),
+    ]
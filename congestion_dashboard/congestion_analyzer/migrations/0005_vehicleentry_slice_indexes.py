@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('congestion_analyzer', '0004_dailyentrytotal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vehicleentry',
+            index=models.Index(fields=['toll_date', 'detection_region'], name='entry_date_region_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicleentry',
+            index=models.Index(fields=['detection_region', 'toll_date'], name='entry_region_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicleentry',
+            index=models.Index(fields=['vehicle_class', 'toll_date'], name='entry_class_date_idx'),
+        ),
+    ]
@@ -0,0 +1,164 @@
+# Star schema for VehicleEntry: the repeated name columns move to dimension tables and
+# rows keep integer keys. Keys are added nullable, filled in, and only then made required.
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+# Name column of the old VehicleEntry -> (dimension model, new key field)
+DIMENSIONS = {
+    'detection_region': ('DetectionRegion', 'detection_region_key'),
+    'detection_group': ('DetectionGroup', 'detection_group_key'),
+    'vehicle_class': ('VehicleClass', 'vehicle_class_key'),
+    'time_period': ('TimePeriod', 'time_period_key'),
+}
+
+
+def populate_dimensions(apps, schema_editor):
+    """One member per distinct name, then one UPDATE per dimension to point every row at its key."""
+    VehicleEntry = apps.get_model('congestion_analyzer', 'VehicleEntry')
+    for column, (model_name, key_field) in DIMENSIONS.items():
+        Dimension = apps.get_model('congestion_analyzer', model_name)
+        names = VehicleEntry.objects.order_by().values_list(column, flat=True).distinct()
+        Dimension.objects.bulk_create([Dimension(name=name) for name in sorted(names)])
+        VehicleEntry.objects.update(**{key_field: Subquery(
+            Dimension.objects.filter(name=OuterRef(column)).values('pk')[:1])})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('congestion_analyzer', '0006_partitionversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DetectionRegion',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=50, unique=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='DetectionGroup',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=50, unique=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='VehicleClass',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=50, unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Vehicle classes',
+            },
+        ),
+        migrations.CreateModel(
+            name='TimePeriod',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=50, unique=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='vehicleentry',
+            name='detection_region_key',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='congestion_analyzer.detectionregion'),
+        ),
+        migrations.AddField(
+            model_name='vehicleentry',
+            name='detection_group_key',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='congestion_analyzer.detectiongroup'),
+        ),
+        migrations.AddField(
+            model_name='vehicleentry',
+            name='vehicle_class_key',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='congestion_analyzer.vehicleclass'),
+        ),
+        migrations.AddField(
+            model_name='vehicleentry',
+            name='time_period_key',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='congestion_analyzer.timeperiod'),
+        ),
+        migrations.RunPython(populate_dimensions, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='vehicleentry',
+            name='entry_date_region_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='vehicleentry',
+            name='entry_region_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='vehicleentry',
+            name='entry_class_date_idx',
+        ),
+        migrations.RemoveField(
+            model_name='vehicleentry',
+            name='day_of_week',
+        ),
+        migrations.RemoveField(
+            model_name='vehicleentry',
+            name='detection_group',
+        ),
+        migrations.RemoveField(
+            model_name='vehicleentry',
+            name='detection_region',
+        ),
+        migrations.RemoveField(
+            model_name='vehicleentry',
+            name='hour_of_day',
+        ),
+        migrations.RemoveField(
+            model_name='vehicleentry',
+            name='time_period',
+        ),
+        migrations.RemoveField(
+            model_name='vehicleentry',
+            name='vehicle_class',
+        ),
+        migrations.AlterField(
+            model_name='vehicleentry',
+            name='detection_region_key',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='congestion_analyzer.detectionregion'),
+        ),
+        migrations.AlterField(
+            model_name='vehicleentry',
+            name='detection_group_key',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='congestion_analyzer.detectiongroup'),
+        ),
+        migrations.AlterField(
+            model_name='vehicleentry',
+            name='vehicle_class_key',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='congestion_analyzer.vehicleclass'),
+        ),
+        migrations.AlterField(
+            model_name='vehicleentry',
+            name='time_period_key',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='congestion_analyzer.timeperiod'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicleentry',
+            index=models.Index(fields=['toll_date', 'detection_region_key'], name='entry_date_region_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicleentry',
+            index=models.Index(fields=['detection_region_key', 'toll_date'], name='entry_region_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicleentry',
+            index=models.Index(fields=['vehicle_class_key', 'toll_date'], name='entry_class_date_idx'),
+        ),
+    ]
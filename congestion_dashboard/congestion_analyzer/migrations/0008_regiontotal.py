@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_region_totals(apps, schema_editor):
+    VehicleEntry = apps.get_model('congestion_analyzer', 'VehicleEntry')
+    RegionTotal = apps.get_model('congestion_analyzer', 'RegionTotal')
+    totals = (VehicleEntry.objects.values('detection_region_key')
+              .annotate(rows=Count('pk'), crz_entries=Sum('crz_entries')).order_by())
+    RegionTotal.objects.bulk_create([
+        RegionTotal(detection_region_key_id=total['detection_region_key'], rows=total['rows'], crz_entries=total['crz_entries'])
+        for total in totals
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('congestion_analyzer', '0007_vehicleentry_star_schema'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegionTotal',
+            fields=[
+                ('detection_region_key', models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, primary_key=True, related_name='+', serialize=False, to='congestion_analyzer.detectionregion')),
+                ('rows', models.PositiveBigIntegerField(default=0)),
+                ('crz_entries', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_region_totals, migrations.RunPython.noop),
+    ]
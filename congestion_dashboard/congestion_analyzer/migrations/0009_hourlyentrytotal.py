@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('congestion_analyzer', '0008_regiontotal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyEntryTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('toll_date', models.DateField()),
+                ('toll_hour', models.PositiveSmallIntegerField()),
+                ('day_of_week_int', models.PositiveSmallIntegerField()),
+                ('rows', models.PositiveIntegerField()),
+                ('crz_entries', models.PositiveBigIntegerField()),
+                ('excluded_roadway_entries', models.PositiveBigIntegerField()),
+                ('detection_group_key', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='congestion_analyzer.detectiongroup')),
+                ('detection_region_key', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='congestion_analyzer.detectionregion')),
+                ('time_period_key', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='congestion_analyzer.timeperiod')),
+                ('vehicle_class_key', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='congestion_analyzer.vehicleclass')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('toll_date', 'toll_hour', 'time_period_key', 'vehicle_class_key', 'detection_group_key', 'detection_region_key'), name='unique_hourly_entry_total')],
+            },
+        ),
+    ]
@@ -1,25 +1,286 @@
-from django.db import models
+import threading
+
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
 
 # Create your models here.
 
+WEEKDAY_NAMES = ('Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday')  # ExtractWeekDay 1-7
+
+_dimension_lock = threading.Lock()
+_dimension_names = {}  # Dimension model -> {key: name}, per process
+
+
+class Dimension(models.Model):
+    """
+    A small lookup table of the VehicleEntry star schema. Members are only ever added,
+    never renamed or deleted, so each process keeps a {key: name} map of committed members
+    and only rereads the table when it meets a key it has not seen.
+    """
+    id = models.SmallAutoField(primary_key=True)
+    name = models.CharField(max_length=50, unique=True)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def names(cls, keys=()):
+        """{key: name} covering `keys` (default: whatever this process has loaded, loading once)."""
+        names = _dimension_names.get(cls)
+        if names is None or any(key not in names for key in keys):
+            names = cls._reload()
+        return names
+
+    @classmethod
+    def name_of(cls, key):
+        return cls.names((key,)).get(key)
+
+    @classmethod
+    def keys_for(cls, names):
+        """Keys of the members called `names`; names with no member match nothing."""
+        wanted = set(names)
+        keys = {name: key for key, name in cls.names().items()}
+        if not wanted.issubset(keys):
+            keys = {name: key for key, name in cls._reload().items()}
+        return sorted(keys[name] for name in wanted if name in keys)
+
+    @classmethod
+    def resolve(cls, names):
+        """{name: key} for `names`, adding members for the ones that are new."""
+        keys = {name: key for key, name in cls.names().items()}
+        missing = set(names) - keys.keys()
+        if missing:
+            cls.objects.bulk_create([cls(name=name) for name in sorted(missing)], ignore_conflicts=True)
+            # Look the new members up by name: the map may not hold them yet (see _remember)
+            added = dict(cls.objects.filter(name__in=missing).values_list('name', 'pk'))
+            keys.update(added)
+            cls._remember({key: name for name, key in added.items()})
+        return {name: keys[name] for name in names}
+
+    @classmethod
+    def _reload(cls):
+        names = dict(cls.objects.values_list('pk', 'name'))
+        cls._remember(names, replace=True)
+        return names
+
+    @classmethod
+    def _remember(cls, names, replace=False):
+        """
+        Add {key: name} to the process map once the current transaction commits (at once
+        outside one). Rows read inside a transaction may be its own uncommitted inserts,
+        and SQLite hands a rolled-back key to the next insert, so caching them earlier
+        could map a name to another member's key.
+        """
+        def publish():
+            with _dimension_lock:
+                if replace:
+                    _dimension_names[cls] = dict(names)
+                elif cls in _dimension_names:  # Else the next names() loads the whole table
+                    _dimension_names[cls].update(names)
+
+        transaction.on_commit(publish)
+
+
+class DetectionRegion(Dimension):
+    pass
+
+
+class DetectionGroup(Dimension):
+    pass
+
+
+class VehicleClass(Dimension):
+    class Meta:
+        verbose_name_plural = "Vehicle classes"
+
+
+class TimePeriod(Dimension):
+    pass
+
+
+class LegacyColumn:
+    """
+    Read-only stand-in for a VehicleEntry column the star schema dropped, computed per
+    instance (dimension names come from the in-process map, so no query per row).
+    Instances from a with_names() queryset carry the value directly.
+    """
+
+    def __init__(self, compute):
+        self.compute = compute
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        if self.name in instance.__dict__:
+            return instance.__dict__[self.name]
+        return self.compute(instance)
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
+
+
+# Dimension key field and model behind each name column of the pre-star-schema table
+DIMENSION_FIELDS = {
+    'detection_region': ('detection_region_key', DetectionRegion),
+    'detection_group': ('detection_group_key', DetectionGroup),
+    'vehicle_class': ('vehicle_class_key', VehicleClass),
+    'time_period': ('time_period_key', TimePeriod),
+}
+
+
+class VehicleEntryQuerySet(models.QuerySet):
+    def with_names(self):
+        """
+        The string columns the table had before the star schema (names through joins with
+        the dimension tables, day_of_week and hour_of_day derived), for values() and filter()
+        by name. Hot paths group by the integer keys and name them in memory instead.
+        """
+        return self.annotate(
+            **{column: F(f'{key_field}__name') for column, (key_field, _) in DIMENSION_FIELDS.items()},
+            hour_of_day=F('toll_hour'),
+            day_of_week=Case(*(When(day_of_week_int=number, then=Value(name))
+                               for number, name in enumerate(WEEKDAY_NAMES, start=1)),
+                             output_field=models.CharField()),
+        )
+
+
 class VehicleEntry(models.Model):
+    """
+    Fact table: event time, integer dimension keys and counts. Names live in the
+    dimension tables; day_of_week and hour_of_day follow from toll_date and toll_hour.
+    """
     toll_date = models.DateField()
     toll_hour = models.PositiveSmallIntegerField()
     toll_10_minute_block = models.PositiveSmallIntegerField()
     minute_of_hour = models.PositiveSmallIntegerField()
-    hour_of_day = models.PositiveSmallIntegerField()
     day_of_week_int = models.PositiveSmallIntegerField()
-    day_of_week = models.CharField(max_length=10)
     toll_week = models.PositiveIntegerField()
-    time_period = models.CharField(max_length=50)
-    vehicle_class = models.CharField(max_length=50)
-    detection_group = models.CharField(max_length=50)
-    detection_region = models.CharField(max_length=50)
+    # The composite indexes below cover the keys; single-column FK indexes would only add size
+    time_period_key = models.ForeignKey(TimePeriod, on_delete=models.PROTECT, db_index=False, related_name='+')
+    vehicle_class_key = models.ForeignKey(VehicleClass, on_delete=models.PROTECT, db_index=False, related_name='+')
+    detection_group_key = models.ForeignKey(DetectionGroup, on_delete=models.PROTECT, db_index=False, related_name='+')
+    detection_region_key = models.ForeignKey(DetectionRegion, on_delete=models.PROTECT, db_index=False, related_name='+')
     crz_entries = models.PositiveIntegerField()
     excluded_roadway_entries = models.PositiveIntegerField()
 
+    objects = VehicleEntryQuerySet.as_manager()
+
+    time_period = LegacyColumn(lambda entry: TimePeriod.name_of(entry.time_period_key_id))
+    vehicle_class = LegacyColumn(lambda entry: VehicleClass.name_of(entry.vehicle_class_key_id))
+    detection_group = LegacyColumn(lambda entry: DetectionGroup.name_of(entry.detection_group_key_id))
+    detection_region = LegacyColumn(lambda entry: DetectionRegion.name_of(entry.detection_region_key_id))
+    day_of_week = LegacyColumn(lambda entry: WEEKDAY_NAMES[entry.day_of_week_int - 1])
+    hour_of_day = LegacyColumn(lambda entry: entry.toll_hour)
+
     def __str__(self):
         return f"{self.toll_date} {self.toll_hour}:{self.minute_of_hour} - {self.vehicle_class}"
 
     class Meta:
         verbose_name_plural = "Vehicle Entries"
+        indexes = [
+            # Date-range slices, optionally narrowed to regions or vehicle classes
+            models.Index(fields=['toll_date', 'detection_region_key'], name='entry_date_region_idx'),
+            models.Index(fields=['detection_region_key', 'toll_date'], name='entry_region_date_idx'),
+            models.Index(fields=['vehicle_class_key', 'toll_date'], name='entry_class_date_idx'),
+        ]
+
+
+class ScoreSnapshot(models.Model):
+    """A published version of the congestion scorer state, shared by all worker processes."""
+    version = models.PositiveBigIntegerField(unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    scores = models.JSONField()
+    state = models.JSONField()
+
+    def __str__(self):
+        return f"Score snapshot v{self.version} ({self.created_at})"
+
+
+class HistoricalScore(models.Model):
+    """Congestion score of one detection group at the end of one 10-minute bucket (event time)."""
+    toll_date = models.DateField()
+    bucket = models.PositiveSmallIntegerField()  # 10-minute bucket of the day, 0-143
+    detection_group = models.CharField(max_length=50)
+    score = models.FloatField()
+
+    def __str__(self):
+        return f"{self.toll_date} #{self.bucket} {self.detection_group}: {self.score:.1f}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['toll_date', 'bucket', 'detection_group'], name='unique_score_per_bucket'),
+        ]
+
+
+class DailyEntryTotal(models.Model):
+    """CRZ entries per day, detection group and vehicle class; rebuilt by `manage.py aggregate_daily_entries`."""
+    toll_date = models.DateField()
+    detection_group = models.CharField(max_length=50)
+    vehicle_class = models.CharField(max_length=50)
+    crz_entries = models.PositiveBigIntegerField()
+
+    def __str__(self):
+        return f"{self.toll_date} {self.detection_group} {self.vehicle_class}: {self.crz_entries}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['toll_date', 'detection_group', 'vehicle_class'], name='unique_daily_entry_total'),
+        ]
+
+
+class HourlyEntryTotal(models.Model):
+    """
+    Raw VehicleEntry rows compacted to one row per hour and dimension keys by `manage.py
+    retain_entries`, which moves the raw rows themselves to the Parquet archive (see archive).
+    Aggregate queries read these for the days no longer in VehicleEntry.
+    """
+    toll_date = models.DateField()
+    toll_hour = models.PositiveSmallIntegerField()
+    day_of_week_int = models.PositiveSmallIntegerField()
+    time_period_key = models.ForeignKey(TimePeriod, on_delete=models.PROTECT, db_index=False, related_name='+')
+    vehicle_class_key = models.ForeignKey(VehicleClass, on_delete=models.PROTECT, db_index=False, related_name='+')
+    detection_group_key = models.ForeignKey(DetectionGroup, on_delete=models.PROTECT, db_index=False, related_name='+')
+    detection_region_key = models.ForeignKey(DetectionRegion, on_delete=models.PROTECT, db_index=False, related_name='+')
+    rows = models.PositiveIntegerField()  # Raw rows compacted into this one
+    crz_entries = models.PositiveBigIntegerField()
+    excluded_roadway_entries = models.PositiveBigIntegerField()
+
+    def __str__(self):
+        return f"{self.toll_date} {self.toll_hour}:00 ({self.rows} rows): {self.crz_entries}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['toll_date', 'toll_hour', 'time_period_key', 'vehicle_class_key',
+                                            'detection_group_key', 'detection_region_key'],
+                                    name='unique_hourly_entry_total'),
+        ]
+
+
+class RegionTotal(models.Model):
+    """
+    Running VehicleEntry row count and CRZ entries of one detection region, rows that
+    retention has compacted included. Ingest adds to it in the transaction that inserts
+    the rows; `manage.py running_totals` checks or rebuilds it from the table and rollups.
+    """
+    detection_region_key = models.OneToOneField(DetectionRegion, on_delete=models.PROTECT, primary_key=True, related_name='+')
+    rows = models.PositiveBigIntegerField(default=0)
+    crz_entries = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.detection_region_key}: {self.rows} rows, {self.crz_entries} entries"
+
+
+class PartitionVersion(models.Model):
+    """Version of one month ('YYYY-MM') of VehicleEntry data; ingest bumps it, cache keys embed it."""
+    month = models.CharField(max_length=7, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.month} v{self.version}"
@@ -0,0 +1,173 @@
+"""
+On-demand profiling of single requests.
+
+With PROFILING_ENABLED on, a request carrying a valid signed token (the `_profile`
+query parameter or an X-Profile-Token header; `manage.py profiles --token` makes one)
+runs under cProfile while a sampler thread collects its stacks. The pstats file, a
+collapsed-stack file for flamegraph tools (flamegraph.pl, speedscope, inferno) and a
+small JSON summary are written to PROFILES_DIR, and the response links to them in
+its headers.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE_TOKEN'
+TOKEN_SALT = 'congestion_analyzer.profiling'
+PROFILE_ID_PATTERN = re.compile(r'^[\w.-]+$')
+PROFILE_FILES = {'stats': '.prof', 'folded': '.folded', 'summary': '.json'}
+
+
+def profiling_enabled():
+    return getattr(settings, 'PROFILING_ENABLED', False)
+
+
+def profiles_dir():
+    return Path(getattr(settings, 'PROFILES_DIR', Path(settings.BASE_DIR) / 'profiles'))
+
+
+def make_token():
+    """A signed token that turns on profiling until PROFILING_TOKEN_MAX_AGE runs out."""
+    return signing.dumps('profile', salt=TOKEN_SALT)
+
+
+def request_token(request):
+    return request.GET.get(PROFILE_PARAM) or request.META.get(PROFILE_HEADER)
+
+
+def token_is_valid(token):
+    if not token:
+        return False
+    try:
+        signing.loads(token, salt=TOKEN_SALT, max_age=getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 3600))
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def wants_profile(request):
+    return profiling_enabled() and token_is_valid(request_token(request))
+
+
+def profile_path(profile_id, kind):
+    """Path of one of a profile's files, or None for an unknown id or kind."""
+    if kind not in PROFILE_FILES or not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    return profiles_dir() / f'{profile_id}{PROFILE_FILES[kind]}'
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples one thread's Python stack every `interval` seconds into collapsed-stack counts.
+    cProfile only keeps caller -> callee edges, which cannot be turned back into real
+    stacks through Django's recursive middleware chain, so the flamegraph comes from here.
+    Frames from `stop_code` outwards (the profiling wrapper and the server) are left out.
+    """
+
+    def __init__(self, thread_id, interval, stop_code):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stop_code = stop_code
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None and frame.f_code is not self.stop_code:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                self.stacks[';'.join(reversed(labels))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def collapsed(self):
+        """Collapsed stacks ("a;b;c <samples>"), the input format of flamegraph.pl and speedscope."""
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(self.stacks.items()))
+
+
+def _frame_label(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'.replace(';', ',')
+
+
+def _prune(directory, keep):
+    summaries = sorted(directory.glob('*.json'), key=lambda path: path.stat().st_mtime)
+    for summary in summaries[:max(0, len(summaries) - keep)]:
+        for suffix in PROFILE_FILES.values():
+            summary.with_suffix(suffix).unlink(missing_ok=True)
+
+
+def profile_request(request, get_response):
+    """Run get_response(request) under cProfile and save the profile; returns (response, profile_id)."""
+    profiler = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident(), getattr(settings, 'PROFILING_SAMPLE_INTERVAL', 0.001),
+                           profile_request.__code__)
+    started = time.perf_counter()
+    sampler.start()
+    profiler.enable()
+    try:
+        response = get_response(request)
+    finally:
+        profiler.disable()
+        sampler.stop()
+    elapsed = time.perf_counter() - started
+
+    match = request.resolver_match
+    view = (match.view_name if match else None) or 'unmatched'
+    slug = re.sub(r'\W+', '_', view)
+    profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{uuid.uuid4().hex[:6]}"
+
+    directory = profiles_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(profile_path(profile_id, 'stats'))
+    stats = pstats.Stats(profiler)
+    profile_path(profile_id, 'folded').write_text(sampler.collapsed())
+    profile_path(profile_id, 'summary').write_text(json.dumps({
+        'id': profile_id,
+        'view': view,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'seconds': round(elapsed, 4),
+        'calls': stats.total_calls,
+        'samples': sum(sampler.stacks.values()),
+        'captured_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }, indent=2))
+    _prune(directory, getattr(settings, 'PROFILING_MAX_PROFILES', 100))
+    print(f"[Profiling] Saved {profile_id} ({elapsed * 1000:.1f} ms, {stats.total_calls} calls)")
+    return response, profile_id
+
+
+def list_profiles():
+    """Saved profile summaries, newest first."""
+    directory = profiles_dir()
+    if not directory.exists():
+        return []
+    summaries = [json.loads(path.read_text()) for path in directory.glob('*.json')]
+    return sorted(summaries, key=lambda summary: summary['id'], reverse=True)
+
+
+def top_frames(profile_id, sort='cumulative', limit=20):
+    """The pstats table of a saved profile's top `limit` functions."""
+    out = io.StringIO()
+    stats = pstats.Stats(str(profile_path(profile_id, 'stats')), stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
@@ -0,0 +1,452 @@
+"""
+Local stand-in for the data.ny.gov toll dataset.
+
+A small ASGI application answers /resource/<dataset>.json with the upstream record
+layout and a subset of SoQL ($select, $where, $group, $order, $limit, $offset and
+field=value filters), serving an MTA CSV export or the VehicleEntry table. A replay
+clock runs through the data's event time at a chosen speed-up, so only 10-minute
+blocks that have already ended are visible, like the live feed.
+
+Run it with `manage.py replay_upstream` and point TOLL_API_BASE_URL at it to exercise
+the live paths offline, deterministically and at scale.
+"""
+import asyncio
+import json
+import operator
+import re
+import time
+from urllib.parse import parse_qsl
+
+import pandas as pd
+
+from .row_index import RowIndex
+
+UPSTREAM_FIELDS = ['toll_date', 'toll_hour', 'toll_10_minute_block', 'minute_of_hour', 'hour_of_day',
+                   'day_of_week_int', 'day_of_week', 'toll_week', 'time_period', 'vehicle_class',
+                   'detection_group', 'detection_region', 'crz_entries', 'excluded_roadway_entries']
+CATEGORY_FIELDS = ['day_of_week', 'time_period', 'vehicle_class', 'detection_group', 'detection_region']
+
+# MTA CSV export header -> upstream JSON field
+CSV_COLUMNS = {
+    'Toll Date': 'toll_date',
+    'Toll Hour': 'toll_hour',
+    'Toll 10 Minute Block': 'toll_10_minute_block',
+    'Minute of Hour': 'minute_of_hour',
+    'Hour of Day': 'hour_of_day',
+    'Day of Week Int': 'day_of_week_int',
+    'Day of Week': 'day_of_week',
+    'Toll Week': 'toll_week',
+    'Time Period': 'time_period',
+    'Vehicle Class': 'vehicle_class',
+    'Detection Group': 'detection_group',
+    'Detection Region': 'detection_region',
+    'CRZ Entries': 'crz_entries',
+    'Excluded Roadway Entries': 'excluded_roadway_entries',
+}
+CSV_DATE_FORMAT = '%m/%d/%Y'
+CSV_DATETIME_FORMAT = '%m/%d/%Y %I:%M:%S %p'
+SOCRATA_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S.000'
+
+DEFAULT_LIMIT = 1000  # What the upstream API returns without $limit
+MAX_LIMIT = 50000
+BLOCK = pd.Timedelta(minutes=10)
+
+AGGREGATES = {'sum': 'sum', 'count': 'count', 'avg': 'mean', 'min': 'min', 'max': 'max'}
+COMPARISONS = {'=': operator.eq, '!=': operator.ne, '<>': operator.ne,
+               '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+TOKEN_PATTERN = re.compile(r"""\s*(?:
+    (?P<number>-?\d+(?:\.\d+)?)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<symbol><=|>=|!=|<>|=|<|>|\(|\)|,|\*)
+)""", re.VERBOSE)
+SELECT_PATTERN = re.compile(r'^(?:(?P<func>\w+)\s*\(\s*(?P<arg>\*|\w+)\s*\)|(?P<column>\*|\w+))'
+                            r'(?:\s+as\s+(?P<alias>\w+))?$', re.IGNORECASE)
+ORDER_PATTERN = re.compile(r'^(?P<name>\w+)(?:\s+(?P<direction>asc|desc))?$', re.IGNORECASE)
+
+
+class SoQLError(ValueError):
+    """A query this stand-in cannot answer; sent back as a 400 like the upstream API does."""
+
+
+# Loading
+
+def _finish_frame(frame):
+    for field in CATEGORY_FIELDS:
+        frame[field] = frame[field].astype('category')
+    return frame.sort_values('toll_10_minute_block', kind='stable', ignore_index=True)
+
+
+def upstream_frame(entries):
+    """Upstream-typed frame from one with VehicleEntry fields (the table or synthetic_data)."""
+    dates = pd.to_datetime(entries['toll_date'])
+    hours = dates + pd.to_timedelta(entries['toll_hour'], unit='h')
+    frame = pd.DataFrame({field: entries[field] for field in UPSTREAM_FIELDS})
+    frame['toll_date'] = dates
+    frame['toll_hour'] = hours
+    frame['toll_10_minute_block'] = hours + pd.to_timedelta(entries['minute_of_hour'], unit='m')
+    frame['toll_week'] = dates - pd.to_timedelta(entries['day_of_week_int'] - 1, unit='D')  # Weeks start on Sunday
+    return _finish_frame(frame)
+
+
+def read_upstream_csv(path):
+    """An MTA CSV export (the file import_data reads) as an upstream-typed frame."""
+    frame = pd.read_csv(path, usecols=list(CSV_COLUMNS)).rename(columns=CSV_COLUMNS)[UPSTREAM_FIELDS]
+    for field in ('toll_date', 'toll_week'):
+        frame[field] = pd.to_datetime(frame[field], format=CSV_DATE_FORMAT)
+    for field in ('toll_hour', 'toll_10_minute_block'):
+        frame[field] = pd.to_datetime(frame[field], format=CSV_DATETIME_FORMAT)
+    return _finish_frame(frame)
+
+
+def read_vehicle_entries(chunk_size=50_000):
+    """The VehicleEntry table as an upstream-typed frame."""
+    from .models import VehicleEntry
+
+    rows = VehicleEntry.objects.with_names().order_by().values_list(*UPSTREAM_FIELDS).iterator(chunk_size=chunk_size)
+    return upstream_frame(pd.DataFrame.from_records(rows, columns=UPSTREAM_FIELDS))
+
+
+# SoQL subset
+
+def _tokenize(text):
+    tokens, position = [], 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if not match or match.end() == position:
+            raise SoQLError(f"Could not parse $where near: {text[position:position + 20]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'string':
+            value = value[1:-1].replace("''", "'")
+        elif kind == 'number':
+            value = float(value) if '.' in value else int(value)
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+class _WhereParser:
+    """Recursive descent over $where tokens, producing a boolean mask over the frame."""
+
+    def __init__(self, frame, text):
+        self.frame = frame
+        self.tokens = _tokenize(text)
+        self.position = 0
+
+    def parse(self):
+        mask = self._or()
+        if self.position != len(self.tokens):
+            raise SoQLError(f"Unexpected {self.tokens[self.position][1]!r} in $where")
+        return mask
+
+    def _peek_keyword(self, *words):
+        if self.position < len(self.tokens):
+            kind, value = self.tokens[self.position]
+            return kind == 'name' and value.lower() in words
+        return False
+
+    def _take(self, kind=None, value=None):
+        if self.position >= len(self.tokens):
+            raise SoQLError("Unexpected end of $where")
+        token_kind, token_value = self.tokens[self.position]
+        if (kind and token_kind != kind) or (value and str(token_value).lower() != value):
+            raise SoQLError(f"Expected {value or kind} in $where, got {token_value!r}")
+        self.position += 1
+        return token_value
+
+    def _or(self):
+        mask = self._and()
+        while self._peek_keyword('or'):
+            self.position += 1
+            mask = mask | self._and()
+        return mask
+
+    def _and(self):
+        mask = self._not()
+        while self._peek_keyword('and'):
+            self.position += 1
+            mask = mask & self._not()
+        return mask
+
+    def _not(self):
+        if self._peek_keyword('not'):
+            self.position += 1
+            return ~self._not()
+        if self.tokens[self.position:self.position + 1] == [('symbol', '(')]:
+            self.position += 1
+            mask = self._or()
+            self._take('symbol', ')')
+            return mask
+        return self._predicate()
+
+    def _literal(self, series):
+        kind, value = self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+        if kind not in ('number', 'string'):
+            raise SoQLError(f"Expected a value in $where, got {value!r}")
+        self.position += 1
+        return _typed_value(series, value)
+
+    def _predicate(self):
+        field = self._take('name')
+        if field not in self.frame.columns:
+            raise SoQLError(f"No such column: {field}")
+        series = self.frame[field]
+
+        if self._peek_keyword('is'):
+            self.position += 1
+            negate = self._peek_keyword('not')
+            if negate:
+                self.position += 1
+            self._take('name', 'null')
+            return series.notna() if negate else series.isna()
+        if self._peek_keyword('between'):
+            self.position += 1
+            low = self._literal(series)
+            self._take('name', 'and')
+            high = self._literal(series)
+            return series.between(low, high)
+        if self._peek_keyword('in'):
+            self.position += 1
+            self._take('symbol', '(')
+            values = [self._literal(series)]
+            while self.tokens[self.position:self.position + 1] == [('symbol', ',')]:
+                self.position += 1
+                values.append(self._literal(series))
+            self._take('symbol', ')')
+            return series.isin(values)
+
+        comparison = COMPARISONS.get(self._take('symbol'))
+        if comparison is None:
+            raise SoQLError(f"Unsupported comparison on {field}")
+        value = self._literal(series)
+        if isinstance(series.dtype, pd.CategoricalDtype) and comparison not in (operator.eq, operator.ne):
+            series = series.astype(str)
+        return comparison(series, value)
+
+
+def _typed_value(series, value):
+    """A query value as the type of `series`, so it compares against the column's own values."""
+    try:
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return pd.Timestamp(value)
+        if pd.api.types.is_numeric_dtype(series):
+            return float(value)
+    except ValueError:
+        raise SoQLError(f"{value!r} is not a valid value for {series.name}")
+    return str(value)
+
+
+def _split_list(text):
+    return [item.strip() for item in text.split(',') if item.strip()]
+
+
+def _parse_select(text, columns):
+    """[(output name, source column, aggregate or None)] for a $select clause."""
+    items = []
+    for item in _split_list(text or '*'):
+        match = SELECT_PATTERN.match(item)
+        if not match:
+            raise SoQLError(f"Unsupported $select item: {item}")
+        if match['func']:
+            func = match['func'].lower()
+            if func not in AGGREGATES:
+                raise SoQLError(f"Unsupported function: {func}")
+            arg = match['arg']
+            if arg == '*' and func != 'count':
+                raise SoQLError(f"{func}(*) is not allowed")
+            if arg != '*' and arg not in columns:
+                raise SoQLError(f"No such column: {arg}")
+            default_name = 'count' if arg == '*' else f'{func}_{arg}'
+            items.append((match['alias'] or default_name, arg, func))
+        elif match['column'] == '*':
+            items.extend((field, field, None) for field in columns)
+        else:
+            if match['column'] not in columns:
+                raise SoQLError(f"No such column: {match['column']}")
+            items.append((match['alias'] or match['column'], match['column'], None))
+    return items
+
+
+def _parse_int(params, name, default, upper=None):
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        raise SoQLError(f"{name} must be an integer")
+    if value < 0:
+        raise SoQLError(f"{name} must not be negative")
+    return min(value, upper) if upper else value
+
+
+def run_soql(frame, params, index=None):
+    """
+    Answer a SoQL query (a dict of request parameters) from an upstream-typed frame.
+    `index` is a RowIndex of the frame (or of a frame it is a prefix of) on string values;
+    field=value filters on its columns are looked up there instead of scanned. Other
+    field=value filters parse the value as the column's type, so a timestamp written the
+    way socrata_json writes it (or any other form pandas reads) matches its rows.
+    """
+    columns = list(frame.columns)
+    filters = {field: value for field, value in params.items() if not field.startswith('$')}
+    for field in filters:
+        if field not in columns:
+            raise SoQLError(f"No such column: {field}")
+    indexed = {field: value for field, value in filters.items() if index is not None and field in index.postings}
+    if indexed:
+        frame = index.take(frame, **indexed)
+    for field, value in filters.items():
+        if field not in indexed:
+            frame = frame[frame[field] == _typed_value(frame[field], value)]
+    if params.get('$where'):
+        frame = frame[_WhereParser(frame, params['$where']).parse()]
+
+    select = _parse_select(params.get('$select'), columns)
+    group = _split_list(params.get('$group', ''))
+    for field in group:
+        if field not in columns:
+            raise SoQLError(f"No such column: {field}")
+    aggregated = group or any(func for _, _, func in select)
+
+    order = []
+    for item in _split_list(params.get('$order', '')):
+        match = ORDER_PATTERN.match(item)
+        if not match:
+            raise SoQLError(f"Unsupported $order item: {item}")
+        order.append((match['name'], (match['direction'] or 'asc').lower() == 'asc'))
+
+    if aggregated:
+        plain = [source for _, source, func in select if func is None]
+        if set(plain) - set(group):
+            raise SoQLError(f"Columns must be aggregated or in $group: {', '.join(sorted(set(plain) - set(group)))}")
+        aggregates = [(name, source, func) for name, source, func in select if func]
+        if not group:
+            result = pd.DataFrame({name: [len(frame) if source == '*' else frame[source].agg(AGGREGATES[func])]
+                                   for name, source, func in aggregates})
+        elif aggregates:
+            result = frame.groupby(group, observed=True, sort=False, as_index=False).agg(**{
+                name: (group[0], 'size') if source == '*' else (source, AGGREGATES[func])
+                for name, source, func in aggregates
+            })
+        else:
+            result = frame[group].drop_duplicates()
+        result = result[[source if func is None else name for name, source, func in select]]
+        result.columns = [name for name, _, _ in select]
+    else:
+        aliases = {name: source for name, source, _ in select}
+        if order:
+            by = [aliases.get(name, name) for name, _ in order]
+            if set(by) - set(columns):
+                raise SoQLError(f"No such column in $order: {', '.join(sorted(set(by) - set(columns)))}")
+            frame = frame.sort_values(by, ascending=[ascending for _, ascending in order], kind='stable')
+            order = []
+        result = frame[[source for _, source, _ in select]].set_axis([name for name, _, _ in select], axis=1)
+
+    if order:
+        missing = [name for name, _ in order if name not in result.columns]
+        if missing:
+            raise SoQLError(f"No such column in $order: {', '.join(missing)}")
+        result = result.sort_values([name for name, _ in order], ascending=[ascending for _, ascending in order],
+                                    kind='stable')
+
+    offset = _parse_int(params, '$offset', 0)
+    limit = _parse_int(params, '$limit', DEFAULT_LIMIT, MAX_LIMIT)
+    return result.iloc[offset:offset + limit]
+
+
+def socrata_json(frame):
+    """Rows as the upstream API writes them: every value a string, timestamps without a zone."""
+    out = pd.DataFrame(index=frame.index)
+    for column in frame.columns:
+        series = frame[column]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            out[column] = series.dt.strftime(SOCRATA_DATETIME_FORMAT)
+        else:
+            out[column] = series.astype(str).where(series.notna())
+    return out.to_json(orient='records')
+
+
+# Server
+
+class ReplayClock:
+    """
+    Event time of the replay. It starts at `start` and runs `speedup` times faster than
+    the wall clock; a speedup of 0 stops the clock, showing the whole dataset.
+    """
+
+    def __init__(self, start, speedup):
+        self.start = pd.Timestamp(start)
+        self.speedup = speedup
+        self._started = time.monotonic()
+
+    def now(self):
+        if not self.speedup:
+            return None
+        return self.start + pd.Timedelta(seconds=(time.monotonic() - self._started) * self.speedup)
+
+
+class ReplayApplication:
+    """ASGI app serving `frame` as dataset `dataset`, revealed block by block by `clock`."""
+
+    def __init__(self, frame, clock, dataset):
+        self.frame = frame
+        self.clock = clock
+        self.dataset = dataset
+        self._block_ends = (frame['toll_10_minute_block'] + BLOCK).to_numpy()
+        # On the values as field=value filters compare them, as strings
+        self.index = RowIndex.from_columns({field: frame[field].astype(str) for field in CATEGORY_FIELDS})
+
+    def visible(self):
+        """Rows whose 10-minute block has ended by the replay clock (rows are in event-time order)."""
+        now = self.clock.now()
+        if now is None:
+            return self.frame
+        return self.frame.iloc[:self._block_ends.searchsorted(now.to_datetime64(), side='right')]
+
+    def query(self, params):
+        return socrata_json(run_soql(self.visible(), params, self.index))
+
+    def status(self):
+        now = self.clock.now()
+        return json.dumps({
+            'dataset': self.dataset,
+            'rows': len(self.frame),
+            'visible_rows': len(self.visible()),
+            'speedup': self.clock.speedup,
+            'clock': now.strftime(SOCRATA_DATETIME_FORMAT) if now is not None else None,
+        })
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        if scope['type'] != 'http':
+            return
+
+        if scope['method'] not in ('GET', 'HEAD'):
+            status, body = 405, json.dumps({'error': True, 'message': 'Only GET is supported'})
+        elif scope['path'] == f'/resource/{self.dataset}.json':
+            params = dict(parse_qsl(scope['query_string'].decode(), keep_blank_values=True))
+            try:
+                # Queries over millions of rows are CPU-bound; keep the event loop free
+                status, body = 200, await asyncio.to_thread(self.query, params)
+            except SoQLError as e:
+                status, body = 400, json.dumps({'error': True, 'message': str(e)})
+        elif scope['path'] in ('/', '/health'):
+            status, body = 200, self.status()
+        else:
+            status, body = 404, json.dumps({'error': True, 'message': f"No dataset at {scope['path']}"})
+
+        now = self.clock.now()
+        headers = [(b'content-type', b'application/json; charset=utf-8'),
+                   (b'access-control-allow-origin', b'*')]
+        if now is not None:
+            headers.append((b'x-replay-clock', now.strftime(SOCRATA_DATETIME_FORMAT).encode()))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else body.encode()})
@@ -0,0 +1,139 @@
+"""
+Server-side replay of historical traffic as Server-Sent Events.
+
+Entries are summed per 10-minute window, detection region and vehicle class in the
+database, one day per query, and sent in event-time order as small `window` events.
+Days retention has compacted are summed from the Parquet archive instead: their hourly
+rollups are too coarse for 10-minute windows.
+The browser only keeps running totals, so replaying months of data costs constant
+memory there and one day of aggregates here. Pausing, seeking and changing speed are
+a reconnect with a new `start`/`speed`; every event's id is its window start, so an
+automatic EventSource reconnect resumes where the stream broke off.
+"""
+import json
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from django.db.models import Min, Sum
+
+from . import archive
+from .models import DetectionRegion, VehicleClass, VehicleEntry
+
+WINDOW = timedelta(minutes=10)
+DEFAULT_SPEED = 600.0  # Event-time seconds per wall-clock second: one window a second
+MAX_SPEED = 86400.0    # A day a second
+RETRY_MS = 2000
+
+
+def parse_time(value):
+    """A naive datetime from an ISO date or datetime string; None for an empty value."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date/time: {value}")
+    return parsed.replace(tzinfo=None)
+
+
+def first_window():
+    """Start of the earliest day with entries, raw or archived, or None when there are none."""
+    days = archive.archived_days()[:1]
+    first_raw = VehicleEntry.objects.aggregate(first=Min('toll_date'))['first']
+    if first_raw:
+        days.append(first_raw)
+    return datetime.combine(min(days), datetime.min.time()) if days else None
+
+
+def replay_days(start, end=None):
+    """Days in [start, end] with raw or archived entries, oldest first."""
+    days = VehicleEntry.objects.filter(toll_date__gte=start.date())
+    if end:
+        days = days.filter(toll_date__lte=end.date())
+    return sorted(set(days.dates('toll_date', 'day')) | set(archive.archived_days(start.date(), end and end.date())))
+
+
+def day_windows(day):
+    """{(hour, block): {(region, vehicle class): entries}} for one day, raw rows and archived ones."""
+    windows = defaultdict(Counter)
+    rows = (VehicleEntry.objects.filter(toll_date=day)
+            .values('toll_hour', 'toll_10_minute_block', 'detection_region_key', 'vehicle_class_key')
+            .annotate(crz_entries=Sum('crz_entries'))
+            .order_by())
+    for row in rows:
+        cell = (DetectionRegion.name_of(row['detection_region_key']), VehicleClass.name_of(row['vehicle_class_key']))
+        windows[row['toll_hour'], row['toll_10_minute_block']][cell] += row['crz_entries']
+    archived = archive.read_table(day, day, columns=[
+        'toll_hour', 'toll_10_minute_block', 'detection_region', 'vehicle_class', 'crz_entries'])
+    if archived is not None:
+        summed = archived.group_by(['toll_hour', 'toll_10_minute_block', 'detection_region', 'vehicle_class'])
+        for row in summed.aggregate([('crz_entries', 'sum')]).to_pylist():
+            cell = (row['detection_region'], row['vehicle_class'])
+            windows[row['toll_hour'], row['toll_10_minute_block']][cell] += row['crz_entries_sum']
+    return windows
+
+
+def iter_windows(start, end=None):
+    """
+    (window start, [[region, vehicle class, entries], ...]) for every 10-minute window
+    with traffic in [start, end), in event-time order. Reads one day at a time.
+    """
+    for day in replay_days(start, end):
+        windows = day_windows(day)
+        for hour, block in sorted(windows):
+            window_start = datetime.combine(day, datetime.min.time()) + timedelta(hours=hour, minutes=block * 10)
+            if window_start < start:
+                continue
+            if end and window_start >= end:
+                return
+            yield window_start, sorted([region, vehicle_class, entries]
+                                       for (region, vehicle_class), entries in windows[hour, block].items())
+
+
+def sse_event(event, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id else []
+    lines += [f'event: {event}', f'data: {json.dumps(data, separators=(",", ":"))}']
+    return '\n'.join(lines) + '\n\n'
+
+
+def replay_events(start, end=None, speed=DEFAULT_SPEED):
+    """
+    SSE text for the replay, paced at `speed` event-time seconds per second. A slow
+    consumer delays the schedule instead of getting a burst of catch-up windows.
+    """
+    interval = WINDOW.total_seconds() / speed
+    yield f'retry: {RETRY_MS}\n\n'
+    yield sse_event('start', {'start': start.isoformat(), 'speed': speed})
+
+    next_at = time.monotonic()
+    for window_start, cells in iter_windows(start, end):
+        delay = next_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        window_id = window_start.isoformat()
+        yield sse_event('window', {'start': window_id, 'total': sum(cell[2] for cell in cells), 'cells': cells},
+                        event_id=window_id)
+        next_at = max(next_at, time.monotonic()) + interval
+
+    yield sse_event('end', {})
+
+
+def replay_request_params(params, last_event_id=None):
+    """
+    (start, end, speed) from request parameters. A Last-Event-ID (an automatic
+    reconnect) resumes at the window after it.
+    """
+    start = parse_time(params.get('start'))
+    if last_event_id:
+        start = parse_time(last_event_id) + WINDOW
+    start = start or first_window()
+    end = parse_time(params.get('end'))
+
+    try:
+        speed = float(params.get('speed', DEFAULT_SPEED))
+    except ValueError:
+        raise ValueError("speed must be a number")
+    if not 0 < speed <= MAX_SPEED:
+        raise ValueError(f"speed must be above 0 and at most {MAX_SPEED:g}")
+    return start, end, speed
@@ -0,0 +1,90 @@
+"""
+Retention for raw VehicleEntry rows.
+
+Days older than the retention age are compacted one at a time: the day's raw rows are
+written to the Parquet archive (see archive), summed into HourlyEntryTotal rows, and
+deleted from VehicleEntry, the last two in one transaction. A run killed between the
+archive write and that commit leaves the rows in both places; the next run archives them
+again, replacing the part file the killed run wrote (see archive.write_day), so they are
+counted once. The hot table then only holds recent days, while aggregate queries read
+the hourly rollups and row-level readers (the base dataset, replay, score backfill and
+the anomaly history) read the archive, so every total stays the same. Data versions are
+not bumped: the history the cached artifacts were built from is unchanged.
+"""
+from datetime import timedelta
+
+import pandas as pd
+from django.db import transaction
+from django.utils import timezone
+
+from . import archive
+from .models import DIMENSION_FIELDS, HourlyEntryTotal, VehicleEntry
+
+KEY_FIELDS = [key_field for key_field, _ in DIMENSION_FIELDS.values()]
+ROLLUP_FIELDS = ['toll_hour', 'day_of_week_int', *KEY_FIELDS]
+RAW_FIELDS = ['id', 'toll_hour', 'toll_10_minute_block', 'minute_of_hour', 'day_of_week_int', 'toll_week',
+              *KEY_FIELDS, 'crz_entries', 'excluded_roadway_entries']
+SUMMED_FIELDS = ['rows', 'crz_entries', 'excluded_roadway_entries']
+
+
+def retention_cutoff(days):
+    """First toll date kept in VehicleEntry when raw rows are kept for `days` days."""
+    return timezone.localdate() - timedelta(days=days)
+
+
+def days_before(cutoff):
+    """Toll dates with raw rows before `cutoff`, oldest first."""
+    return list(VehicleEntry.objects.filter(toll_date__lt=cutoff).dates('toll_date', 'day'))
+
+
+def raw_day_frame(day):
+    """A day's raw rows with dimension keys and names, read in one query."""
+    rows = VehicleEntry.objects.filter(toll_date=day).order_by('id').values_list(*RAW_FIELDS)
+    frame = pd.DataFrame.from_records(list(rows), columns=RAW_FIELDS)
+    for column, (key_field, dimension) in DIMENSION_FIELDS.items():
+        frame[column] = frame[key_field].map(dimension.names(frame[key_field].unique().tolist()))
+    return frame
+
+
+def merge_rollups(day, frame):
+    """The day's HourlyEntryTotal rows with its raw rows added, as unsaved instances."""
+    columns = ROLLUP_FIELDS + SUMMED_FIELDS
+    parts = [frame.assign(rows=1)[columns]]
+    existing = HourlyEntryTotal.objects.filter(toll_date=day).values_list(*columns)
+    if existing:
+        parts.append(pd.DataFrame.from_records(list(existing), columns=columns))
+    merged = pd.concat(parts).groupby(ROLLUP_FIELDS, as_index=False)[SUMMED_FIELDS].sum()
+    attnames = [HourlyEntryTotal._meta.get_field(field).attname for field in columns]
+    return [HourlyEntryTotal(toll_date=day, **dict(zip(attnames, map(int, row))))
+            for row in merged[columns].itertuples(index=False)]
+
+
+def compact_day(day):
+    """Archive, roll up and delete one day's raw rows. Returns the number of rows moved."""
+    frame = raw_day_frame(day)
+    if frame.empty:
+        return 0
+    path = archive.write_day(day, frame)
+    try:
+        with transaction.atomic():
+            rollups = merge_rollups(day, frame)
+            HourlyEntryTotal.objects.filter(toll_date=day).delete()
+            HourlyEntryTotal.objects.bulk_create(rollups)
+            # Only the rows read above: ones imported for this day meanwhile wait for the next run
+            VehicleEntry.objects.filter(toll_date=day, id__gte=frame['id'].min(), id__lte=frame['id'].max()).delete()
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return len(frame)
+
+
+def apply_retention(days, log=print):
+    """Compact every day older than `days` days. Returns (days compacted, rows moved)."""
+    cutoff = retention_cutoff(days)
+    compacted, moved = 0, 0
+    for day in days_before(cutoff):
+        rows = compact_day(day)
+        compacted += 1
+        moved += rows
+        log(f"[Retention] Archived {day}: {rows} raw rows")
+    return compacted, moved
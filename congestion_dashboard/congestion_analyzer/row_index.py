@@ -0,0 +1,80 @@
+"""
+Inverted index from dimension values to the rows that hold them.
+
+A RowIndex is built once over a fixed set of rows (a frame that is no longer appended
+to, or a list of records) and maps every value of each indexed column to the sorted
+positions of its rows, stored as int32 where the row count allows. A filter on one
+column is a dictionary lookup; a multi-column filter intersects the posting arrays,
+smallest first, by binary search into the larger ones. Filtered reads then touch only
+the matching rows instead of scanning a column per filter.
+"""
+import numpy as np
+import pandas as pd
+
+INT32_ROWS = np.iinfo(np.int32).max
+
+
+def _as_values(wanted):
+    if isinstance(wanted, (str, bytes)) or not hasattr(wanted, '__iter__'):
+        return [wanted]
+    return list(wanted)
+
+
+def intersect_sorted(small, large):
+    """Values of sorted `small` that are also in sorted `large`, by binary search into `large`."""
+    if not len(small) or not len(large):
+        return small[:0]
+    positions = np.minimum(np.searchsorted(large, small), len(large) - 1)
+    return small[large[positions] == small]
+
+
+class RowIndex:
+    def __init__(self, rows, postings):
+        self.rows = rows
+        self.postings = postings  # column -> {value: sorted row positions}
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Index of {column name: values}, all of one length. Missing values are not indexed."""
+        rows = len(next(iter(columns.values()))) if columns else 0
+        dtype = np.int32 if rows <= INT32_ROWS else np.int64
+        postings = {}
+        for name, values in columns.items():
+            codes, uniques = pd.factorize(values)
+            present = np.flatnonzero(codes >= 0)
+            # Stable sort by code: each value's rows come out contiguous and in row order
+            order = present[np.argsort(codes[present], kind='stable')].astype(dtype)
+            counts = np.bincount(codes[present], minlength=len(uniques))
+            postings[name] = dict(zip(uniques.tolist(), np.split(order, np.cumsum(counts)[:-1])))
+        return cls(rows, postings)
+
+    @classmethod
+    def from_records(cls, records, columns):
+        return cls.from_columns({column: np.array([record[column] for record in records], dtype=object)
+                                 for column in columns})
+
+    def lookup(self, **filters):
+        """
+        Sorted positions of the rows matching every filter. A filter value may be one value
+        or a collection of values (any of them matches); values not in the index match nothing.
+        """
+        matches = []
+        for column, wanted in filters.items():
+            postings = self.postings[column]
+            arrays = [postings[value] for value in _as_values(wanted) if value in postings]
+            if not arrays:
+                return np.empty(0, dtype=np.intp)
+            # A row holds one value per column, so the arrays are disjoint
+            matches.append(arrays[0] if len(arrays) == 1 else np.sort(np.concatenate(arrays)))
+        if not matches:
+            return np.arange(self.rows)
+        matches.sort(key=len)
+        result = matches[0]
+        for other in matches[1:]:
+            result = intersect_sorted(result, other)
+        return result
+
+    def take(self, frame, **filters):
+        """Rows of `frame` (the frame the index was built from, or a prefix of it) matching the filters."""
+        positions = self.lookup(**filters)
+        return frame.iloc[positions[:np.searchsorted(positions, len(frame))]]
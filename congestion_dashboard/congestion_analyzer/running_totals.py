@@ -0,0 +1,97 @@
+"""
+Running totals behind the dashboard header stats.
+
+total_entries, total_volume and the per-region summary are sums, so instead of
+recomputing them from the base frame they are kept per detection region in RegionTotal.
+bulk_ingest adds each chunk's rows to them inside the transaction that inserts the rows,
+and retention moves rows into hourly rollups that count towards the same totals, so
+neither changes what the stats should be. Those are the only paths that write
+VehicleEntry: the admin shows the rows read-only, and rows written any other way (a
+shell, a script) leave the totals behind until rebuild() is run. Reading the stats is
+one query over a handful of rows, whatever the size of the table. rebuild() and
+verify() recompute the sums from VehicleEntry and the hourly rollups, on demand.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import DetectionRegion, HourlyEntryTotal, RegionTotal, VehicleEntry
+
+
+class RegionDeltas:
+    """Rows and CRZ entries to add per detection region key, accumulated while loading."""
+
+    def __init__(self):
+        self.rows = defaultdict(int)
+        self.crz_entries = defaultdict(int)
+
+    def add(self, region_key, crz_entries, rows=1):
+        self.rows[region_key] += rows
+        self.crz_entries[region_key] += crz_entries
+
+    def __bool__(self):
+        return bool(self.rows)
+
+
+def apply_deltas(deltas):
+    """Add `deltas` to the running totals. Call it in the transaction that writes the rows."""
+    if not deltas:
+        return
+    with transaction.atomic():
+        keys = list(deltas.rows)
+        existing = set(RegionTotal.objects.filter(detection_region_key__in=keys).values_list('pk', flat=True))
+        RegionTotal.objects.bulk_create([RegionTotal(detection_region_key_id=key) for key in keys if key not in existing],
+                                        ignore_conflicts=True)
+        for key in keys:
+            RegionTotal.objects.filter(pk=key).update(rows=F('rows') + deltas.rows[key],
+                                                      crz_entries=F('crz_entries') + deltas.crz_entries[key])
+
+
+def dashboard_stats():
+    """{'total_entries', 'region_data', 'total_volume'} for the whole table, from the running totals."""
+    totals = list(RegionTotal.objects.filter(rows__gt=0).values_list('pk', 'rows', 'crz_entries'))
+    names = DetectionRegion.names([key for key, _, _ in totals])
+    region_data = [{'detection_region': names[key], 'count': crz_entries}
+                   for key, _, crz_entries in sorted(totals, key=lambda total: total[2], reverse=True)]
+    return {
+        'total_entries': sum(rows for _, rows, _ in totals),
+        'region_data': region_data,
+        'total_volume': sum(crz_entries for _, _, crz_entries in totals),
+    }
+
+
+def computed_totals():
+    """{region key: (rows, crz_entries)} summed from VehicleEntry and the hourly rollups of compacted rows."""
+    totals = defaultdict(lambda: (0, 0))
+    raw = (VehicleEntry.objects.values('detection_region_key')
+           .annotate(rows=Count('pk'), crz_entries=Sum('crz_entries')).order_by())
+    compacted = (HourlyEntryTotal.objects.values('detection_region_key')
+                 .annotate(rows=Sum('rows'), crz_entries=Sum('crz_entries')).order_by())
+    for row in [*raw, *compacted]:
+        rows, crz_entries = totals[row['detection_region_key']]
+        totals[row['detection_region_key']] = (rows + row['rows'], crz_entries + row['crz_entries'])
+    return dict(totals)
+
+
+def verify():
+    """[(region, stored (rows, entries), computed (rows, entries))] for every region whose running totals are off."""
+    stored = {key: (rows, crz_entries) for key, rows, crz_entries
+              in RegionTotal.objects.values_list('pk', 'rows', 'crz_entries')}
+    computed = computed_totals()
+    mismatches = []
+    for key in sorted(stored.keys() | computed.keys()):
+        if stored.get(key, (0, 0)) != computed.get(key, (0, 0)):
+            mismatches.append((DetectionRegion.name_of(key), stored.get(key, (0, 0)), computed.get(key, (0, 0))))
+    return mismatches
+
+
+def rebuild():
+    """Replace the running totals with sums recomputed by computed_totals(). Returns the number of regions."""
+    with transaction.atomic():
+        computed = computed_totals()
+        RegionTotal.objects.all().delete()
+        RegionTotal.objects.bulk_create([RegionTotal(detection_region_key_id=key, rows=rows, crz_entries=crz_entries)
+                                         for key, (rows, crz_entries) in computed.items()])
+    print(f"[Running Totals] Rebuilt totals of {len(computed)} regions")
+    return len(computed)
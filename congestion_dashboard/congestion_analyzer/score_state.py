@@ -0,0 +1,171 @@
+"""
+Pluggable storage for congestion score state.
+
+A single refresher computes scores and publishes a versioned snapshot; every
+worker reads the latest snapshot instead of keeping its own CongestionScore.
+Publishing holds the backend's write lock while it rereads the latest state and
+folds the new data onto it, so two refreshers racing can't overwrite each other.
+Select a backend with settings.CONGESTION_SCORE_BACKEND (dotted path).
+"""
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+DEFAULT_SCORE_BACKEND = 'congestion_analyzer.score_state.DatabaseScoreStateBackend'
+
+# Cache keys used by CacheScoreStateBackend
+SCORE_SNAPSHOT_CACHE_KEY = 'congestion_score_snapshot_v1'
+SCORE_LOCK_CACHE_KEY = 'congestion_score_lock_v1'
+
+# advance(latest state) -> (scores, new state); see ScoreStateBackend.publish
+Advance = Callable[[Dict[str, Any]], Tuple[Dict[str, float], Dict[str, Any]]]
+
+
+@dataclass
+class PublishedScores:
+    """An immutable view of the scorer at one point in time."""
+    version: int = 0
+    scores: Dict[str, float] = field(default_factory=dict)
+    state: Dict[str, Any] = field(default_factory=dict)  # Output of CongestionScore.to_state()
+    updated_at: Optional[str] = None  # ISO timestamp of the publish
+
+    def to_dict(self):
+        return {'version': self.version, 'scores': self.scores, 'state': self.state, 'updated_at': self.updated_at}
+
+
+class ScoreStateBackend:
+    """
+    Base class: load() returns the latest snapshot. publish(advance) takes the write lock,
+    calls advance() on the latest state ({} before the first publish) and stores what it
+    returns as the next version, all before releasing the lock.
+    """
+
+    def load(self) -> Optional[PublishedScores]:
+        raise NotImplementedError
+
+    def publish(self, advance: Advance) -> PublishedScores:
+        raise NotImplementedError
+
+
+class LocalMemoryScoreStateBackend(ScoreStateBackend):
+    """Process-local state. Only correct with a single worker; mostly useful for development."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot: Optional[PublishedScores] = None
+
+    def load(self):
+        return self._snapshot
+
+    def publish(self, advance):
+        with self._lock:
+            latest = self._snapshot or PublishedScores()
+            scores, state = advance(latest.state)
+            self._snapshot = PublishedScores(latest.version + 1, dict(scores), state, timezone.now().isoformat())
+            return self._snapshot
+
+
+class CacheScoreStateBackend(ScoreStateBackend):
+    """
+    Stores the whole snapshot under one cache key, so readers never see a partial batch.
+    Shared across workers only when the configured cache is (e.g. Redis, file or database cache).
+    Publishers take turns through a lock key claimed with cache.add, which is atomic there.
+    """
+    lock_seconds = 60  # A crashed publisher's lock expires after this
+    lock_wait = 30  # Seconds publish() waits for the lock before raising TimeoutError
+
+    def load(self):
+        data = cache.get(SCORE_SNAPSHOT_CACHE_KEY)
+        return PublishedScores(**data) if data else None
+
+    def publish(self, advance):
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_wait
+        while not cache.add(SCORE_LOCK_CACHE_KEY, token, self.lock_seconds):
+            if time.monotonic() > deadline:
+                raise TimeoutError("Timed out waiting for the score publish lock")
+            time.sleep(0.05)
+        try:
+            latest = self.load() or PublishedScores()
+            scores, state = advance(latest.state)
+            snapshot = PublishedScores(latest.version + 1, dict(scores), state, timezone.now().isoformat())
+            cache.set(SCORE_SNAPSHOT_CACHE_KEY, snapshot.to_dict(), None)
+        finally:
+            if cache.get(SCORE_LOCK_CACHE_KEY) == token:  # Not one a later publisher took over after expiry
+                cache.delete(SCORE_LOCK_CACHE_KEY)
+        return snapshot
+
+
+class DatabaseScoreStateBackend(ScoreStateBackend):
+    """
+    Appends one ScoreSnapshot row per publish and keeps the most recent few.
+    Works across processes with the default SQLite database. The publish transaction
+    holds the write lock from its first read: SQLite opens it with BEGIN IMMEDIATE
+    (transaction_mode in settings.DATABASES), other databases lock the latest row.
+    """
+    keep_versions = 20
+
+    def load(self):
+        from .models import ScoreSnapshot
+        row = ScoreSnapshot.objects.order_by('-version').first()
+        if row is None:
+            return None
+        return PublishedScores(row.version, row.scores, row.state, row.created_at.isoformat())
+
+    def publish(self, advance):
+        from .models import ScoreSnapshot
+        with transaction.atomic():
+            latest = ScoreSnapshot.objects.select_for_update().order_by('-version').first()
+            scores, state = advance(latest.state if latest else {})
+            row = ScoreSnapshot.objects.create(version=latest.version + 1 if latest else 1,
+                                               scores=dict(scores), state=state)
+            ScoreSnapshot.objects.filter(version__lte=row.version - self.keep_versions).delete()
+        return PublishedScores(row.version, row.scores, row.state, row.created_at.isoformat())
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_read_memo = {'snapshot': None, 'fetched_at': 0.0}
+
+
+def get_score_backend() -> ScoreStateBackend:
+    """Return the configured backend (instantiated once per process)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_path = getattr(settings, 'CONGESTION_SCORE_BACKEND', DEFAULT_SCORE_BACKEND)
+                _backend = import_string(backend_path)()
+    return _backend
+
+
+def get_score_snapshot(max_age: Optional[float] = None) -> PublishedScores:
+    """
+    Cheap read path for views. The latest snapshot is memoised per process for
+    CONGESTION_SCORE_READ_TTL seconds so request bursts hit the backend once.
+    """
+    if max_age is None:
+        max_age = getattr(settings, 'CONGESTION_SCORE_READ_TTL', 1.0)
+    now = time.monotonic()
+    snapshot = _read_memo['snapshot']
+    if snapshot is not None and now - _read_memo['fetched_at'] < max_age:
+        return snapshot
+
+    snapshot = get_score_backend().load() or PublishedScores()
+    _read_memo['snapshot'] = snapshot
+    _read_memo['fetched_at'] = now
+    return snapshot
+
+
+def remember_snapshot(snapshot: PublishedScores):
+    """Let the publishing process serve its own snapshot without a round trip."""
+    _read_memo['snapshot'] = snapshot
+    _read_memo['fetched_at'] = time.monotonic()
@@ -1,21 +1,32 @@
 import json
 import asyncio
 import time
-from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
-from .congestion_scoring import congestion_score_instance, update_scores, TollData
+from datetime import datetime, timedelta
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import condition
+from .congestion_scoring import claim_inline_refresh, refresh_interval, update_scores
+from .score_state import get_score_snapshot
+from .models import HistoricalScore
+from .heatmap import get_heatmap_interpolator, get_heatmap_raster, raster_cell_sizes
 import random
 
+def _refresh_scores():
+    """Run one refresh cycle on a private event loop and return the published scores."""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(update_scores())
+    finally:
+        loop.close()
+
 def get_scores(request):
     """
     Django view for getting the current congestion scores
     """
-    # Use asyncio to run the async function
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    scores = loop.run_until_complete(update_scores())
-    loop.close()
-    
-    return JsonResponse(scores)
+    # The refresher (refresh_scores, or in 'inline' mode one elected request) owns the upstream work
+    if claim_inline_refresh():
+        _refresh_scores()
+    return JsonResponse(get_score_snapshot().scores)
 
 def stream_scores(request):
     """
@@ -23,21 +34,17 @@ def stream_scores(request):
     """
     def event_stream():
         while True:
-            # Use a new event loop for each iteration
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
             try:
-                scores = loop.run_until_complete(update_scores())
+                if claim_inline_refresh():
+                    _refresh_scores()
+                scores = get_score_snapshot().scores
                 # Format as SSE
                 yield f"data: {json.dumps(scores)}\n\n"
             except Exception as e:
                 yield f"data: {{\"error\": \"{str(e)}\"}}\n\n"
-            finally:
-                loop.close()
             
             # Sleep between updates
-            time.sleep(30)
+            time.sleep(refresh_interval())
     
     response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
     response['Cache-Control'] = 'no-cache'
@@ -48,60 +55,58 @@ def get_heatmap_points(request):
     """
     Return current congestion scores formatted for the heatmap
     """
-    # Get cached scores instead of recomputing
-    scores = congestion_score_instance.scores
+    # Read the shared snapshot instead of recomputing
+    snapshot = get_score_snapshot()
 
-    # Get vertices from the map_views module
-    from .map_views import get_random_points
+    # One matrix-vector product per score version; the JSON is reused until the version changes
+    content = get_heatmap_interpolator().payload(snapshot.version, snapshot.scores)
+    return HttpResponse(content, content_type='application/json')
 
-    # Use the same congestion zone polygon from map_views
-    vertices = [
-        (40.75888, -73.95778),
-        (40.77349, -73.99493),
-        (40.76962, -73.99524),
-        (40.76312, -74.00047),
-        (40.75519, -74.00734),
-        (40.75018, -74.00931),
-        (40.74765, -74.00854),
-        (40.74134, -74.00949),
-        (40.73926, -74.01069),
-        (40.7229, -74.01202),
-        (40.70459, -74.01747),
-        (40.70107, -74.01644),
-        (40.70029, -74.01146),
-        (40.70704, -73.99896),
-        (40.71064, -73.97876),
-        (40.72898, -73.97052),
-        (40.73613, -73.97367),
-        (40.74386, -73.97079)
-    ]
-    
-    # Get fixed points (only generate them once)
-    if not hasattr(get_heatmap_points, "points_cache"):
-        get_heatmap_points.points_cache = get_random_points(vertices, num_points=50)  # Increased from 15 to 50
+def _heatmap_raster_etag(request, level):
+    if not 0 <= level < len(raster_cell_sizes()):
+        return None
+    # Keep the snapshot the tag was computed from so the body always matches it
+    request.score_snapshot = get_score_snapshot()
+    return f"heatmap-v{request.score_snapshot.version}-{raster_cell_sizes()[level]}m"
 
-    # Update the fixed points with real congestion scores
-    for point in get_heatmap_points.points_cache:
-        # Store previous score
-        point['previous_score'] = point.get('score', 0)
-        
-        # Calculate score based on distance-weighted average of real entry point scores
-        total_weight = 0
-        weighted_score = 0
-        
-        for entry_name, distance in point['distances'].items():
-            # Closer entry points have higher weights (inverse distance)
-            weight = 1.0 / (1.0 + distance)
-            total_weight += weight
-            
-            # Get score for this entry point if available
-            entry_score = scores.get(entry_name, 50)  # Default to 50 if no data
-            weighted_score += entry_score * weight
-        
-        # Calculate final weighted score
-        if total_weight > 0:
-            point['score'] = min(100, max(1, weighted_score / total_weight))
-        else:
-            point['score'] = 50  # Fallback
-    
-    return JsonResponse(get_heatmap_points.points_cache, safe=False)
\ No newline at end of file
+@condition(etag_func=_heatmap_raster_etag)
+def get_heatmap_raster_png(request, level):
+    """
+    Current scores rasterised over the CRZ as a palette PNG; level indexes
+    HEATMAP_RASTER_CELL_METERS (0 is coarsest). Unchanged versions get a 304.
+    """
+    if not 0 <= level < len(raster_cell_sizes()):
+        raise Http404("Unknown heatmap raster level")
+
+    snapshot = request.score_snapshot
+    response = HttpResponse(get_heatmap_raster(level).png(snapshot.version, snapshot.scores), content_type='image/png')
+    response['Cache-Control'] = 'no-cache'  # Always revalidate; the ETag makes that a 304
+    return response
+
+def get_historical_heatmap(request):
+    """
+    Return the heatmap as it was at ?at=YYYY-MM-DDTHH:MM (event time), read from the
+    backfilled HistoricalScore table: the latest 10-minute bucket at or before `at`.
+    """
+    try:
+        at = datetime.fromisoformat(request.GET.get('at', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Expected ?at=YYYY-MM-DDTHH:MM'}, status=400)
+
+    # Two index range scans on (toll_date, bucket) instead of one OR that defeats the index
+    bucket_index = at.hour * 6 + at.minute // 10
+    key = (HistoricalScore.objects.filter(toll_date=at.date(), bucket__lte=bucket_index)
+           .order_by('-bucket').values('toll_date', 'bucket').first())
+    if key is None:
+        key = (HistoricalScore.objects.filter(toll_date__lt=at.date())
+               .order_by('-toll_date', '-bucket').values('toll_date', 'bucket').first())
+    if key is None:
+        return JsonResponse({'at': at.isoformat(), 'bucket_start': None, 'points': []})
+
+    scores = dict(HistoricalScore.objects.filter(**key).values_list('detection_group', 'score'))
+    bucket_start = datetime.combine(key['toll_date'], datetime.min.time()) + timedelta(minutes=10 * key['bucket'])
+    interpolator = get_heatmap_interpolator()
+    points_json = interpolator.points_frame(interpolator.interpolate(scores)).to_json(orient='records')
+    content = (f'{{"at": {json.dumps(at.isoformat())}, "bucket_start": {json.dumps(bucket_start.isoformat())}, '
+               f'"points": {points_json}}}')
+    return HttpResponse(content, content_type='application/json')
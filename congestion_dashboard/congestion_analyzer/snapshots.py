@@ -0,0 +1,201 @@
+"""
+Memory-mapped Arrow snapshots of the base dataset and its rollups.
+
+write_snapshot() materializes every month partition of the base rows, and each month's
+dashboard rollup, as Arrow IPC files in a fresh directory under SNAPSHOTS_DIR, then
+points CURRENT at it with an atomic rename. Workers open the files with
+pyarrow.memory_map and hand pandas zero-copy views of the mapped pages, so the OS page
+cache holds one copy of the data however many processes read it. Name columns are
+stored as large_string and read back as pandas' Arrow-backed string dtype (the `str`
+columns the database path builds), which wraps the mapped buffers instead of making a
+Python object per value. A snapshot records the
+data version of every month it holds; a month whose version has moved on since is read
+from the cache or the database instead, so a snapshot is never served stale.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from django.conf import settings
+
+from .data_versions import data_months, partition_versions, versions_tag
+
+POINTER_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+BASE_TABLE = 'vehicle_data'
+HOURLY_TABLE = 'dashboard_hourly'
+
+try:
+    STRING_DTYPE = pd.StringDtype('pyarrow', na_value=np.nan)  # pandas' default `str` dtype from 3.0
+except TypeError:  # pandas < 2.3
+    STRING_DTYPE = pd.StringDtype('pyarrow')
+
+_lock = threading.Lock()
+_opened = {'id': None, 'manifest': None, 'tables': {}}  # This process's view of CURRENT
+
+
+def snapshots_enabled():
+    return getattr(settings, 'SNAPSHOTS_ENABLED', False)
+
+
+def snapshots_dir():
+    return Path(getattr(settings, 'SNAPSHOTS_DIR', Path(settings.BASE_DIR) / 'snapshots'))
+
+
+def current_snapshot():
+    """(id, manifest) of the snapshot CURRENT points at, or (None, None) when there is none."""
+    directory = snapshots_dir()
+    try:
+        snapshot_id = (directory / POINTER_FILE).read_text().strip()
+        with _lock:
+            if _opened['id'] != snapshot_id:
+                manifest = json.loads((directory / snapshot_id / MANIFEST_FILE).read_text())
+                # Tables of the old snapshot stay mapped until their last frame is gone
+                _opened.update(id=snapshot_id, manifest=manifest, tables={})
+            return snapshot_id, _opened['manifest']
+    except FileNotFoundError:
+        return None, None
+
+
+def _month_entry(month, version):
+    if not snapshots_enabled():
+        return None, None
+    snapshot_id, manifest = current_snapshot()
+    entry = manifest['months'].get(month) if manifest else None
+    if entry is None or entry['version'] != version:
+        return None, None
+    return snapshot_id, entry
+
+
+def _mapped_table(snapshot_id, filename):
+    key = (snapshot_id, filename)
+    with _lock:
+        table = _opened['tables'].get(key)
+        if table is None:
+            source = pa.memory_map(str(snapshots_dir() / snapshot_id / filename))
+            table = pa.ipc.open_file(source).read_all()
+            if _opened['id'] == snapshot_id:
+                _opened['tables'][key] = table
+    return table
+
+
+def read_month_frame(table_name, month, version):
+    """
+    The snapshot's `table_name` frame for one month, as pandas views of the mapped file,
+    or None when snapshots are off, there is none, or it holds another version of the month.
+    The frame's buffers are read-only; pandas copies a column before anything writes to it.
+    """
+    snapshot_id, entry = _month_entry(month, version)
+    if entry is None or table_name not in entry['files']:
+        return None
+    try:
+        table = _mapped_table(snapshot_id, entry['files'][table_name])
+    except FileNotFoundError:  # Pruned between reading CURRENT and opening the file
+        return None
+    return table.to_pandas(split_blocks=True, types_mapper={pa.large_string(): STRING_DTYPE}.get)
+
+
+def read_month_rollup(month, version):
+    """A month's dashboard part (see cache_utils.get_month_dashboard_part) from the snapshot, or None."""
+    snapshot_id, entry = _month_entry(month, version)
+    if entry is None:
+        return None
+    hourly = read_month_frame(HOURLY_TABLE, month, version)
+    if hourly is None:
+        return None
+    return {'hourly': hourly}
+
+
+def _write_table(df, path):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Arrow-backed pandas strings hold large_string, so reads wrap the column without a cast
+    schema = pa.schema([field.with_type(pa.large_string()) if pa.types.is_string(field.type) else field
+                        for field in table.schema], metadata=table.schema.metadata)
+    table = table.cast(schema)
+    with pa.OSFile(str(path), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def _link_or_copy(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def write_snapshot():
+    """
+    Write a snapshot of every month with data and make it current. Months whose version
+    matches the current snapshot reuse its files (hard-linked), so after an import only
+    the touched months are rewritten. Returns the new snapshot's id.
+    """
+    # Imported here: cache_utils reads snapshots through this module
+    from .cache_utils import get_month_dashboard_part, get_vehicle_partition
+
+    directory = snapshots_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    versions = partition_versions()
+    previous_id, previous = current_snapshot()
+    previous_months = previous['months'] if previous else {}
+
+    snapshot_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{versions_tag(versions)}"
+    staging = directory / f'.{snapshot_id}.tmp'
+    staging.mkdir()
+    manifest = {'id': snapshot_id, 'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'months': {}}
+    written, reused = 0, 0
+
+    try:
+        for month in data_months():
+            version = versions.get(month, 0)
+            entry = previous_months.get(month)
+            if entry is not None and entry['version'] == version:
+                for filename in entry['files'].values():
+                    _link_or_copy(directory / previous_id / filename, staging / filename)
+                manifest['months'][month] = entry
+                reused += 1
+                continue
+
+            part = get_month_dashboard_part(month, versions)
+            base = get_vehicle_partition(month, versions)
+            files = {BASE_TABLE: f'{BASE_TABLE}_{month}.arrow', HOURLY_TABLE: f'{HOURLY_TABLE}_{month}.arrow'}
+            _write_table(base, staging / files[BASE_TABLE])
+            _write_table(part['hourly'], staging / files[HOURLY_TABLE])
+            manifest['months'][month] = {
+                'version': version,
+                'rows': len(base),
+                'files': files,
+            }
+            written += 1
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    (staging / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+    staging.rename(directory / snapshot_id)
+    # Readers see either the old snapshot or the new one, never a half-written one
+    pointer = directory / f'.{POINTER_FILE}.{os.getpid()}.tmp'
+    pointer.write_text(snapshot_id)
+    os.replace(pointer, directory / POINTER_FILE)
+
+    _prune(directory, snapshot_id, getattr(settings, 'SNAPSHOTS_KEEP', 2))
+    print(f"[Snapshots] Wrote {snapshot_id}: {written} months written, {reused} reused")
+    return snapshot_id
+
+
+def _prune(directory, current_id, keep):
+    """
+    Delete all but the `keep` newest snapshots (the current one always stays). Workers still
+    reading a deleted snapshot keep their mapping: the pages live until they unmap them.
+    """
+    snapshot_dirs = sorted((path for path in directory.iterdir()
+                            if path.is_dir() and not path.name.startswith('.') and path.name != current_id),
+                           key=lambda path: path.name, reverse=True)
+    for path in snapshot_dirs[max(0, keep - 1):]:
+        shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,132 @@
+"""
+Seeded generator of realistic MTA CRZ entry data.
+
+Rows follow the upstream layout (one row per day, 10-minute block, detection group and
+vehicle class) with volumes shaped by hour, weekday, entry point and vehicle class.
+The same seed and row count always produce the same data. Used by the benchmark command.
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# Upstream detection groups with their region and relative volume
+DETECTION_GROUPS = [
+    ('Brooklyn Bridge', 'Brooklyn', 1.0),
+    ('Manhattan Bridge', 'Brooklyn', 0.8),
+    ('Williamsburg Bridge', 'Brooklyn', 0.9),
+    ('Hugh L. Carey Tunnel', 'Brooklyn', 0.7),
+    ('Queensboro Bridge', 'Queens', 1.1),
+    ('Queens Midtown Tunnel', 'Queens', 0.8),
+    ('Lincoln Tunnel', 'New Jersey', 1.2),
+    ('Holland Tunnel', 'New Jersey', 0.9),
+    ('West Side Highway at 60th St', 'West Side Highway', 0.9),
+    ('West 60th St', 'West 60th St', 0.5),
+    ('FDR Drive at 60th St', 'FDR Drive', 1.0),
+    ('East 60th St', 'East 60th St', 0.4),
+]
+
+# Vehicle classes with their share of traffic
+VEHICLE_CLASSES = [
+    ('1 - Cars, Pickups and Vans', 0.62),
+    ('TLC Taxi/FHV', 0.25),
+    ('2 - Single-Unit Trucks', 0.06),
+    ('3 - Multi-Unit Trucks', 0.02),
+    ('4 - Buses', 0.03),
+    ('5 - Motorcycles', 0.02),
+]
+
+# Relative volume by hour of day: quiet overnight, morning and evening peaks
+HOURLY_PROFILE = np.array([
+    0.25, 0.18, 0.14, 0.13, 0.18, 0.35, 0.65, 0.95, 1.10, 1.05, 0.95, 0.95,
+    0.95, 0.95, 1.00, 1.05, 1.10, 1.10, 1.00, 0.85, 0.70, 0.60, 0.50, 0.35,
+])
+
+BASE_ENTRIES_PER_BLOCK = 60  # Busiest group, all classes, at an hourly profile of 1.0
+DAY_NAMES = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+DEFAULT_START_DATE = date(2025, 1, 5)
+
+ROWS_PER_DAY = 144 * len(DETECTION_GROUPS) * len(VEHICLE_CLASSES)
+
+
+def generate_frame(rows, seed=2025, start_date=DEFAULT_START_DATE, offset=0):
+    """
+    Rows [offset, offset + rows) of the synthetic stream as a DataFrame with
+    VehicleEntry field names. Chunks generated with the same seed line up exactly.
+    """
+    index = np.arange(offset, offset + rows, dtype=np.int64)
+    rng = np.random.default_rng([seed, offset])
+
+    class_index = index % len(VEHICLE_CLASSES)
+    group_index = (index // len(VEHICLE_CLASSES)) % len(DETECTION_GROUPS)
+    block_of_day = (index // (len(VEHICLE_CLASSES) * len(DETECTION_GROUPS))) % 144
+    day = index // ROWS_PER_DAY
+
+    dates = pd.to_datetime(start_date) + pd.to_timedelta(day, unit='D')
+    day_of_week = dates.dayofweek.to_numpy()  # Monday=0
+    day_of_week_int = (day_of_week + 1) % 7 + 1  # Upstream: Sunday=1 ... Saturday=7
+    weekend = day_of_week >= 5
+    hour = block_of_day // 6
+
+    group_weight = np.array([weight for _, _, weight in DETECTION_GROUPS])[group_index]
+    class_share = np.array([share for _, share in VEHICLE_CLASSES])[class_index]
+    expected = BASE_ENTRIES_PER_BLOCK * group_weight * class_share * HOURLY_PROFILE[hour] * np.where(weekend, 0.8, 1.0)
+    peak = np.where(weekend, (hour >= 9) & (hour < 21), (hour >= 5) & (hour < 21))
+
+    group_names = np.array([name for name, _, _ in DETECTION_GROUPS], dtype=object)
+    region_names = np.array([region for _, region, _ in DETECTION_GROUPS], dtype=object)
+    class_names = np.array([name for name, _ in VEHICLE_CLASSES], dtype=object)
+    crz_entries = rng.poisson(expected)
+
+    return pd.DataFrame({
+        'toll_date': dates.date,
+        'toll_hour': hour,
+        'toll_10_minute_block': block_of_day % 6,
+        'minute_of_hour': (block_of_day % 6) * 10,
+        'hour_of_day': hour,
+        'day_of_week_int': day_of_week_int,
+        'day_of_week': np.array(DAY_NAMES, dtype=object)[day_of_week_int - 1],
+        'toll_week': dates.isocalendar().week.to_numpy(),
+        'time_period': np.where(peak, 'Peak', 'Overnight'),
+        'vehicle_class': class_names[class_index],
+        'detection_group': group_names[group_index],
+        'detection_region': region_names[group_index],
+        'crz_entries': crz_entries,
+        'excluded_roadway_entries': rng.binomial(crz_entries, 0.03),
+    })
+
+
+def iter_frames(rows, seed=2025, chunk_rows=500_000, start_date=DEFAULT_START_DATE):
+    """The first `rows` rows of the stream in chunks of at most chunk_rows."""
+    for offset in range(0, rows, chunk_rows):
+        yield generate_frame(min(chunk_rows, rows - offset), seed, start_date, offset)
+
+
+def to_upstream_csv_frame(frame):
+    """The same rows with the column names and date formats of the MTA CSV export."""
+    dates = pd.to_datetime(frame['toll_date'])
+    block_start = dates + pd.to_timedelta(frame['toll_hour'], unit='h') + pd.to_timedelta(frame['minute_of_hour'], unit='m')
+    week_start = dates - pd.to_timedelta((frame['day_of_week_int'] - 1), unit='D')  # Weeks start on Sunday
+    return pd.DataFrame({
+        'Toll Date': dates.dt.strftime('%m/%d/%Y'),
+        'Toll Hour': (dates + pd.to_timedelta(frame['toll_hour'], unit='h')).dt.strftime('%m/%d/%Y %I:%M:%S %p'),
+        'Toll 10 Minute Block': block_start.dt.strftime('%m/%d/%Y %I:%M:%S %p'),
+        'Minute of Hour': frame['minute_of_hour'],
+        'Hour of Day': frame['hour_of_day'],
+        'Day of Week Int': frame['day_of_week_int'],
+        'Day of Week': frame['day_of_week'],
+        'Toll Week': week_start.dt.strftime('%m/%d/%Y'),
+        'Time Period': frame['time_period'],
+        'Vehicle Class': frame['vehicle_class'],
+        'Detection Group': frame['detection_group'],
+        'Detection Region': frame['detection_region'],
+        'CRZ Entries': frame['crz_entries'],
+        'Excluded Roadway Entries': frame['excluded_roadway_entries'],
+    })
+
+
+def write_upstream_csv(path, rows, seed=2025, chunk_rows=500_000):
+    """Write `rows` synthetic rows as an MTA-format CSV that import_data can read."""
+    for i, frame in enumerate(iter_frames(rows, seed, chunk_rows)):
+        to_upstream_csv_frame(frame).to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    return path
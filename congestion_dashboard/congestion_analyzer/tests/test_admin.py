@@ -0,0 +1,38 @@
+import io
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+
+from .. import running_totals
+from ..models import VehicleEntry
+from .utils import DataTestCase, write_csv
+
+
+class VehicleEntryAdminTests(DataTestCase):
+    def setUp(self):
+        super().setUp()
+        call_command('import_data', str(write_csv(self.directory, 1, date(2025, 1, 31))), stdout=io.StringIO())
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        self.entry = VehicleEntry.objects.order_by('pk').first()
+
+    def test_entries_can_be_viewed(self):
+        self.assertEqual(self.client.get(reverse('admin:congestion_analyzer_vehicleentry_changelist')).status_code, 200)
+        change_url = reverse('admin:congestion_analyzer_vehicleentry_change', args=[self.entry.pk])
+        self.assertEqual(self.client.get(change_url).status_code, 200)
+
+    def test_entries_cannot_be_written_past_the_running_totals(self):
+        before = VehicleEntry.objects.count()
+        responses = [
+            self.client.post(reverse('admin:congestion_analyzer_vehicleentry_add'), {}),
+            self.client.post(reverse('admin:congestion_analyzer_vehicleentry_change', args=[self.entry.pk]),
+                             {'crz_entries': self.entry.crz_entries + 100}),
+            self.client.post(reverse('admin:congestion_analyzer_vehicleentry_delete', args=[self.entry.pk]),
+                             {'post': 'yes'}),
+        ]
+        self.assertEqual([response.status_code for response in responses], [403, 403, 403])
+        self.assertEqual(VehicleEntry.objects.count(), before)
+        self.assertEqual(VehicleEntry.objects.get(pk=self.entry.pk).crz_entries, self.entry.crz_entries)
+        self.assertEqual(running_totals.verify(), [])
@@ -0,0 +1,35 @@
+from datetime import date
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from ..synthetic_data import ROWS_PER_DAY, generate_frame
+from ..view_helpers.aggregator import GRANULARITIES, OPTIONAL_COLUMNS, perform_aggregations
+
+
+class PerformAggregationsTests(SimpleTestCase):
+    def frame(self):
+        df = generate_frame(3 * ROWS_PER_DAY, start_date=date(2025, 1, 30))
+        df['toll_date'] = pd.to_datetime(df['toll_date']).dt.tz_localize('UTC')
+        df['month_year'] = df['toll_date'].dt.strftime('%Y-%m')
+        df.loc[::97, 'time_period'] = None  # groupby drops rows with a missing key
+        return df
+
+    def test_matches_groupby_per_granularity(self):
+        df = self.frame()
+        aggregations = perform_aggregations(df.copy())
+        for name, columns in GRANULARITIES.items():
+            expected = df.groupby(columns + OPTIONAL_COLUMNS.get(name, []), observed=False)['crz_entries'].sum()
+            with self.subTest(name):
+                pd.testing.assert_frame_equal(aggregations[name], expected.reset_index())
+
+    def test_hourly_carries_optional_columns_without_adding_rows(self):
+        df = self.frame()
+        hourly = perform_aggregations(df.copy())['hourly']
+        without = perform_aggregations(df.drop(columns=OPTIONAL_COLUMNS['hourly']))['hourly']
+        self.assertEqual(len(hourly), len(without))
+        self.assertFalse(hourly[OPTIONAL_COLUMNS['hourly']].isna().any().any())
+
+    def test_empty_frame(self):
+        aggregations = perform_aggregations(pd.DataFrame(columns=['crz_entries']))
+        self.assertTrue(all(frame.empty for frame in aggregations.values()))
@@ -0,0 +1,44 @@
+import io
+from datetime import date
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from ..models import HistoricalScore, VehicleEntry
+from .utils import DataTestCase, write_csv
+
+
+class BackfillScoresTests(DataTestCase):
+    def setUp(self):
+        super().setUp()
+        call_command('import_data', str(write_csv(self.directory, 2, date(2025, 5, 5))), stdout=io.StringIO())
+
+    def backfill(self, **options):
+        call_command('backfill_scores', stdout=io.StringIO(), **options)
+        return set(HistoricalScore.objects.values_list('toll_date', 'bucket', 'detection_group', 'score'))
+
+    def test_every_bucket_scores_every_group_seen_so_far(self):
+        rows = self.backfill()
+        groups = set(VehicleEntry.objects.with_names().values_list('detection_group', flat=True))
+        buckets = {(toll_date, bucket) for toll_date, bucket, _, _ in rows}
+        self.assertEqual(len(buckets), 2 * 144)
+        self.assertEqual(len(rows), len(buckets) * len(groups))
+        self.assertTrue(all(1 <= score <= 100 for _, _, _, score in rows))
+
+    def test_result_does_not_depend_on_batching(self):
+        rows = self.backfill()
+        self.assertEqual(self.backfill(clear=True, batch_size=500), rows)
+        # A later start rescores only its own days, from a fresh scorer
+        first_day = {row for row in rows if row[0] == date(2025, 5, 5)}
+        self.assertEqual({row for row in self.backfill(start='2025-05-06', clear=True) if row[0] == date(2025, 5, 5)},
+                         first_day)
+
+    def test_historical_heatmap_reads_the_bucket_at_or_before(self):
+        self.backfill()
+        url = reverse('congestion_analyzer:historical_heatmap')
+        response = self.client.get(url, {'at': '2025-05-06T08:17'}).json()
+        self.assertEqual(response['bucket_start'], '2025-05-06T08:10:00')
+        self.assertTrue(response['points'])
+        before = self.client.get(url, {'at': '2025-05-01T00:00'}).json()
+        self.assertEqual((before['bucket_start'], before['points']), (None, []))
+        self.assertEqual(self.client.get(url, {'at': 'yesterday'}).status_code, 400)
@@ -0,0 +1,49 @@
+"""
+The benchmark suite as pytest-django tests: one per entry of benchmarks.BENCHMARKS, in
+registration order, sharing one database of seeded synthetic rows. Skipped unless
+--benchmark-rows is given:
+
+    pytest congestion_analyzer/tests/test_benchmarks.py --benchmark-rows 1m --benchmark-save-baseline
+    pytest congestion_analyzer/tests/test_benchmarks.py --benchmark-rows 1m
+
+A benchmark fails when it is slower than the baseline by more than the threshold.
+"""
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from ..benchmarks import BENCHMARKS, compare_to_baseline, parse_rows, run_benchmarks
+from ..synthetic_data import ROWS_PER_DAY, generate_frame
+
+
+@pytest.mark.parametrize('bench', BENCHMARKS, ids=[bench.name for bench in BENCHMARKS])
+def test_benchmark(bench, benchmark_run):
+    results = run_benchmarks(benchmark_run.ctx, [bench.name], benchmark_run.repeat)
+    benchmark_run.results.update(results)
+    if benchmark_run.baseline is None:
+        return
+    for name, base, seconds, ratio, regressed in compare_to_baseline(results, benchmark_run.baseline,
+                                                                     benchmark_run.threshold):
+        assert not regressed, f"{name} regressed beyond {benchmark_run.threshold:.0%}: {base:.3f}s -> {seconds:.3f}s ({ratio:.2f}x)"
+
+
+def test_parse_rows():
+    assert parse_rows('1M') == 1_000_000
+    assert parse_rows('2500') == 2500
+    with pytest.raises(ValueError):
+        parse_rows('lots')
+
+
+def test_compare_to_baseline_ignores_noise_and_missing_benchmarks():
+    baseline = {'results': {'fast': 0.001, 'slow': 1.0, 'dropped': 1.0}}
+    rows = compare_to_baseline({'fast': 0.005, 'slow': 1.5, 'new': 1.0}, baseline, threshold=0.2)
+    assert [(name, regressed) for name, _, _, _, regressed in rows] == [('fast', False), ('slow', True)]
+
+
+def test_synthetic_chunks_line_up():
+    whole = generate_frame(2 * ROWS_PER_DAY, start_date=date(2025, 1, 1))
+    chunk = generate_frame(ROWS_PER_DAY, start_date=date(2025, 1, 1), offset=ROWS_PER_DAY)
+    keys = ['toll_date', 'toll_hour', 'minute_of_hour', 'vehicle_class', 'detection_group']
+    pd.testing.assert_frame_equal(whole[keys].iloc[ROWS_PER_DAY:].reset_index(drop=True), chunk[keys])
+    pd.testing.assert_frame_equal(chunk, generate_frame(ROWS_PER_DAY, start_date=date(2025, 1, 1), offset=ROWS_PER_DAY))
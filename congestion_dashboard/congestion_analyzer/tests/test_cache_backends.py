@@ -0,0 +1,48 @@
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from ..cache_backends import TieredCache
+
+
+class TieredCacheSizeTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'cache.sqlite3'
+
+    def cache(self, **options):
+        return TieredCache(self.path, {'OPTIONS': {'COMPRESS_MIN_BYTES': 1 << 30, **options}})
+
+    def assert_totals_match(self, cache):
+        counted = cache._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries').fetchone()
+        self.assertEqual(cache._disk_size(), counted)
+
+    def test_totals_follow_writes_and_deletes(self):
+        cache = self.cache()
+        cache.set('a', b'x' * 1000)
+        cache.set('b', b'y' * 500)
+        cache.set('a', b'z' * 10)  # Replacing must not count the old value
+        self.assertFalse(cache.add('b', b'other'))
+        self.assertTrue(cache.add('n', 1))
+        cache.incr('n')
+        cache.delete('b')
+        self.assert_totals_match(cache)
+        cache.clear()
+        self.assertEqual(cache._disk_size(), (0, 0))
+
+    def test_eviction_brings_disk_tier_under_cap(self):
+        cache = self.cache(MAX_BYTES=10_000)
+        for number in range(20):
+            cache.set(f'key{number}', b'v' * 1000)
+        self.assertLessEqual(cache._disk_size()[1], 10_000)
+        self.assertIsNotNone(cache.get('key19'))
+        self.assert_totals_match(cache)
+
+    def test_totals_are_seeded_for_an_existing_file(self):
+        self.cache().set('a', b'x' * 100)
+        with sqlite3.connect(self.path) as connection:
+            connection.execute('DELETE FROM cache_size')
+        self.assert_totals_match(self.cache())
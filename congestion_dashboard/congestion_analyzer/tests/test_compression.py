@@ -0,0 +1,18 @@
+from django.test import RequestFactory, SimpleTestCase
+
+from ..compression import choose_encoding
+
+
+class ChooseEncodingTests(SimpleTestCase):
+    def choose(self, accept_encoding):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return choose_encoding(request, ('br', 'gzip', 'identity'))
+
+    def test_prefers_brotli_and_honours_q_zero(self):
+        self.assertEqual(self.choose('gzip, br'), 'br')
+        self.assertEqual(self.choose('gzip, br;q=0'), 'gzip')
+        self.assertEqual(self.choose(''), 'identity')
+
+    def test_malformed_q_value_counts_as_one(self):
+        self.assertEqual(self.choose('gzip;q=0.5.1'), 'gzip')
+        self.assertEqual(self.choose('br;q=.'), 'br')
@@ -0,0 +1,70 @@
+import json
+from datetime import date, datetime
+
+from django.test import SimpleTestCase
+from pydantic import ValidationError
+
+from ..congestion_scoring import CongestionScore, TimePeriod, TollData, parse_toll_data, parse_trusted_toll_json
+from .utils import upstream_records
+
+
+class ParseTollDataTests(SimpleTestCase):
+    def setUp(self):
+        self.entries = upstream_records(48, date(2025, 1, 6))
+
+    def test_bulk_validation_types_every_record(self):
+        records = parse_toll_data(self.entries)
+        self.assertEqual(len(records), len(self.entries))
+        first = records[0]
+        self.assertIsInstance(first, TollData)
+        self.assertEqual(first.toll_date, date(2025, 1, 6))
+        self.assertIsInstance(first.time_period, TimePeriod)
+        self.assertEqual(first.event_time, first.toll_10_minute_block)
+        self.assertIsInstance(first.event_time, datetime)
+        self.assertEqual(sum(record.crz_entries for record in records),
+                         sum(int(entry['crz_entries']) for entry in self.entries))
+
+    def test_invalid_records_are_dropped_individually(self):
+        entries = [dict(entry) for entry in self.entries]
+        entries[3]['crz_entries'] = 'lots'
+        del entries[7]['detection_group']
+        entries[9]['new_upstream_field'] = 'ignored'
+        records = parse_toll_data(entries)
+        self.assertEqual(len(records), len(entries) - 2)
+        self.assertEqual(parse_toll_data([]), [])
+
+    def test_trusted_path_matches_and_raises_on_bad_records(self):
+        payload = json.dumps(self.entries).encode()
+        self.assertEqual(parse_trusted_toll_json(payload), parse_toll_data(self.entries))
+        self.entries[0]['vehicle_class'] = 'Spaceship'
+        with self.assertRaises(ValidationError):
+            parse_trusted_toll_json(json.dumps(self.entries).encode())
+
+
+class EventTimeScoringTests(SimpleTestCase):
+    def setUp(self):
+        self.records = parse_toll_data(upstream_records(3 * 48, date(2025, 1, 6)))
+
+    def test_batch_order_does_not_change_the_result(self):
+        in_order, shuffled = CongestionScore(), CongestionScore()
+        in_order.score_records(self.records)
+        # Reversed keeps each block's records in the same relative order once sorted stably
+        blocks = sorted({record.event_time for record in self.records}, reverse=True)
+        shuffled.score_records([record for block in blocks for record in self.records if record.event_time == block])
+        self.assertEqual(shuffled.to_state(), in_order.to_state())
+
+    def test_late_records_do_not_decay_or_rewind_the_clock(self):
+        scorer = CongestionScore()
+        later, earlier = datetime(2025, 1, 6, 12), datetime(2025, 1, 6, 9)
+        scorer.update_score('Holland Tunnel', 60.0, later)
+        scorer.update_score('Holland Tunnel', 60.0, earlier)
+        self.assertEqual(scorer.scores['Holland Tunnel'], 60.0)
+        self.assertEqual(scorer.last_update['Holland Tunnel'], later)
+
+    def test_state_round_trips_and_drops_wall_clock_scores(self):
+        scorer = CongestionScore()
+        scorer.score_records(self.records)
+        state = json.loads(json.dumps(scorer.to_state()))
+        self.assertEqual(CongestionScore.from_state(state).to_state(), scorer.to_state())
+        del state['clock']
+        self.assertEqual(CongestionScore.from_state(state).scores, {})
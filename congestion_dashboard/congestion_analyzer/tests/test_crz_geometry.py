@@ -0,0 +1,47 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import shapely
+from django.test import SimpleTestCase, override_settings
+
+from ..cache_utils import ENTRY_POINTS
+from ..crz_geometry import _grid_cache_path, _load_or_build_grid, build_sampling_grid, crz_polygon, haversine_km
+
+
+class SamplingGridTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(CRZ_GRID_CACHE_DIR=Path(directory.name))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def assertGridsEqual(self, first, second):
+        np.testing.assert_array_equal(first.lats, second.lats)
+        np.testing.assert_array_equal(first.lons, second.lons)
+        self.assertEqual(first.entry_names, second.entry_names)
+        np.testing.assert_array_equal(first.distances_km, second.distances_km)
+
+    def test_grid_is_seeded_and_inside_the_zone(self):
+        grid = build_sampling_grid(500, seed=1)
+        self.assertGridsEqual(grid, build_sampling_grid(500, seed=1))
+        self.assertFalse(np.array_equal(grid.lats, build_sampling_grid(500, seed=2).lats))
+        self.assertTrue(shapely.contains_xy(crz_polygon(), grid.lons, grid.lats).all())
+        self.assertGreater(len(build_sampling_grid(250, seed=1)), 3 * len(grid))
+
+    def test_distances_are_to_every_entry_point(self):
+        grid = build_sampling_grid(500, seed=1)
+        self.assertEqual(grid.entry_names, tuple(ENTRY_POINTS))
+        lat, lon = ENTRY_POINTS[grid.entry_names[0]]
+        np.testing.assert_allclose(grid.distances_km[:, 0], haversine_km(grid.lats, grid.lons, lat, lon))
+        # One degree of latitude is about 111 km
+        self.assertAlmostEqual(float(haversine_km(40.0, -74.0, 41.0, -74.0)), 111.19, places=1)
+
+    def test_grid_is_cached_on_disk_and_rebuilt_when_unreadable(self):
+        grid = _load_or_build_grid(500, 1)
+        path = _grid_cache_path(500, 1)
+        self.assertTrue(path.exists())
+        self.assertGridsEqual(_load_or_build_grid(500, 1), grid)
+        path.write_bytes(b'not an npz file')
+        self.assertGridsEqual(_load_or_build_grid(500, 1), grid)
@@ -0,0 +1,24 @@
+import io
+from datetime import date
+
+from django.core.management import call_command
+
+from .. import cache_utils
+from ..data_versions import partition_versions
+from ..running_totals import dashboard_stats
+from ..synthetic_data import ROWS_PER_DAY
+from .utils import DataTestCase, write_csv
+
+
+class DashboardDataTests(DataTestCase):
+    def setUp(self):
+        super().setUp()
+        call_command('import_data', str(write_csv(self.directory, 1, date(2025, 3, 3))), stdout=io.StringIO())
+
+    def test_header_stats_come_from_the_running_totals(self):
+        stats, agg_json, _ = cache_utils.get_dashboard_data()
+        self.assertEqual(stats, dashboard_stats())
+        self.assertEqual(stats['total_entries'], ROWS_PER_DAY)
+        self.assertTrue(agg_json.startswith('['))
+        part = cache_utils.get_month_dashboard_part('2025-03', partition_versions())
+        self.assertEqual(set(part), {'hourly'})
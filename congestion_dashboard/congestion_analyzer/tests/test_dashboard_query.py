@@ -0,0 +1,92 @@
+import io
+import json
+from datetime import date
+from unittest import mock
+
+import pandas as pd
+from django.core.management import call_command
+from django.http import QueryDict
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from .. import dashboard_query, retention
+from ..dashboard_query import SliceQuery, TTLCache, run_slice_query
+from ..models import VehicleEntry
+from .utils import DataTestCase, write_csv
+
+
+class SliceQueryParamsTests(SimpleTestCase):
+    def test_equal_slices_normalise_to_equal_queries(self):
+        first = SliceQuery.from_params(QueryDict('region=Queens,Brooklyn&vehicle_class=TLC Taxi/FHV&start=2025-01-01'))
+        second = SliceQuery.from_params(QueryDict('region=Brooklyn&region=Queens&region=&vehicle_class=TLC Taxi/FHV'
+                                                  '&start=2025-01-01&granularity=day'))
+        self.assertEqual(first, second)
+        self.assertEqual(hash(first), hash(second))
+        self.assertEqual(first.regions, ('Brooklyn', 'Queens'))
+
+    def test_invalid_params(self):
+        for query in ('start=yesterday', 'start=2025-02-01&end=2025-01-01', 'granularity=decade'):
+            with self.subTest(query), self.assertRaises(ValueError):
+                SliceQuery.from_params(QueryDict(query))
+
+
+class TTLCacheTests(SimpleTestCase):
+    def test_entries_expire_and_the_least_recent_is_evicted(self):
+        cache = TTLCache(maxsize=2, ttl=10)
+        with mock.patch('congestion_analyzer.dashboard_query.time.monotonic', return_value=0):
+            cache.set('a', 1)
+            cache.set('b', 2)
+            cache.get('a')
+            cache.set('c', 3)
+            self.assertEqual([cache.get(key) for key in 'abc'], [1, None, 3])
+        with mock.patch('congestion_analyzer.dashboard_query.time.monotonic', return_value=10):
+            self.assertIsNone(cache.get('a'))
+
+
+class SliceQueryTests(DataTestCase):
+    def setUp(self):
+        super().setUp()
+        dashboard_query.query_cache.clear()
+        self.addCleanup(dashboard_query.query_cache.clear)
+        self.import_days(date(2025, 7, 30), 3)
+
+    def import_days(self, start_date, days):
+        call_command('import_data', str(write_csv(self.directory, days, start_date)), stdout=io.StringIO())
+
+    def expected(self, query, time_columns):
+        """The slice summed in pandas from every raw row."""
+        rows = pd.DataFrame.from_records(VehicleEntry.objects.with_names().values(
+            'toll_date', 'toll_hour', 'detection_region', 'vehicle_class', 'crz_entries'))
+        rows = rows[rows['toll_date'].between(query.start, query.end) & rows['detection_region'].isin(query.regions)]
+        rows = rows.rename(columns={'toll_date': 'period', 'toll_hour': 'hour'})
+        rows['period'] = rows['period'].map(date.isoformat)  # As records_frame writes dates
+        order = [*time_columns, 'detection_region', 'vehicle_class']
+        return rows.groupby(order, as_index=False)['crz_entries'].sum()
+
+    def test_matches_pandas_per_granularity(self):
+        for granularity, time_columns in (('total', []), ('day', ['period']), ('hour', ['period', 'hour'])):
+            query = SliceQuery(date(2025, 7, 31), date(2025, 8, 1), ('Brooklyn', 'Queens'), (), granularity)
+            with self.subTest(granularity):
+                frame = query.frame()
+                frame['crz_entries'] = frame['crz_entries'].astype('int64')
+                pd.testing.assert_frame_equal(frame, self.expected(query, time_columns), check_dtype=False)
+
+    def test_compacted_days_are_read_from_their_rollups(self):
+        query = SliceQuery(date(2025, 7, 30), date(2025, 8, 1), granularity='hour')
+        before = query.frame()
+        retention.compact_day(date(2025, 7, 30))
+        pd.testing.assert_frame_equal(query.frame(), before, check_dtype=False)
+
+    def test_results_are_cached_until_a_month_is_reimported(self):
+        query = SliceQuery(date(2025, 8, 1), date(2025, 8, 31), granularity='month')
+        rows = run_slice_query(query)
+        self.assertIs(run_slice_query(query), rows)
+        self.import_days(date(2025, 8, 5), 1)
+        self.assertGreater(run_slice_query(query)['crz_entries'].sum(), rows['crz_entries'].sum())
+
+    def test_endpoint(self):
+        url = reverse('congestion_analyzer:query_slice')
+        body = json.loads(b''.join(self.client.get(url, {'granularity': 'total', 'region': 'Queens'}).streaming_content))
+        self.assertEqual(body['query']['regions'], ['Queens'])
+        self.assertEqual({row['detection_region'] for row in body['rows']}, {'Queens'})
+        self.assertEqual(self.client.get(url, {'granularity': 'decade'}).status_code, 400)
@@ -0,0 +1,24 @@
+from django.db import transaction
+
+from ..models import DetectionRegion
+from .utils import DataTestCase
+
+
+class DimensionResolveTests(DataTestCase):
+    def test_rolled_back_member_is_not_cached(self):
+        DetectionRegion.resolve(['Brooklyn'])
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            DetectionRegion.resolve(['X'])
+            raise RuntimeError
+        # SQLite reuses the rolled-back key for the next member
+        DetectionRegion.objects.create(name='Y')
+        keys = DetectionRegion.resolve(['X', 'Y'])
+        self.assertEqual(DetectionRegion.objects.get(name='X').pk, keys['X'])
+        self.assertEqual(DetectionRegion.objects.get(name='Y').pk, keys['Y'])
+        self.assertEqual(DetectionRegion.name_of(keys['X']), 'X')
+
+    def test_committed_members_are_cached(self):
+        with transaction.atomic():
+            keys = DetectionRegion.resolve(['Queens'])
+        with self.assertNumQueries(0):
+            self.assertEqual(DetectionRegion.resolve(['Queens']), keys)
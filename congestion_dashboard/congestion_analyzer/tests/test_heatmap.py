@@ -0,0 +1,106 @@
+import json
+import struct
+import zlib
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from ..crz_geometry import build_raster_grid
+from ..heatmap import DEFAULT_ENTRY_SCORE, HeatmapInterpolator, HeatmapRaster, encode_palette_png
+from ..score_state import PublishedScores
+
+
+def weighted_score(distances, entry_names, scores):
+    """The per-point loop the interpolator replaced."""
+    total_weight = weighted = 0
+    for name, distance in zip(entry_names, distances):
+        weight = 1.0 / (1.0 + distance)
+        total_weight += weight
+        weighted += scores.get(name, DEFAULT_ENTRY_SCORE) * weight
+    return min(100, max(1, weighted / total_weight))
+
+
+def decode_palette_png(content):
+    """(pixels, palette, transparency) of a PNG written by encode_palette_png."""
+    chunks, position = {}, 8
+    while position < len(content):
+        length, kind = struct.unpack('>I4s', content[position:position + 8])
+        chunks[kind] = content[position + 8:position + 8 + length]
+        position += 12 + length
+    cols, rows = struct.unpack('>II', chunks[b'IHDR'][:8])
+    scanlines = np.frombuffer(zlib.decompress(chunks[b'IDAT']), dtype=np.uint8).reshape(rows, cols + 1)
+    return scanlines[:, 1:], chunks[b'PLTE'], chunks[b'tRNS']
+
+
+class HeatmapInterpolatorTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.entry_names = ['Brooklyn Bridge', 'Holland Tunnel', 'Lincoln Tunnel', 'Queensboro Bridge']
+        self.distances = rng.uniform(0.1, 6.0, (40, len(self.entry_names)))
+        self.interpolator = HeatmapInterpolator(rng.uniform(40.70, 40.77, 40), rng.uniform(-74.01, -73.96, 40),
+                                                self.entry_names, self.distances)
+
+    def test_matches_the_per_point_loop(self):
+        for scores in ({}, {'Brooklyn Bridge': 90.0, 'Holland Tunnel': 5.0}, {name: 250.0 for name in self.entry_names}):
+            with self.subTest(scores=scores):
+                expected = [weighted_score(row, self.entry_names, scores) for row in self.distances]
+                np.testing.assert_allclose(self.interpolator.interpolate(scores), expected)
+
+    def test_payload_is_built_once_per_version_with_the_previous_scores(self):
+        first = self.interpolator.payload(1, {'Brooklyn Bridge': 10.0})
+        self.assertIs(self.interpolator.payload(1, {'Brooklyn Bridge': 99.0}), first)
+        second = json.loads(self.interpolator.payload(2, {'Brooklyn Bridge': 99.0}))
+        first = json.loads(first)
+        self.assertEqual([point['previous_score'] for point in first], [0.0] * len(first))
+        self.assertEqual([point['previous_score'] for point in second], [point['score'] for point in first])
+
+    def test_no_entry_points_gives_the_default(self):
+        interpolator = HeatmapInterpolator([40.75], [-73.99], [], np.empty((1, 0)))
+        self.assertEqual(interpolator.interpolate({'Brooklyn Bridge': 80.0}).tolist(), [DEFAULT_ENTRY_SCORE])
+
+
+class HeatmapRasterTests(SimpleTestCase):
+    def setUp(self):
+        self.raster = HeatmapRaster(build_raster_grid(480))
+
+    def test_render_scores_inside_cells_only(self):
+        pixels = self.raster.render({'Brooklyn Bridge': 90.0})
+        inside = self.raster.grid.inside
+        self.assertEqual(pixels.shape, inside.shape)
+        self.assertTrue((pixels[~inside] == 0).all())
+        self.assertTrue(((pixels[inside] >= 1) & (pixels[inside] <= 100)).all())
+        west, south, east, north = self.raster.bounds
+        self.assertTrue(west < east and south < north)
+
+    def test_png_decodes_to_the_rendered_cells(self):
+        scores = {'Holland Tunnel': 12.0, 'Queensboro Bridge': 95.0}
+        content = self.raster.png(1, scores)
+        self.assertIs(self.raster.png(1, {}), content)
+        pixels, palette, transparency = decode_palette_png(content)
+        np.testing.assert_array_equal(pixels, self.raster.render(scores))
+        self.assertEqual(len(palette), 3 * 101)
+        self.assertEqual(transparency[0], 0)
+
+    def test_encoder_round_trips_arbitrary_indexes(self):
+        pixels = np.arange(60, dtype=np.uint8).reshape(5, 12) % 101
+        rgb, alpha = np.zeros((101, 3), dtype=np.uint8), np.full(101, 255, dtype=np.uint8)
+        np.testing.assert_array_equal(decode_palette_png(encode_palette_png(pixels, rgb, alpha))[0], pixels)
+
+
+@override_settings(HEATMAP_RASTER_CELL_METERS=(480,))
+class HeatmapRasterViewTests(SimpleTestCase):
+    def get(self, level, **headers):
+        snapshot = PublishedScores(7, {'Lincoln Tunnel': 70.0})
+        with mock.patch('congestion_analyzer.scoring_views.get_score_snapshot', return_value=snapshot):
+            return self.client.get(reverse('congestion_analyzer:heatmap_raster', args=[level]), headers=headers)
+
+    def test_unchanged_version_revalidates_to_304(self):
+        response = self.get(0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(self.get(0, if_none_match=response['ETag']).status_code, 304)
+
+    def test_unknown_level_is_404(self):
+        self.assertEqual(self.get(1).status_code, 404)
@@ -0,0 +1,77 @@
+import io
+from datetime import date
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+
+from .. import bulk_ingest, running_totals
+from ..data_versions import partition_versions
+from ..management.commands import import_data
+from ..models import DailyEntryTotal, VehicleEntry
+from ..running_totals import apply_deltas, dashboard_stats
+from ..synthetic_data import ROWS_PER_DAY
+from .utils import DataTestCase, write_csv
+
+
+class ImportDataTests(DataTestCase):
+    def import_csv(self, path, **options):
+        call_command('import_data', str(path), stdout=io.StringIO(), **options)
+
+    def test_versions_are_bumped_after_the_daily_totals_are_rebuilt(self):
+        path = write_csv(self.directory, 2, date(2025, 1, 31))
+        seen = []
+        bump = import_data.bump_partitions
+
+        def checking_bump(months):
+            seen.append(set(DailyEntryTotal.objects.dates('toll_date', 'day')))
+            bump(months)
+
+        with mock.patch.object(import_data, 'bump_partitions', checking_bump):
+            self.import_csv(path)
+        self.assertEqual(seen, [{date(2025, 1, 31), date(2025, 2, 1)}])
+        self.assertEqual(partition_versions(), {'2025-01': 1, '2025-02': 1})
+        self.assertEqual(running_totals.verify(), [])
+        self.assertEqual(dashboard_stats()['total_entries'], 2 * ROWS_PER_DAY)
+
+    def test_committed_chunks_are_bumped_when_a_load_fails(self):
+        path = write_csv(self.directory, 2, date(2025, 1, 31))
+        with mock.patch('congestion_analyzer.bulk_ingest.apply_deltas', side_effect=[None, RuntimeError]):
+            with self.assertRaises(RuntimeError):
+                self.import_csv(path, chunk_size=ROWS_PER_DAY, defer_indexes=False)
+        self.assertEqual(VehicleEntry.objects.count(), ROWS_PER_DAY)
+        self.assertEqual(set(DailyEntryTotal.objects.dates('toll_date', 'day')), {date(2025, 1, 31)})
+        self.assertEqual(partition_versions().get('2025-01'), 1)
+
+    def index_names(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, VehicleEntry._meta.db_table)
+        return {index.name for index in VehicleEntry._meta.indexes} & set(constraints)
+
+    def test_deferred_index_loads_commit_chunks_and_rebuild_indexes_when_they_fail(self):
+        path = write_csv(self.directory, 2, date(2025, 1, 31))
+        all_indexes = {index.name for index in VehicleEntry._meta.indexes}
+        committed = []
+
+        def checking_apply(deltas):
+            committed.append(VehicleEntry.objects.count())
+            if len(committed) == 2:
+                raise RuntimeError
+            apply_deltas(deltas)
+
+        with mock.patch('congestion_analyzer.bulk_ingest.apply_deltas', checking_apply):
+            with self.assertRaises(RuntimeError):
+                self.import_csv(path, chunk_size=ROWS_PER_DAY, defer_indexes=True)
+        self.assertEqual(committed, [ROWS_PER_DAY, 2 * ROWS_PER_DAY])
+        self.assertEqual(VehicleEntry.objects.count(), ROWS_PER_DAY)
+        self.assertEqual(self.index_names(), all_indexes)
+        self.assertEqual(running_totals.verify(), [])
+
+    def test_indexes_dropped_by_a_killed_load_are_restored(self):
+        drop_sql, _ = bulk_ingest.index_sql(VehicleEntry._meta.indexes[:2])
+        bulk_ingest.run_statements(drop_sql)
+        self.assertEqual(len(self.index_names()), 1)
+
+        self.import_csv(write_csv(self.directory, 1, date(2025, 1, 31)), defer_indexes=False)
+        self.assertEqual(self.index_names(), {index.name for index in VehicleEntry._meta.indexes})
+        self.assertEqual(VehicleEntry.objects.count(), ROWS_PER_DAY)
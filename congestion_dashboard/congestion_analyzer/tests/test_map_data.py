@@ -0,0 +1,68 @@
+import io
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from ..map_data import DECK_COLUMNS, build_map_frame
+from ..models import VehicleEntry
+from .utils import DataTestCase, write_csv
+
+
+class BuildMapFrameTests(SimpleTestCase):
+    def test_columns_per_entry_point_and_vehicle_type(self):
+        totals = pd.DataFrame.from_records([
+            ('West 60th St', '1 - Cars, Pickups and Vans', 10),
+            ('West Side Highway at 60th St', '1 - Cars, Pickups and Vans', 5),  # Same entry point
+            ('West 60th St', '4 - Buses', 4),
+            ('West 60th St', 'Hovercraft', 1),
+            ('Somewhere Else', '4 - Buses', 100),
+        ], columns=['detection_group', 'vehicle_class', 'crz_entries'])
+        frame = build_map_frame(totals)
+        self.assertEqual(list(frame.columns), DECK_COLUMNS)
+        self.assertEqual(frame[['detection_region', 'vehicle_type', 'crz_entries']].values.tolist(),
+                         [['West 60th Street', 'car', 15], ['West 60th Street', 'bus', 4],
+                          ['West 60th Street', 'other', 1]])
+        self.assertEqual(frame['height'].max(), 500)
+        # Columns are spread symmetrically around the entry point
+        self.assertAlmostEqual((frame['lng_offset'] - frame['lng']).sum(), 0)
+
+    def test_empty_totals(self):
+        empty = pd.DataFrame(columns=['detection_group', 'vehicle_class', 'crz_entries'])
+        self.assertEqual(list(build_map_frame(empty).columns), DECK_COLUMNS)
+
+
+class MapDataViewTests(DataTestCase):
+    def setUp(self):
+        super().setUp()
+        self.import_days(date(2025, 6, 1), 2)
+        self.url = reverse('congestion_analyzer:map_data')
+
+    def import_days(self, start_date, days):
+        call_command('import_data', str(write_csv(self.directory, days, start_date)), stdout=io.StringIO())
+
+    def entries(self, response):
+        return sum(row['crz_entries'] for row in response.json())
+
+    def test_range_totals_match_the_rows(self):
+        day = VehicleEntry.objects.filter(toll_date=date(2025, 6, 2)).aggregate(total=Sum('crz_entries'))['total']
+        response = self.client.get(self.url, {'start': '2025-06-02', 'end': '2025-06-02'})
+        self.assertEqual(self.entries(response), day)
+        arrow = self.client.get(self.url, {'start': '2025-06-02', 'end': '2025-06-02', 'format': 'arrow'})
+        table = pa.ipc.open_stream(arrow.content).read_all()
+        self.assertEqual(table.column('crz_entries').to_pylist(), [row['crz_entries'] for row in response.json()])
+
+    def test_cached_range_is_refreshed_by_an_import(self):
+        params = {'start': '2025-06-01', 'end': '2025-06-30'}
+        before = self.entries(self.client.get(self.url, params))
+        self.import_days(date(2025, 6, 10), 1)
+        added = VehicleEntry.objects.filter(toll_date=date(2025, 6, 10)).aggregate(total=Sum('crz_entries'))['total']
+        self.assertEqual(self.entries(self.client.get(self.url, params)), before + added)
+
+    def test_bad_ranges_are_rejected(self):
+        self.assertEqual(self.client.get(self.url, {'start': '2025-06-02'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': '2025-06-02', 'end': '2025-06-01'}).status_code, 400)
@@ -0,0 +1,71 @@
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from .. import metrics
+from ..metrics import Registry, cached_section, mark_cache_hit
+
+
+class RegistryTests(SimpleTestCase):
+    def test_prometheus_text(self):
+        registry = Registry()
+        requests = registry.counter('requests_total', 'Requests')
+        latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+        self.assertIs(registry.counter('requests_total', 'Requests'), requests)
+        requests.inc(view='a"b\\c')
+        requests.inc(2, view='a"b\\c')
+        for value in (0.05, 0.5, 5.0):
+            latency.observe(value, view='index')
+        self.assertEqual(registry.render().splitlines(), [
+            '# HELP requests_total Requests',
+            '# TYPE requests_total counter',
+            'requests_total{view="a\\"b\\\\c"} 3',
+            '# HELP latency_seconds Latency',
+            '# TYPE latency_seconds histogram',
+            'latency_seconds_bucket{view="index",le="0.1"} 1',
+            'latency_seconds_bucket{view="index",le="1"} 2',
+            'latency_seconds_bucket{view="index",le="+Inf"} 3',
+            'latency_seconds_sum{view="index"} 5.55',
+            'latency_seconds_count{view="index"} 3',
+        ])
+
+
+class CachedSectionTests(SimpleTestCase):
+    def count(self, key, result):
+        return metrics.CACHE_REQUESTS._values.get(metrics._label_key({'key': key, 'result': result}), 0)
+
+    def test_nested_sections_count_their_own_hits(self):
+        @cached_section('test-inner')
+        def inner(hit):
+            if hit:
+                mark_cache_hit()
+
+        @cached_section('test-outer')
+        def outer():
+            inner(True)  # The inner hit must not make the outer rebuild count as a hit
+            inner(False)
+
+        before = [self.count(*key) for key in (('test-outer', 'miss'), ('test-inner', 'hit'), ('test-inner', 'miss'))]
+        metrics.start_request_timings()
+        outer()
+        timings = metrics.pop_request_timings()
+        after = [self.count(*key) for key in (('test-outer', 'miss'), ('test-inner', 'hit'), ('test-inner', 'miss'))]
+        self.assertEqual([b - a for a, b in zip(before, after)], [1, 1, 1])
+        self.assertEqual([name for name, _, _ in timings], ['cache-test-inner', 'cache-test-outer'])
+
+    def test_timings_outside_a_request_are_dropped(self):
+        metrics.record_timing('orphan', 1.0)
+        self.assertEqual(metrics.pop_request_timings(), [])
+
+
+class MetricsMiddlewareTests(SimpleTestCase):
+    def test_server_timing_and_request_metrics(self):
+        response = self.client.get(reverse('congestion_analyzer:metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="0 queries"')
+        second = self.client.get(reverse('congestion_analyzer:metrics')).content.decode()
+        self.assertIn('http_request_duration_seconds_count{method="GET",status="200",'
+                      'view="congestion_analyzer:metrics"}', second)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_endpoint_can_be_disabled(self):
+        self.assertEqual(self.client.get(reverse('congestion_analyzer:metrics')).status_code, 404)
@@ -0,0 +1,64 @@
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from .. import profiling
+
+
+class ProfilingTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings_override = override_settings(PROFILING_ENABLED=True, PROFILES_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.token = profiling.make_token()
+        self.url = reverse('congestion_analyzer:metrics')
+
+    def test_tokens(self):
+        self.assertTrue(profiling.token_is_valid(self.token))
+        self.assertFalse(profiling.token_is_valid(self.token[:-1] + 'x'))
+        self.assertFalse(profiling.token_is_valid(''))
+        with override_settings(PROFILING_TOKEN_MAX_AGE=-1):
+            self.assertFalse(profiling.token_is_valid(self.token))
+
+    def test_requests_without_a_valid_token_are_not_profiled(self):
+        for params, settings in (({}, {}), ({profiling.PROFILE_PARAM: 'forged'}, {}),
+                                 ({profiling.PROFILE_PARAM: self.token}, {'PROFILING_ENABLED': False})):
+            with self.subTest(params=params, settings=settings), override_settings(**settings):
+                response = self.client.get(self.url, params)
+                self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+    def test_profiled_request_saves_and_links_its_files(self):
+        response = self.client.get(self.url, headers={'x-profile-token': self.token})
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Profile-Id']
+        self.assertIn(f'/profiles/{profile_id}/folded/?{profiling.PROFILE_PARAM}=', response['Link'])
+        summary = json.loads(profiling.profile_path(profile_id, 'summary').read_text())
+        self.assertEqual((summary['view'], summary['status']), ('congestion_analyzer:metrics', 200))
+        self.assertGreater(summary['calls'], 0)
+        self.assertEqual(profiling.list_profiles()[0]['id'], profile_id)
+        self.assertIn('function calls', profiling.top_frames(profile_id, limit=5))
+
+        download = reverse('congestion_analyzer:profile_file', args=[profile_id, 'stats'])
+        self.assertEqual(self.client.get(download).status_code, 404)
+        response = self.client.get(download, {profiling.PROFILE_PARAM: self.token})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)  # Downloads are not profiled themselves
+        source = reverse('congestion_analyzer:profile_file', args=[profile_id, 'source'])
+        self.assertEqual(self.client.get(source, {profiling.PROFILE_PARAM: self.token}).status_code, 404)
+        self.assertIsNone(profiling.profile_path('../settings', 'stats'))
+
+    @override_settings(PROFILING_MAX_PROFILES=2)
+    def test_old_profiles_are_pruned(self):
+        for second in range(3):
+            with mock.patch('congestion_analyzer.profiling.time.strftime', return_value=f'20250101-00000{second}'):
+                self.client.get(self.url, {profiling.PROFILE_PARAM: self.token})
+        self.assertEqual(len(profiling.list_profiles()), 2)
+        self.assertEqual(len(list(self.directory.iterdir())), 2 * len(profiling.PROFILE_FILES))
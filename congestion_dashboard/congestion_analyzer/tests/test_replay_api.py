@@ -0,0 +1,68 @@
+import json
+from datetime import date
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from ..replay_api import CATEGORY_FIELDS, SoQLError, run_soql, socrata_json, upstream_frame
+from ..row_index import RowIndex
+from ..synthetic_data import ROWS_PER_DAY, generate_frame
+
+
+class RunSoQLTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.frame = upstream_frame(generate_frame(2 * ROWS_PER_DAY, start_date=date(2025, 1, 5)))
+        cls.index = RowIndex.from_columns({field: cls.frame[field].astype(str) for field in CATEGORY_FIELDS})
+
+    def query(self, use_index=False, **params):
+        return run_soql(self.frame, {'$limit': '50000', **params}, self.index if use_index else None)
+
+    def test_select_and_group_with_sum_and_count(self):
+        result = self.query(**{'$select': 'detection_region, sum(crz_entries) as entries, count(*)',
+                               '$group': 'detection_region', '$order': 'entries desc'})
+        expected = self.frame.groupby('detection_region', observed=True)['crz_entries'].agg(['sum', 'size'])
+        expected = expected.sort_values('sum', ascending=False, kind='stable')
+        self.assertEqual(list(result.columns), ['detection_region', 'entries', 'count'])
+        self.assertEqual(result['detection_region'].tolist(), expected.index.tolist())
+        self.assertEqual(result['entries'].tolist(), expected['sum'].tolist())
+        self.assertEqual(result['count'].tolist(), expected['size'].tolist())
+        total = self.query(**{'$select': 'count(*), max(hour_of_day)'})
+        self.assertEqual(total.values.tolist(), [[len(self.frame), 23]])
+
+    def test_where_in_and_between(self):
+        result = self.query(**{'$where': "detection_group in ('Holland Tunnel', 'Lincoln Tunnel') "
+                                         "and hour_of_day between 7 and 9 and not crz_entries < 10"})
+        frame = self.frame
+        expected = frame[frame['detection_group'].isin(['Holland Tunnel', 'Lincoln Tunnel'])
+                         & frame['hour_of_day'].between(7, 9) & (frame['crz_entries'] >= 10)]
+        pd.testing.assert_frame_equal(result, expected)
+        dates = self.query(**{'$where': "toll_date between '2025-01-06' and '2025-01-06T00:00:00.000'"})
+        self.assertEqual(len(dates), ROWS_PER_DAY)
+
+    def test_equality_on_datetime_and_int_fields(self):
+        by_date = self.query(toll_date='2025-01-05T00:00:00.000')
+        self.assertEqual(len(by_date), ROWS_PER_DAY)
+        self.assertEqual(len(self.query(toll_date='2025-01-06')), ROWS_PER_DAY)
+        block = self.query(toll_10_minute_block='2025-01-05T08:20:00.000', minute_of_hour='20')
+        self.assertEqual(len(block), ROWS_PER_DAY // 144)
+        self.assertEqual(len(self.query(hour_of_day='7')), 2 * ROWS_PER_DAY // 24)
+
+    def test_values_written_by_socrata_json_filter_back_to_their_rows(self):
+        row = json.loads(socrata_json(self.frame.iloc[[1234]]))[0]
+        filters = {field: row[field] for field in ('toll_10_minute_block', 'toll_week', 'vehicle_class', 'detection_group')}
+        for use_index in (False, True):
+            with self.subTest(use_index=use_index):
+                result = self.query(use_index, **filters)
+                self.assertIn(1234, result.index)
+                self.assertEqual(len(result), 1)
+
+    def test_unanswerable_queries_raise(self):
+        for params in ({'speed': '1'}, {'toll_date': 'yesterday'}, {'hour_of_day': 'noon'},
+                       {'$select': 'median(crz_entries)'}, {'$select': 'sum(*)'},
+                       {'$select': 'vehicle_class, sum(crz_entries)'}, {'$group': 'nothing'},
+                       {'$where': 'crz_entries >'}, {'$where': "crz_entries ~ 3"}, {'$where': 'nothing = 1'},
+                       {'$where': "(hour_of_day = 1"}, {'$order': 'nothing'}, {'$limit': '-1'}, {'$offset': 'x'}):
+            with self.subTest(params=params), self.assertRaises(SoQLError):
+                self.query(**params)
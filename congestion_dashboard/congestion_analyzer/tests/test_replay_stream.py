@@ -0,0 +1,71 @@
+import io
+import json
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from ..models import VehicleEntry
+from ..replay_stream import MAX_SPEED, WINDOW, first_window, iter_windows, replay_request_params
+from .utils import DataTestCase, write_csv
+
+
+def parse_events(content):
+    """(id, event, data) of every event in an SSE body."""
+    events = []
+    for block in content.decode().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line)
+        if 'event' in fields:
+            events.append((fields.get('id'), fields['event'], json.loads(fields['data'])))
+    return events
+
+
+class ReplayStreamTests(DataTestCase):
+    day = date(2025, 9, 1)
+
+    def setUp(self):
+        super().setUp()
+        call_command('import_data', str(write_csv(self.directory, 2, self.day)), stdout=io.StringIO())
+        self.url = reverse('congestion_analyzer:replay_stream')
+
+    def stream(self, last_event_id=None, **params):
+        headers = {'last-event-id': last_event_id} if last_event_id else {}
+        response = self.client.get(self.url, {'speed': MAX_SPEED, **params}, headers=headers)
+        return parse_events(b''.join(response.streaming_content))
+
+    def test_windows_sum_the_rows_in_event_time_order(self):
+        start = datetime(2025, 9, 1, 23, 0)
+        windows = list(iter_windows(start, start + timedelta(hours=2)))
+        self.assertEqual([window_start for window_start, _ in windows], [start + i * WINDOW for i in range(12)])
+        expected = Counter()
+        for hour, block, entries in VehicleEntry.objects.filter(toll_date=self.day, toll_hour=23).values_list(
+                'toll_hour', 'toll_10_minute_block', 'crz_entries'):
+            expected[datetime.combine(self.day, datetime.min.time()) + timedelta(hours=hour, minutes=10 * block)] += entries
+        self.assertEqual({window_start: sum(cell[2] for cell in cells) for window_start, cells in windows[:6]}, expected)
+
+    def test_request_params(self):
+        self.assertEqual(replay_request_params({}), (first_window(), None, 600.0))
+        self.assertEqual(first_window(), datetime(2025, 9, 1))
+        start, _, _ = replay_request_params({'start': '2025-09-01'}, last_event_id='2025-09-01T08:20:00')
+        self.assertEqual(start, datetime(2025, 9, 1, 8, 30))
+        for params in ({'speed': 'fast'}, {'speed': '0'}, {'speed': str(MAX_SPEED * 2)}, {'start': 'monday'}):
+            with self.subTest(params=params), self.assertRaises(ValueError):
+                replay_request_params(params)
+
+    def test_reconnect_with_last_event_id_resumes_after_it(self):
+        params = {'start': '2025-09-01T22:00', 'end': '2025-09-02T01:00'}
+        full = [event for event in self.stream(**params) if event[1] == 'window']
+        self.assertEqual(len(full), 18)
+        self.assertEqual([event_id for event_id, _, data in full], [data['start'] for _, _, data in full])
+
+        broken_at = full[7][0]
+        resumed = self.stream(last_event_id=broken_at, **params)
+        self.assertEqual(resumed[0][1:], ('start', {'start': '2025-09-01T23:20:00', 'speed': MAX_SPEED}))
+        self.assertEqual(resumed[-1][1], 'end')
+        self.assertEqual(full[:8] + [event for event in resumed if event[1] == 'window'], full)
+
+    def test_bad_params_are_rejected(self):
+        self.assertEqual(self.client.get(self.url, {'speed': '-1'}).status_code, 400)
+        VehicleEntry.objects.all().delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
@@ -0,0 +1,68 @@
+import io
+from datetime import date
+
+from django.core.management import call_command
+
+from .. import archive, cache_utils, retention, running_totals
+from ..models import HistoricalScore, HourlyEntryTotal, VehicleEntry
+from ..replay_stream import first_window, iter_windows
+from .utils import DataTestCase, write_csv
+
+
+class RetentionTests(DataTestCase):
+    first_day = date(2025, 4, 1)
+
+    def setUp(self):
+        super().setUp()
+        call_command('import_data', str(write_csv(self.directory, 2, self.first_day)), stdout=io.StringIO())
+
+    def history(self):
+        HistoricalScore.objects.all().delete()
+        call_command('backfill_scores', stdout=io.StringIO())
+        cache_utils.clear_anomaly_cache()
+        anomalies = cache_utils.get_cached_anomalies()
+        return {
+            'frame': cache_utils.fetch_vehicle_frame().sort_values(
+                ['toll_date', 'hour_of_day', 'detection_group', 'vehicle_class'], ignore_index=True),
+            'first_window': first_window(),
+            'windows': list(iter_windows(first_window())),
+            'scores': set(HistoricalScore.objects.values_list('toll_date', 'bucket', 'detection_group', 'score')),
+            'anomaly_range': anomalies[1:],
+        }
+
+    def test_compact_day_round_trip(self):
+        before = self.history()
+        raw_rows = VehicleEntry.objects.filter(toll_date=self.first_day).count()
+
+        self.assertEqual(retention.compact_day(self.first_day), raw_rows)
+
+        self.assertFalse(VehicleEntry.objects.filter(toll_date=self.first_day).exists())
+        self.assertEqual(sum(HourlyEntryTotal.objects.values_list('rows', flat=True)), raw_rows)
+        self.assertEqual(archive.archived_days(), [self.first_day])
+        after = self.history()
+        self.assertTrue(before['frame'].equals(after['frame']))
+        for key in ('first_window', 'windows', 'scores', 'anomaly_range'):
+            self.assertEqual(before[key], after[key], key)
+        self.assertEqual(running_totals.verify(), [])
+
+    def compact_after_a_killed_run(self, late_rows):
+        """Archive the first day as a run killed before its commit would, then compact it for real."""
+        archive.write_day(self.first_day, retention.raw_day_frame(self.first_day))
+        if late_rows:  # Rows for the day imported before the next run
+            call_command('import_data', str(write_csv(self.directory, 1, self.first_day)), stdout=io.StringIO())
+        total = VehicleEntry.objects.count()
+        raw_rows = VehicleEntry.objects.filter(toll_date=self.first_day).count()
+
+        self.assertEqual(retention.compact_day(self.first_day), raw_rows)
+
+        parts = list((archive.archive_dir() / f'toll_date={self.first_day}').glob('*.parquet'))
+        self.assertEqual(len(parts), 1)
+        self.assertEqual(archive.read_table(self.first_day, self.first_day).num_rows, raw_rows)
+        self.assertEqual(len(cache_utils.fetch_vehicle_frame()), total)
+        self.assertEqual(running_totals.verify(), [])
+
+    def test_a_run_killed_before_its_commit_is_not_counted_twice(self):
+        self.compact_after_a_killed_run(late_rows=False)
+
+    def test_rows_imported_after_a_killed_run_are_archived_once(self):
+        self.compact_after_a_killed_run(late_rows=True)
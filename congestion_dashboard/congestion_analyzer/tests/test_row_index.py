@@ -0,0 +1,81 @@
+import itertools
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from ..row_index import RowIndex, intersect_sorted
+
+
+class IntersectSortedTests(SimpleTestCase):
+    def test_intersection(self):
+        cases = [
+            ([1, 3, 5, 7], [0, 3, 4, 7, 9], [3, 7]),
+            ([2, 4], [1, 3, 5], []),
+            ([8, 9], [1, 2], []),  # Past the end of `large`
+            ([], [1, 2], []),
+            ([1, 2], [], []),
+        ]
+        for small, large, expected in cases:
+            with self.subTest(small=small, large=large):
+                result = intersect_sorted(np.array(small, dtype=np.int32), np.array(large, dtype=np.int32))
+                self.assertEqual(result.tolist(), expected)
+                self.assertEqual(result.dtype, np.int32)
+
+
+class RowIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.frame = pd.DataFrame({
+            'region': ['Queens', 'Brooklyn', 'Queens', None, 'Bronx', 'Queens'],
+            'vehicle_class': ['Car', 'Car', 'Truck', 'Car', np.nan, 'Car'],
+        })
+        self.index = RowIndex.from_columns({column: self.frame[column] for column in self.frame})
+
+    def test_lookup(self):
+        self.assertEqual(self.index.lookup(region='Queens').tolist(), [0, 2, 5])
+        self.assertEqual(self.index.lookup(region=['Bronx', 'Queens']).tolist(), [0, 2, 4, 5])
+        self.assertEqual(self.index.lookup(region='Queens', vehicle_class='Car').tolist(), [0, 5])
+        self.assertEqual(self.index.lookup(region=['Staten Island', 'Brooklyn']).tolist(), [1])
+        self.assertEqual(self.index.lookup(region='Staten Island').tolist(), [])
+        self.assertEqual(self.index.lookup().tolist(), list(range(6)))
+
+    def test_missing_values_are_not_indexed(self):
+        self.assertEqual(set(self.index.postings['region']), {'Queens', 'Brooklyn', 'Bronx'})
+        self.assertEqual(set(self.index.postings['vehicle_class']), {'Car', 'Truck'})
+        self.assertEqual(self.index.lookup(region=None).tolist(), [])
+
+    def test_positions_are_int32_until_the_row_count_needs_int64(self):
+        self.assertEqual(self.index.lookup(region='Queens').dtype, np.int32)
+        with mock.patch('congestion_analyzer.row_index.INT32_ROWS', 5):
+            index = RowIndex.from_columns({'region': self.frame['region']})
+        self.assertEqual(index.lookup(region='Queens').dtype, np.int64)
+        self.assertEqual(index.lookup(region='Queens').tolist(), [0, 2, 5])
+
+    def test_take_on_a_prefix_of_the_indexed_frame(self):
+        pd.testing.assert_frame_equal(self.index.take(self.frame, region='Queens'), self.frame.iloc[[0, 2, 5]])
+        pd.testing.assert_frame_equal(self.index.take(self.frame.iloc[:3], region='Queens'), self.frame.iloc[[0, 2]])
+        self.assertTrue(self.index.take(self.frame.iloc[:0], region='Queens').empty)
+
+    def test_from_records(self):
+        records = self.frame.where(self.frame.notna(), None).to_dict('records')
+        index = RowIndex.from_records(records, ['region'])
+        self.assertEqual(index.lookup(region='Queens').tolist(), [0, 2, 5])
+
+    def test_lookup_matches_a_brute_force_scan(self):
+        rng = np.random.default_rng(7)
+        values = {'region': ['A', 'B', 'C', 'D', None], 'vehicle_class': ['x', 'y', 'z'], 'period': ['peak', 'off']}
+        frame = pd.DataFrame({column: rng.choice(np.array(choices, dtype=object), 500)
+                              for column, choices in values.items()})
+        index = RowIndex.from_columns({column: frame[column] for column in frame})
+        filter_values = {column: [choices[0], choices[:2], 'unknown', []] for column, choices in values.items()}
+        for size in range(1, len(values) + 1):
+            for columns in itertools.combinations(values, size):
+                for picks in itertools.product(*(filter_values[column] for column in columns)):
+                    filters = dict(zip(columns, picks))
+                    with self.subTest(filters=filters):
+                        mask = np.ones(len(frame), dtype=bool)
+                        for column, wanted in filters.items():
+                            wanted = [wanted] if isinstance(wanted, str) else wanted
+                            mask &= frame[column].isin([value for value in wanted if value is not None]).to_numpy()
+                        self.assertEqual(index.lookup(**filters).tolist(), np.flatnonzero(mask).tolist())
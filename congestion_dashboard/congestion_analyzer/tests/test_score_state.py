@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+from datetime import date
+from unittest import mock
+
+import httpx
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import congestion_scoring, score_state
+from ..congestion_scoring import claim_inline_refresh, update_scores
+from ..models import ScoreSnapshot
+from ..score_state import (CacheScoreStateBackend, DatabaseScoreStateBackend, LocalMemoryScoreStateBackend,
+                           PublishedScores)
+from .utils import TEST_CACHES, upstream_records
+
+
+def count_publishes(state):
+    """An advance() that counts how many publishes built on each other."""
+    count = state.get('count', 0) + 1
+    return {'publishes': count}, {'count': count}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ScoreStateBackendTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def publish_concurrently(self, backend, publishers=8):
+        def slow_count(state):
+            time.sleep(0.01)  # Long enough for every publisher to read the same state without a lock
+            return count_publishes(state)
+
+        threads = [threading.Thread(target=backend.publish, args=(slow_count,)) for _ in range(publishers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return backend.load()
+
+    def test_concurrent_publishes_fold_onto_each_other(self):
+        for backend in (LocalMemoryScoreStateBackend(), CacheScoreStateBackend()):
+            with self.subTest(type(backend).__name__):
+                snapshot = self.publish_concurrently(backend)
+                self.assertEqual(snapshot.version, 8)
+                self.assertEqual(snapshot.state, {'count': 8})
+                self.assertEqual(snapshot.scores, {'publishes': 8})
+
+    def test_cache_lock_is_released_when_advance_fails(self):
+        backend = CacheScoreStateBackend()
+        with self.assertRaises(RuntimeError):
+            backend.publish(mock.Mock(side_effect=RuntimeError))
+        self.assertEqual(backend.publish(count_publishes).version, 1)
+
+
+class DatabaseScoreStateBackendTests(TransactionTestCase):
+    def test_publish_folds_onto_the_latest_row_and_prunes(self):
+        backend = DatabaseScoreStateBackend()
+        seen = []
+        for _ in range(backend.keep_versions + 2):
+            snapshot = backend.publish(lambda state: (seen.append(state), count_publishes(state))[1])
+        self.assertEqual(seen[:2], [{}, {'count': 1}])
+        self.assertEqual(snapshot, backend.load())
+        self.assertEqual(snapshot.state, {'count': backend.keep_versions + 2})
+        self.assertEqual(ScoreSnapshot.objects.count(), backend.keep_versions)
+
+    def test_publish_takes_the_write_lock_before_reading(self):
+        with CaptureQueriesContext(connection) as queries:
+            DatabaseScoreStateBackend().publish(count_publishes)
+        if connection.vendor == 'sqlite':
+            self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+        else:
+            self.assertIn('FOR UPDATE', queries[0]['sql'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class UpdateScoresTests(SimpleTestCase):
+    def setUp(self):
+        self.backend = LocalMemoryScoreStateBackend()
+        patcher = mock.patch.object(congestion_scoring, 'get_score_backend', return_value=self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(score_state.remember_snapshot, None)
+
+    def fetch(self, result):
+        return mock.patch.object(congestion_scoring, 'fetch_toll_data', mock.AsyncMock(**result))
+
+    def test_refresh_folds_records_onto_the_published_state(self):
+        self.backend.publish(lambda state: ({'Brooklyn Bridge': 5.0}, {}))
+        with self.fetch({'return_value': upstream_records(48, date(2025, 1, 6))}):
+            scores = asyncio.run(update_scores())
+        self.assertEqual(self.backend.load().version, 2)
+        self.assertEqual(self.backend.load().scores, scores)
+        self.assertGreater(len(scores), 1)
+
+    def test_failed_fetch_keeps_the_current_scores(self):
+        self.backend.publish(lambda state: ({'Brooklyn Bridge': 5.0}, {}))
+        with self.fetch({'side_effect': httpx.ConnectError('down')}):
+            self.assertEqual(asyncio.run(update_scores()), {'Brooklyn Bridge': 5.0})
+        self.assertEqual(self.backend.load().version, 1)
+
+    def test_publish_errors_propagate(self):
+        self.backend.publish = mock.Mock(side_effect=TimeoutError)
+        with self.fetch({'return_value': upstream_records(8, date(2025, 1, 6))}):
+            with self.assertRaises(TimeoutError):
+                asyncio.run(update_scores())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class InlineRefreshTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_external_mode_never_refreshes(self):
+        self.assertFalse(claim_inline_refresh())
+
+    @override_settings(CONGESTION_SCORE_REFRESH='inline', CONGESTION_SCORE_REFRESH_INTERVAL=60)
+    def test_one_caller_per_interval_refreshes(self):
+        self.assertEqual([claim_inline_refresh() for _ in range(3)], [True, False, False])
+
+    def test_scores_view_only_reads_the_snapshot(self):
+        snapshot = PublishedScores(3, {'Brooklyn Bridge': 42.0})
+        with mock.patch.object(congestion_scoring, 'fetch_toll_data') as fetch, \
+                mock.patch('congestion_analyzer.scoring_views.get_score_snapshot', return_value=snapshot):
+            response = self.client.get(reverse('congestion_analyzer:scores'))
+        fetch.assert_not_called()
+        self.assertEqual(response.json(), {'Brooklyn Bridge': 42.0})
@@ -0,0 +1,54 @@
+import io
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+
+from .. import snapshots
+from ..cache_utils import get_month_dashboard_part, get_vehicle_partition
+from ..data_versions import partition_versions
+from .utils import DataTestCase, write_csv
+
+MONTH = '2025-07'
+
+
+class SnapshotReadTests(DataTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        settings_override = override_settings(SNAPSHOTS_ENABLED=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command('import_data', str(write_csv(self.directory, 2, date(2025, 7, 1))), stdout=io.StringIO())
+        self.versions = partition_versions()
+
+    def from_database(self):
+        """The month's base rows and hourly rollup with the snapshot out of the way."""
+        cache.clear()
+        with override_settings(SNAPSHOTS_ENABLED=False):
+            return get_vehicle_partition(MONTH, self.versions), get_month_dashboard_part(MONTH, self.versions)['hourly']
+
+    def test_snapshot_frames_match_the_database_path(self):
+        base = snapshots.read_month_frame(snapshots.BASE_TABLE, MONTH, self.versions[MONTH])
+        hourly = snapshots.read_month_rollup(MONTH, self.versions[MONTH])['hourly']
+        expected_base, expected_hourly = self.from_database()
+        pd.testing.assert_frame_equal(base, expected_base)
+        pd.testing.assert_frame_equal(hourly, expected_hourly)
+
+    def test_columns_are_views_of_the_mapped_file(self):
+        snapshot_id, manifest = snapshots.current_snapshot()
+        table = snapshots._mapped_table(snapshot_id, manifest['months'][MONTH]['files'][snapshots.BASE_TABLE])
+        frame = snapshots.read_month_frame(snapshots.BASE_TABLE, MONTH, self.versions[MONTH])
+
+        for column in ('vehicle_class', 'detection_region', 'time_period', 'detection_group', 'day_of_week'):
+            with self.subTest(column):
+                self.assertEqual(frame[column].dtype, snapshots.STRING_DTYPE)
+                read = frame[column].array.__arrow_array__().chunk(0)
+                mapped = table.column(column).chunk(0)
+                self.assertEqual([b.address for b in read.buffers()[1:]], [b.address for b in mapped.buffers()[1:]])
+        for column in ('crz_entries', 'hour_of_day', 'toll_week'):
+            with self.subTest(column):
+                self.assertTrue(np.shares_memory(frame[column].to_numpy(), np.asarray(table.column(column).chunk(0))))
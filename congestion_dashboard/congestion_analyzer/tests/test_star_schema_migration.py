@@ -0,0 +1,44 @@
+from datetime import date
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+from .. import models
+
+
+class StarSchemaMigrationTests(TransactionTestCase):
+    before = [('congestion_analyzer', '0006_partitionversion')]
+    after = [('congestion_analyzer', '0007_vehicleentry_star_schema')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+        models._dimension_names.clear()
+
+    def test_names_move_to_dimension_tables(self):
+        old_apps = self.migrate(self.before)
+        OldEntry = old_apps.get_model('congestion_analyzer', 'VehicleEntry')
+        rows = [('Brooklyn', 'Brooklyn Bridge', 'Cars', 'Peak'), ('Queens', 'Queensboro Bridge', 'Cars', 'Overnight'),
+                ('Brooklyn', 'Manhattan Bridge', 'Buses', 'Peak')]
+        for number, (region, group, vehicle_class, period) in enumerate(rows):
+            OldEntry.objects.create(
+                toll_date=date(2025, 1, 5), toll_hour=number, toll_10_minute_block=0, minute_of_hour=0,
+                hour_of_day=number, day_of_week_int=1, day_of_week='Sunday', toll_week=1, time_period=period,
+                vehicle_class=vehicle_class, detection_group=group, detection_region=region,
+                crz_entries=10 + number, excluded_roadway_entries=0)
+
+        new_apps = self.migrate(self.after)
+
+        self.assertEqual(new_apps.get_model('congestion_analyzer', 'DetectionRegion').objects.count(), 2)
+        self.assertEqual(new_apps.get_model('congestion_analyzer', 'VehicleClass').objects.count(), 2)
+        NewEntry = new_apps.get_model('congestion_analyzer', 'VehicleEntry')
+        migrated = NewEntry.objects.order_by('toll_hour').values_list(
+            'detection_region_key__name', 'detection_group_key__name', 'vehicle_class_key__name',
+            'time_period_key__name', 'crz_entries')
+        self.assertEqual(list(migrated), [(*row, 10 + number) for number, row in enumerate(rows)])
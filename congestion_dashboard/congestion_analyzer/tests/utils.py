@@ -0,0 +1,46 @@
+"""Shared fixtures for the congestion_analyzer tests."""
+import json
+import tempfile
+from pathlib import Path
+
+from django.test import TransactionTestCase, override_settings
+
+from .. import models
+from ..synthetic_data import ROWS_PER_DAY, generate_frame, to_upstream_csv_frame
+
+# Tests get their own cache: the test database's data versions would collide with the real ones
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def write_csv(directory, days, start_date):
+    """An MTA-format CSV of `days` synthetic days starting at start_date."""
+    path = Path(directory) / 'entries.csv'
+    frame = generate_frame(days * ROWS_PER_DAY, start_date=start_date)
+    to_upstream_csv_frame(frame).to_csv(path, index=False)
+    return path
+
+
+class DataTestCase(TransactionTestCase):
+    """
+    A test database plus a throwaway cache and temporary snapshot and archive directories.
+    The process's dimension name maps are emptied, as the tables they mirror are flushed.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings_override = override_settings(CACHES=TEST_CACHES, SNAPSHOTS_DIR=self.directory / 'snapshots',
+                                              ARCHIVE_DIR=self.directory / 'archive')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        models._dimension_names.clear()
+        self.addCleanup(models._dimension_names.clear)
+
+
+def upstream_records(rows, start_date, offset=0):
+    """Synthetic rows as the toll API returns them: decoded JSON, every value a string."""
+    from ..replay_api import socrata_json, upstream_frame
+
+    frame = generate_frame(rows, start_date=start_date, offset=offset)
+    return json.loads(socrata_json(upstream_frame(frame)))
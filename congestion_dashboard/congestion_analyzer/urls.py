@@ -2,16 +2,25 @@ from django.urls import path
 from . import views
 from . import map_views
 from . import scoring_views
+from . import metrics_views
 
 app_name = 'congestion_analyzer'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('dashboard/data/', views.dashboard_data, name='dashboard_data'),
     path('map/', map_views.map, name='map'),
+    path('map/data/', map_views.map_data, name='map_data'),
+    path('query/', views.query_slice, name='query_slice'),
+    path('replay/stream/', views.replay_stream, name='replay_stream'),
     path('anomalies/', views.anomalies, name='anomalies'),
     path('get_anomalies/', views.get_anomalies, name='get_anomalies'),
     path('get_anomaly_history/', views.get_anomaly_history, name='get_anomaly_history'),
     path('scores/', scoring_views.get_scores, name='scores'),
     path('scores/stream/', scoring_views.stream_scores, name='stream_scores'),
     path('scores/heatmap/', scoring_views.get_heatmap_points, name='heatmap_points'),
+    path('scores/heatmap/history/', scoring_views.get_historical_heatmap, name='historical_heatmap'),
+    path('scores/heatmap/raster/<int:level>.png', scoring_views.get_heatmap_raster_png, name='heatmap_raster'),
+    path('metrics/', metrics_views.metrics, name='metrics'),
+    path('profiles/<str:profile_id>/<str:kind>/', metrics_views.profile_file, name='profile_file'),
 ]
\ No newline at end of file
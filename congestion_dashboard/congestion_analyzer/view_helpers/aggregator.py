@@ -1,9 +1,84 @@
+"""
+Hourly, daily and monthly crz_entries totals from one pass over the rows.
+
+Every key column is factorized once into integer codes (sorted, so code order is value
+order). The rows are summed with np.bincount at the finest grain, the union of every
+granularity's columns, and each granularity is a rollup of that much smaller table:
+its columns' codes are combined into one integer id per group, factorized and summed
+again. The output matches df.groupby(columns)['crz_entries'].sum().reset_index() for
+each granularity, row order and dtypes included; adding a granularity adds one rollup.
+For hourly, `columns` also takes the OPTIONAL_COLUMNS present in df: day_of_week and
+month_year feed the dashboard's Perspective table, whose daily and monthly views read
+them from the hourly rows and showed them as null before these were carried along.
+"""
+import numpy as np
 import pandas as pd
 
+# Key columns per aggregation level, in groupby (and sort) order
+GRANULARITIES = {
+    'hourly': ['detection_region', 'vehicle_class', 'hour_of_day', 'toll_date', 'day_of_week_int', 'time_period'],
+    'daily': ['detection_region', 'vehicle_class', 'day_of_week_int', 'toll_date', 'time_period'],
+    'monthly': ['detection_region', 'vehicle_class', 'month_year', 'toll_date', 'day_of_week_int', 'time_period'], # month_year is derived in data_fetcher
+}
+# Determined by toll_date, so carrying them along adds no rows but lets one table serve every view
+OPTIONAL_COLUMNS = {'hourly': ['day_of_week', 'month_year']}
+VALUE_COLUMN = 'crz_entries'
+
+INT64_LIMIT = np.iinfo(np.int64).max
+
+
+def factorize(column):
+    """(codes, uniques) with codes in sorted value order; missing values get code len(uniques)."""
+    codes, uniques = pd.factorize(column, sort=True)
+    return np.where(codes < 0, len(uniques), codes), uniques
+
+
+def combine_codes(code_arrays, sizes):
+    """
+    One int64 id per row whose order is the lexicographic order of the code tuples.
+    When the id space would overflow int64, the partial ids are renumbered densely first.
+    """
+    ids = np.zeros(len(code_arrays[0]) if code_arrays else 0, dtype=np.int64)
+    space = 1
+    for codes, size in zip(code_arrays, sizes):
+        if space * size > INT64_LIMIT:
+            ids, uniques = pd.factorize(ids, sort=True)
+            ids, space = ids.astype(np.int64), len(uniques)
+        ids = ids * size + codes
+        space *= size
+    return ids
+
+
+def sum_by(ids, values):
+    """(dense group index per distinct id in ascending order, row position per group, sums)."""
+    group_index, group_ids = pd.factorize(ids, sort=True)
+    groups = len(group_ids)
+    sums = np.bincount(group_index, weights=values, minlength=groups)
+    if np.issubdtype(values.dtype, np.integer):
+        sums = sums.astype(values.dtype)  # Exact: per-group sums stay far below 2**53
+    representative = np.empty(groups, dtype=np.intp)
+    representative[group_index] = np.arange(len(group_index))
+    return representative, sums
+
+
+def rollup(codes, uniques, sums, columns, value_column=VALUE_COLUMN):
+    """Sum finest-grain groups over `columns`; groups with a missing key are dropped, as groupby does."""
+    keep = np.ones(len(sums), dtype=bool)
+    for column in columns:
+        keep &= codes[column] < len(uniques[column])
+    column_codes = [codes[column][keep] for column in columns]
+    representative, totals = sum_by(combine_codes(column_codes, [len(uniques[column]) for column in columns]),
+                                    sums[keep])
+    frame = pd.DataFrame({column: uniques[column].take(column_code[representative])
+                          for column, column_code in zip(columns, column_codes)})
+    frame[value_column] = totals
+    return frame
+
+
 def perform_aggregations(df):
     """Performs hourly, daily, and monthly aggregations on the DataFrame."""
-    aggregations = {'hourly': pd.DataFrame(), 'daily': pd.DataFrame(), 'monthly': pd.DataFrame()}
-    
+    aggregations = {name: pd.DataFrame() for name in GRANULARITIES}
+
     if df.empty:
         print("[Aggregator] Input DataFrame is empty. Skipping aggregations.")
         return aggregations
@@ -11,58 +86,37 @@ def perform_aggregations(df):
     print(f"[Aggregator] Original DataFrame size for aggregation: {len(df)} records")
 
     # Ensure crz_entries exists and is numeric for aggregation
-    if 'crz_entries' not in df.columns:
+    if VALUE_COLUMN not in df.columns:
          print("[Aggregator] Error: 'crz_entries' column required for aggregation is missing. Returning empty aggregations.")
          return aggregations
-    df['crz_entries'] = pd.to_numeric(df['crz_entries'], errors='coerce').fillna(0)
+    values = pd.to_numeric(df[VALUE_COLUMN], errors='coerce').fillna(0).to_numpy()
     print("[Aggregator] Ensured 'crz_entries' is numeric.")
 
-    # Define required columns for each aggregation level
-    hourly_cols = ['detection_region', 'vehicle_class', 'hour_of_day', 'toll_date', 'day_of_week_int', 'time_period']
-    daily_cols = ['detection_region', 'vehicle_class', 'day_of_week_int', 'toll_date', 'time_period']
-    monthly_cols = ['detection_region', 'vehicle_class', 'month_year', 'toll_date', 'day_of_week_int', 'time_period'] # month_year is derived in data_fetcher
+    levels = {}
+    for name, columns in GRANULARITIES.items():
+        missing = [c for c in columns if c not in df.columns]
+        if missing:
+            print(f"[Aggregator] Skipping {name} aggregation due to missing columns: {missing}")
+            continue
+        levels[name] = columns + [c for c in OPTIONAL_COLUMNS.get(name, []) if c in df.columns]
+    if not levels:
+        return aggregations
 
-    # --- Hourly Aggregation ---
-    print("[Aggregator] Performing hourly aggregation...")
-    if all(col in df.columns for col in hourly_cols):
-        try:
-            hourly_agg = df.groupby(hourly_cols, observed=False)['crz_entries'].sum().reset_index()
-            aggregations['hourly'] = hourly_agg
-            print(f"[Aggregator] Hourly aggregation completed: {len(hourly_agg)} records")
-        except Exception as e:
-             print(f"[Aggregator] Error during hourly aggregation: {e}")
-    else:
-        missing = [c for c in hourly_cols if c not in df.columns]
-        print(f"[Aggregator] Skipping hourly aggregation due to missing columns: {missing}")
-
-    # --- Daily Aggregation ---
-    print("[Aggregator] Performing daily aggregation...")
-    if all(col in df.columns for col in daily_cols):
+    # Factorize each key column once and sum the rows at the finest grain
+    finest = list(dict.fromkeys(column for columns in levels.values() for column in columns))
+    factorized = {column: factorize(df[column]) for column in finest}
+    row_codes = [factorized[column][0] for column in finest]
+    uniques = {column: factorized[column][1] for column in finest}
+    # +1 leaves room for the missing-value code
+    representative, sums = sum_by(combine_codes(row_codes, [len(uniques[column]) + 1 for column in finest]), values)
+    codes = {column: column_codes[representative] for column, column_codes in zip(finest, row_codes)}
+    print(f"[Aggregator] Finest grain: {len(sums)} groups over {len(finest)} columns")
+
+    for name, columns in levels.items():
         try:
-            daily_agg = df.groupby(daily_cols, observed=False)['crz_entries'].sum().reset_index()
-            # Optionally sort by day_of_week_int if needed here
-            # daily_agg = daily_agg.sort_values('day_of_week_int')
-            aggregations['daily'] = daily_agg
-            print(f"[Aggregator] Daily aggregation completed: {len(daily_agg)} records")
+            aggregations[name] = rollup(codes, uniques, sums, columns)
+            print(f"[Aggregator] {name.capitalize()} aggregation completed: {len(aggregations[name])} records")
         except Exception as e:
-            print(f"[Aggregator] Error during daily aggregation: {e}")
-    else:
-        missing = [c for c in daily_cols if c not in df.columns]
-        print(f"[Aggregator] Skipping daily aggregation due to missing columns: {missing}")
-
-    # --- Monthly Aggregation ---
-    print("[Aggregator] Performing monthly aggregation...")
-    if all(col in df.columns for col in monthly_cols):
-         try:
-             monthly_agg = df.groupby(monthly_cols, observed=False)['crz_entries'].sum().reset_index()
-             # Optionally sort by month_year if needed here
-             # monthly_agg = monthly_agg.sort_values('month_year')
-             aggregations['monthly'] = monthly_agg
-             print(f"[Aggregator] Monthly aggregation completed: {len(monthly_agg)} records")
-         except Exception as e:
-             print(f"[Aggregator] Error during monthly aggregation: {e}")
-    else:
-        missing = [c for c in monthly_cols if c not in df.columns]
-        print(f"[Aggregator] Skipping monthly aggregation due to missing columns: {missing}")
-
-    return aggregations 
+            print(f"[Aggregator] Error during {name} aggregation: {e}")
+
+    return aggregations
@@ -22,7 +22,7 @@ def get_vehicle_data():
         output_field=CharField()
     )
 
-    queryset = VehicleEntry.objects.annotate(
+    queryset = VehicleEntry.objects.with_names().annotate(
         month_year_str=month_year_func
     ).values(
         'toll_date', 'hour_of_day', 'day_of_week', 'day_of_week_int',
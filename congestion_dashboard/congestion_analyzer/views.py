@@ -1,13 +1,20 @@
 from django.shortcuts import render
 from django.utils import timezone
 import json # Added for potential use, though context builder might handle it
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import condition
 
 # Import the caching utility function
-from .cache_utils import get_dashboard_data, clear_vehicle_cache, clear_anomaly_cache, get_cached_anomalies
+from .congestion_scoring import toll_api_url
+from .cache_utils import get_dashboard_payload, clear_vehicle_cache, clear_anomaly_cache, get_cached_anomalies
+from .compression import choose_encoding, set_encoding_headers
+from .json_stream import iter_json_object, records_frame, streaming_json_response
 from .anomaly_detection import AnomalyDetector
+from .dashboard_query import SliceQuery, run_slice_query
+from .replay_stream import replay_events, replay_request_params
+from .running_totals import dashboard_stats
 from .models import VehicleEntry
-from datetime import datetime, timedelta, date
+from datetime import datetime, timedelta
 
 anomaly_detector = AnomalyDetector()
 
@@ -18,13 +25,6 @@ anomaly_detector = AnomalyDetector()
 
 # Keep context builder if it's still used for formatting, otherwise remove
 # from .view_helpers.context_builder import prepare_context # Check if needed
-# Custom JSON encoder to handle date objects
-class CustomJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, (date, datetime)):
-            return obj.isoformat()
-        return super().default(obj)
-
 def index(request):
     """
     View function for the main visualization dashboard.
@@ -44,18 +44,18 @@ def index(request):
     # clear_vehicle_cache() # Comment this out for production
     
     try:
-        # Step 1: Get data and schema from cache or generate if missed
-        stats_data, agg_json_string, schema_data = get_dashboard_data()
+        # Step 1: Header stats straight from the running totals kept by ingest
+        # The aggregation rows and schema are fetched separately from dashboard_data
+        stats_data = dashboard_stats()
 
         # Step 2: Prepare context for the template
         context = {
             'total_entries': stats_data.get('total_entries', 0),
             'region_data': stats_data.get('region_data', []),
             'total_volume': stats_data.get('total_volume', 0),
-            'agg_json': agg_json_string, # Already a JSON string
-            'perspective_schema': json.dumps(schema_data), # Pass schema as JSON
             'current_time': timezone.now(), # Keep adding dynamic elements
             'live_metrics_enabled': True, # Or based on settings
+            'toll_api_url': toll_api_url(),
             'error_message': stats_data.get('error') # Pass error if present
         }
 
@@ -83,6 +83,32 @@ def index(request):
         # return render(request, 'congestion_analyzer/error.html', context, status=500)
         return render(request, 'congestion_analyzer/index.html', context) # Return main page with error state
 
+def _request_dashboard_payload(request):
+    # Read once per request; the ETag, Last-Modified and body must all come from the same build
+    if not hasattr(request, 'dashboard_payload'):
+        request.dashboard_payload = get_dashboard_payload()
+    return request.dashboard_payload
+
+def _dashboard_data_etag(request):
+    # One strong tag per data build and content encoding
+    payload = _request_dashboard_payload(request)
+    return f"{payload['etag']}-{choose_encoding(request, payload['variants'])}"
+
+def _dashboard_data_last_modified(request):
+    return _request_dashboard_payload(request)['last_modified']
+
+@condition(etag_func=_dashboard_data_etag, last_modified_func=_dashboard_data_last_modified)
+def dashboard_data(request):
+    """
+    Aggregation rows and Perspective schema for the dashboard as {"schema": ..., "data": [...]}.
+    Served pre-compressed; repeat visits revalidate with the ETag and get a 304.
+    """
+    payload = _request_dashboard_payload(request)
+    encoding = choose_encoding(request, payload['variants'])
+    response = HttpResponse(payload['variants'][encoding], content_type='application/json')
+    response['Cache-Control'] = 'no-cache'
+    return set_encoding_headers(response, encoding)
+
 def anomalies(request):
     """View function for the anomaly detection page."""
     try:
@@ -190,7 +216,7 @@ def get_anomalies(request):
             recent_anomalies = []
         
         print(f"API: Detected {len(all_anomalies)} total anomalies, returning {len(recent_anomalies)} most recent")
-        return JsonResponse({'anomalies': recent_anomalies}, encoder=CustomJSONEncoder)
+        return streaming_json_response(iter_json_object(anomalies=records_frame(recent_anomalies)))
     except Exception as e:
         print(f"Error in get_anomalies: {str(e)}")
         import traceback
@@ -200,8 +226,40 @@ def get_anomalies(request):
 def get_anomaly_history(request):
     """API endpoint to get historical anomalies"""
     try:
-        history = anomaly_detector.get_anomaly_history()
-        return JsonResponse({'anomalies': history}, encoder=CustomJSONEncoder)
+        history = records_frame(anomaly_detector.get_anomaly_history())
+        return streaming_json_response(iter_json_object(anomalies=history))
     except Exception as e:
         print(f"Error in get_anomaly_history: {str(e)}")  # Debug print
-        return JsonResponse({'anomalies': []})
\ No newline at end of file
+        return JsonResponse({'anomalies': []})
+
+def query_slice(request):
+    """
+    API endpoint for one aggregated dashboard slice, summed in the database.
+    Params: start, end (YYYY-MM-DD), region, vehicle_class (repeat or comma separate),
+    granularity (total, month, week, day, hour).
+    """
+    try:
+        query = SliceQuery.from_params(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    rows = run_slice_query(query)
+    return streaming_json_response(iter_json_object(query=json.dumps(query.to_dict()), rows=rows))
+
+def replay_stream(request):
+    """
+    SSE replay of historical traffic: one `window` event per 10-minute window, summed
+    by region and vehicle class, in event-time order.
+    Params: start, end (ISO date or datetime), speed (event-time seconds per second).
+    """
+    try:
+        start, end, speed = replay_request_params(request.GET, request.META.get('HTTP_LAST_EVENT_ID'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if start is None:
+        return JsonResponse({'error': 'No vehicle entries to replay'}, status=404)
+
+    response = StreamingHttpResponse(replay_events(start, end, speed), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable buffering for Nginx
+    return response
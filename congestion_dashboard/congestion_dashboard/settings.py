@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'congestion_analyzer.middleware.MetricsMiddleware',
+    'congestion_analyzer.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,6 +79,11 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Transactions take the write lock at BEGIN, so read-then-write ones (score publish)
+            # wait their turn instead of failing when another writer commits first
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
@@ -121,3 +128,78 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Cache: a per-process LRU bounded by bytes in front of a SQLite file every worker shares
+# (congestion_analyzer.cache_backends). Pickles above COMPRESS_MIN_BYTES are zlib-compressed on
+# disk, and ones above L1_MAX_ITEM_BYTES are never held in worker memory.
+CACHES = {
+    'default': {
+        'BACKEND': 'congestion_analyzer.cache_backends.TieredCache',
+        'LOCATION': BASE_DIR / 'cache' / 'tiered_cache.sqlite3',
+        'TIMEOUT': 3600,
+        'OPTIONS': {
+            'L1_MAX_BYTES': 64 * 1024 * 1024,
+            'L1_MAX_ITEM_BYTES': 4 * 1024 * 1024,
+            'L1_TIMEOUT': 10,  # Seconds a worker may serve a value from memory before rereading disk
+            'MAX_BYTES': 1024 * 1024 * 1024,
+            'COMPRESS_MIN_BYTES': 64 * 1024,
+        },
+    }
+}
+
+# Page cache (MiB) of the connection `manage.py import_data` loads through; see bulk_ingest
+SQLITE_INGEST_CACHE_MB = 256
+
+# Congestion scoring
+# Where the shared score state lives. Other options in congestion_analyzer.score_state:
+# CacheScoreStateBackend (needs a cross-process cache) and LocalMemoryScoreStateBackend.
+CONGESTION_SCORE_BACKEND = 'congestion_analyzer.score_state.DatabaseScoreStateBackend'
+# 'external': run `manage.py refresh_scores` as the single refresher; workers only read
+# snapshots. 'inline' (development): one request per interval, across workers, refreshes.
+CONGESTION_SCORE_REFRESH = 'external'
+# Seconds between refreshes, and between updates on the /scores/ event stream
+CONGESTION_SCORE_REFRESH_INTERVAL = 30.0
+# Seconds a worker may reuse the last snapshot it read before asking the backend again
+CONGESTION_SCORE_READ_TTL = 1.0
+
+# Heatmap sampling grid inside the Congestion Relief Zone. Shared by the map page and the
+# heatmap endpoints; built once per (spacing, seed) and cached as .npz under CRZ_GRID_CACHE_DIR.
+CRZ_GRID_SPACING_METERS = 350
+CRZ_GRID_SEED = 2025
+CRZ_GRID_CACHE_DIR = BASE_DIR / 'cache'
+# Cell size in metres of each live heatmap raster level (coarsest first); the map picks one by zoom
+HEATMAP_RASTER_CELL_METERS = (240, 120, 60)
+
+# Per-process LRU cache for /query/ dashboard slices: max distinct slices and seconds to keep each
+DASHBOARD_QUERY_CACHE_SIZE = 256
+DASHBOARD_QUERY_CACHE_TTL = 300
+
+# Per-process request/cache/detector metrics at /metrics/ (Prometheus text format)
+METRICS_ENABLED = True
+
+# On-demand request profiling: requests with a signed token (manage.py profiles --token) run
+# under cProfile and are saved to PROFILES_DIR. Keep off unless you are chasing a slow view.
+PROFILING_ENABLED = False
+PROFILING_TOKEN_MAX_AGE = 3600
+PROFILING_MAX_PROFILES = 100
+PROFILING_SAMPLE_INTERVAL = 0.001  # Seconds between stack samples for the flamegraph
+PROFILES_DIR = BASE_DIR / 'profiles'
+
+# Toll data API used by the score refresher and the dashboard's live metrics. Point the base
+# URL at `manage.py replay_upstream` (e.g. 'http://127.0.0.1:8765') to replay local data instead.
+TOLL_API_BASE_URL = 'https://data.ny.gov'
+TOLL_API_DATASET = 't6yz-b64h'
+
+# Arrow snapshots of the base dataset and dashboard rollups, memory-mapped by every worker so
+# the OS page cache holds one shared copy. `manage.py write_snapshot` writes one; with this on,
+# import_data swaps in a new one after each import.
+SNAPSHOTS_ENABLED = False
+SNAPSHOTS_DIR = BASE_DIR / 'snapshots'
+SNAPSHOTS_KEEP = 2  # Snapshots kept on disk, the current one included
+
+# Raw-row retention: `manage.py retain_entries` (e.g. nightly from cron) moves VehicleEntry rows
+# older than RETENTION_DAYS days into hourly rollups plus a Parquet archive under ARCHIVE_DIR.
+# None keeps every raw row; the command then needs --days.
+RETENTION_DAYS = None
+ARCHIVE_DIR = BASE_DIR / 'archive'